@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+End-to-end Pipeline Benchmark
+Runs the real submit_job path (pre-flight, download, ffmpeg encode, upload)
+offline: synthetic sources of varied duration and resolution are generated
+with ffmpeg's test sources, seeded into a LocalS3Client stand-in, and N
+worker processes drain them through run_worker with the file job-state
+backend.
+
+Reports videos/hour, realtime factor (source seconds encoded per wall
+second), S3 requests per video and peak scratch usage, and compares them with
+a stored baseline (benchmark_baseline.json) to flag regressions.
+
+Usage:
+    python3 benchmark_pipeline.py --workers 4                  # run and compare with the baseline
+    python3 benchmark_pipeline.py --workers 4 --save-baseline  # run and store as the new baseline
+    python3 benchmark_pipeline.py --sources 18 --durations 10,60 --resolutions 640x360,1920x1080
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_s3 import LocalS3Client
+from job_events import iter_events
+
+BENCH_BUCKET = "benchmark"
+SOURCE_PREFIX = "sources/"
+OUTPUT_PREFIX = "streams/"
+BASELINE_FILE = "benchmark_baseline.json"
+
+DEFAULT_DURATIONS = (10, 30, 60)
+DEFAULT_RESOLUTIONS = ("640x360", "1280x720", "1920x1080")
+
+# metric -> (direction that is better, allowed relative change before flagging)
+REGRESSION_RULES = {
+    "videos_per_hour": ("higher", 0.10),
+    "realtime_factor": ("higher", 0.10),
+    "s3_requests_per_video": ("lower", 0.10),
+    "peak_scratch_mb": ("lower", 0.25),
+}
+
+
+def ffmpeg_version():
+    try:
+        return subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    except OSError:
+        return None
+
+
+def source_matrix(count, durations, resolutions):
+    """(key, duration, resolution) for count sources, cycling through the matrix"""
+    combos = [(d, r) for d in durations for r in resolutions]
+    matrix = []
+    for i in range(count):
+        duration, resolution = combos[i % len(combos)]
+        key = f"{SOURCE_PREFIX}set{i // len(combos)}/src_{resolution}_{duration}s_{i}.mp4"
+        matrix.append((key, duration, resolution))
+    return matrix
+
+
+def generate_source(path, duration, resolution):
+    """Synthetic H.264/AAC source: moving test pattern plus a tone"""
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={resolution}:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-movflags", "+faststart",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def seed_sources(client, cache_dir, matrix):
+    """Generate each distinct (duration, resolution) once and upload it under every key that uses it"""
+    os.makedirs(cache_dir, exist_ok=True)
+    for key, duration, resolution in matrix:
+        cached = os.path.join(cache_dir, f"src_{resolution}_{duration}s.mp4")
+        if not os.path.exists(cached):
+            print(f"   🎞️  Generating {resolution} {duration}s source...")
+            generate_source(cached, duration, resolution)
+        client.upload_file(cached, BENCH_BUCKET, key)
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ScratchSampler:
+    """Track the peak size of the workers' scratch directory"""
+
+    def __init__(self, path, interval=0.5):
+        self.path = path
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, directory_size(self.path))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def worker_main(index, work_dir, s3_root, scratch_dir, keys, ffmpeg_threads, results):
+    """One benchmark worker process: real run_worker against the local stand-in"""
+    os.chdir(work_dir)
+    tempfile.tempdir = scratch_dir
+    log = open(os.path.join(work_dir, f"worker_{index + 1}.log"), "w", buffering=1)
+    sys.stdout = sys.stderr = log
+
+    import convert_ffmpeg
+    from job_events import JobEventLog
+    from job_tracing import JobTracer
+
+    client = LocalS3Client(s3_root)
+    worker_id = f"w{index + 1}"
+    convert_ffmpeg.s3 = client
+    convert_ffmpeg.JOB_STATE = convert_ffmpeg.FileJobState()
+    convert_ffmpeg.WORKER_ID = worker_id
+    convert_ffmpeg.FFMPEG_THREADS = ffmpeg_threads
+    # Sources repeat across sets; copying outputs instead of encoding would skew every metric
+    convert_ffmpeg.DEDUPE_MODE = "off"
+    convert_ffmpeg.EVENT_LOG = JobEventLog(worker_id=worker_id)
+    convert_ffmpeg.TRACER = JobTracer(worker_id=worker_id)
+
+    success, failed = convert_ffmpeg.run_worker(keys, BENCH_BUCKET, BENCH_BUCKET, OUTPUT_PREFIX, SOURCE_PREFIX)
+    results.put({"worker": worker_id, "success": success, "failed": failed,
+                 "request_counts": client.request_counts})
+
+
+def run_benchmark(args):
+    bench_dir = os.path.abspath(args.bench_dir)
+    run_dir = os.path.join(bench_dir, "run")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    s3_root = os.path.join(run_dir, "s3")
+    scratch_dir = os.path.join(run_dir, "scratch")
+    for path in (s3_root, scratch_dir):
+        os.makedirs(path)
+
+    matrix = source_matrix(args.sources, args.durations, args.resolutions)
+    print(f"📦 Seeding {len(matrix)} sources into the local S3 stand-in...")
+    seeder = LocalS3Client(s3_root)
+    seed_sources(seeder, os.path.join(bench_dir, "source_cache"), matrix)
+    keys = [key for key, _, _ in matrix]
+    media_seconds = {key: duration for key, duration, _ in matrix}
+
+    print(f"🏃 Running {args.workers} workers (logs in {run_dir}/worker_N.log)...")
+    context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker_main,
+                        args=(i, run_dir, s3_root, scratch_dir, keys, args.ffmpeg_threads, results))
+        for i in range(args.workers)
+    ]
+    start = time.time()
+    with ScratchSampler(scratch_dir) as sampler:
+        for process in processes:
+            process.start()
+        worker_results = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    wall = time.time() - start
+
+    processed = set(json.load(open(os.path.join(run_dir, "processed_videos.json"))))
+    completed = [k for k in keys if k in processed]
+    request_counts = {}
+    for result in worker_results:
+        for operation, count in result["request_counts"].items():
+            request_counts[operation] = request_counts.get(operation, 0) + count
+    total_requests = sum(request_counts.values())
+    encoded_seconds = sum(media_seconds[k] for k in completed)
+
+    # Every source should be claimed exactly once; more means the job state let two workers in
+    starts = [e["video_key"] for e in iter_events([os.path.join(run_dir, "job_events")])
+              if e.get("event") == "job_start"]
+    duplicate_claims = len(starts) - len(set(starts))
+
+    return {
+        "recorded_at": time.time(),
+        "environment": {
+            "host": socket.gethostname(),
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+            "ffmpeg": ffmpeg_version(),
+        },
+        "config": {
+            "workers": args.workers,
+            "ffmpeg_threads": args.ffmpeg_threads,
+            "sources": len(keys),
+            "durations": list(args.durations),
+            "resolutions": list(args.resolutions),
+        },
+        "completed": len(completed),
+        "failed": len(keys) - len(completed),
+        "duplicate_claims": duplicate_claims,
+        "wall_seconds": round(wall, 2),
+        "videos_per_hour": round(len(completed) / wall * 3600, 2) if wall else 0,
+        "realtime_factor": round(encoded_seconds / wall, 3) if wall else 0,
+        "s3_requests_per_video": round(total_requests / len(completed), 2) if completed else None,
+        "s3_requests_by_operation": request_counts,
+        "peak_scratch_mb": round(sampler.peak_bytes / (1024 * 1024), 1),
+    }
+
+
+def compare_with_baseline(result, baseline):
+    """Returns a list of regression messages (empty when within tolerance)"""
+    regressions = []
+    if baseline.get("config") != result["config"]:
+        print("⚠️  Baseline was recorded with a different configuration; comparison is indicative only")
+    if baseline.get("environment", {}).get("cpus") != result["environment"]["cpus"]:
+        print("⚠️  Baseline was recorded on a machine with a different CPU count")
+
+    print(f"\n{'metric':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for metric, (better, tolerance) in REGRESSION_RULES.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if better == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  ❌ regression"
+            regressions.append(f"{metric}: {old} -> {new} ({change:+.1%}, tolerance {tolerance:.0%})")
+        print(f"{metric:<24}{old:>12}{new:>12}{change:>+10.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end throughput benchmark")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes (default: 2)")
+    parser.add_argument("--sources", type=int, default=9, help="Number of synthetic sources (default: 9)")
+    parser.add_argument("--durations", type=lambda v: [int(x) for x in v.split(",")],
+                        default=list(DEFAULT_DURATIONS), help="Source durations in seconds, comma-separated")
+    parser.add_argument("--resolutions", type=lambda v: v.split(","), default=list(DEFAULT_RESOLUTIONS),
+                        help="Source resolutions WxH, comma-separated")
+    parser.add_argument("--ffmpeg-threads", type=int, default=0, help="ffmpeg -threads per encode")
+    parser.add_argument("--bench-dir", default="benchmark_run", help="Working directory (default: benchmark_run)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help=f"Baseline file (default: {BASELINE_FILE})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+        print("❌ ffmpeg and ffprobe are required for the benchmark")
+        sys.exit(1)
+
+    print("="*60)
+    print("⏱️  End-to-end Pipeline Benchmark")
+    print("="*60)
+    result = run_benchmark(args)
+
+    print("\n" + "="*60)
+    print("📊 Results")
+    print("="*60)
+    print(f"   Completed: {result['completed']}/{result['config']['sources']} in {result['wall_seconds']:.1f}s")
+    print(f"   Videos/hour: {result['videos_per_hour']:.1f}")
+    print(f"   Realtime factor: {result['realtime_factor']:.2f}x")
+    print(f"   S3 requests/video: {result['s3_requests_per_video']} {result['s3_requests_by_operation']}")
+    print(f"   Peak scratch: {result['peak_scratch_mb']:.1f} MB")
+
+    exit_code = 0
+    if result["duplicate_claims"]:
+        print(f"\n❌ {result['duplicate_claims']} sources were claimed by more than one worker")
+        exit_code = 1
+    if result["failed"]:
+        print(f"\n❌ {result['failed']} videos failed - see {args.bench_dir}/run/worker_N.log")
+        exit_code = 1
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(result, json.load(f))
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            exit_code = 1
+        else:
+            print("\n✅ Within baseline tolerances")
+    else:
+        print(f"\n💡 No baseline at {args.baseline}; run with --save-baseline to create one")
+    print("="*60)
+    sys.exit(exit_code)
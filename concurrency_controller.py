@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Adaptive Concurrency Controller
+Picks how many encodes the --workers supervisor should run at once from what
+the box is actually doing, instead of a per-instance-type guess:
+
+  - 1-minute load average vs. CPU count
+  - MemAvailable from /proc/meminfo (4K sources can push a box into swap)
+  - free space on the scratch disk used for downloads and segments
+  - ffmpeg speed (media seconds encoded per wall second) reported by workers
+
+Scaling down happens after a couple of pressured samples; scaling up needs a
+longer run of healthy samples and a cooldown since the last change, so the
+worker count doesn't flap. Every sample and decision is written to
+concurrency_metrics.json.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+
+CONCURRENCY_METRICS_FILE = "concurrency_metrics.json"
+
+# Headroom a single encode needs (1080p source, 5 renditions run back to back)
+MEMORY_PER_WORKER_BYTES = 1536 * 1024 * 1024
+SCRATCH_PER_WORKER_BYTES = 8 * 1024 * 1024 * 1024
+
+# Hysteresis: consecutive samples needed before acting
+SCALE_DOWN_AFTER = 2
+SCALE_UP_AFTER = 4
+COOLDOWN_SECONDS = 120
+
+# Load per CPU above which we are oversubscribed / below which there is room
+HIGH_LOAD_PER_CPU = 1.25
+LOW_LOAD_PER_CPU = 0.75
+
+# Median worker speed below which adding workers isn't helping
+MIN_USEFUL_SPEED = 0.5
+
+
+def read_meminfo():
+    """Return MemAvailable in bytes, or None where /proc/meminfo doesn't exist"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def sample_system(scratch_dir=None):
+    """Take one reading of load, memory and scratch disk"""
+    scratch_dir = scratch_dir or tempfile.gettempdir()
+    try:
+        load_1m = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        load_1m = None
+    return {
+        "timestamp": time.time(),
+        "cpu_count": os.cpu_count() or 1,
+        "load_1m": load_1m,
+        "mem_available_bytes": read_meminfo(),
+        "scratch_free_bytes": shutil.disk_usage(scratch_dir).free,
+    }
+
+
+class ConcurrencyController:
+    """Hysteresis controller for the number of concurrent encodes"""
+
+    def __init__(self, min_workers, max_workers, initial_workers=None, scratch_dir=None,
+                 metrics_file=CONCURRENCY_METRICS_FILE, sample_interval=30):
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.target = initial_workers or self.min_workers
+        self.target = min(max(self.target, self.min_workers), self.max_workers)
+        self.scratch_dir = scratch_dir
+        self.metrics_file = metrics_file
+        self.sample_interval = sample_interval
+
+        self._pressure_streak = 0
+        self._healthy_streak = 0
+        self._last_change = 0
+        self._last_sample_at = 0
+        self.last_sample = None
+        self.last_reason = "initial"
+        self.decisions = {"scale_up": 0, "scale_down": 0, "hold": 0}
+
+    def due(self):
+        return time.time() - self._last_sample_at >= self.sample_interval
+
+    def _pressure(self, sample, active):
+        """Return a reason string if the box is under pressure, else None"""
+        if sample["mem_available_bytes"] is not None and \
+                sample["mem_available_bytes"] < MEMORY_PER_WORKER_BYTES / 2:
+            return "memory"
+        if sample["scratch_free_bytes"] < SCRATCH_PER_WORKER_BYTES / 2:
+            return "scratch disk"
+        if sample["load_1m"] is not None and \
+                sample["load_1m"] > sample["cpu_count"] * HIGH_LOAD_PER_CPU and active > self.min_workers:
+            return "cpu load"
+        return None
+
+    def _room_to_grow(self, sample, speed):
+        """Return True if one more encode fits"""
+        if sample["mem_available_bytes"] is not None and \
+                sample["mem_available_bytes"] < MEMORY_PER_WORKER_BYTES * 1.5:
+            return False
+        if sample["scratch_free_bytes"] < SCRATCH_PER_WORKER_BYTES * 1.5:
+            return False
+        if sample["load_1m"] is not None and \
+                sample["load_1m"] > sample["cpu_count"] * LOW_LOAD_PER_CPU:
+            return False
+        if speed is not None and speed < MIN_USEFUL_SPEED:
+            return False
+        return True
+
+    def update(self, active_workers, speeds=None):
+        """
+        Take a sample and return the new target worker count
+        speeds: recent ffmpeg speed ratios reported by the workers
+        """
+        self._last_sample_at = time.time()
+        sample = sample_system(self.scratch_dir)
+        speeds = sorted(speeds or [])
+        speed = speeds[len(speeds) // 2] if speeds else None
+        sample["median_speed"] = speed
+        sample["active_workers"] = active_workers
+        self.last_sample = sample
+
+        pressure = self._pressure(sample, active_workers)
+        if pressure:
+            self._pressure_streak += 1
+            self._healthy_streak = 0
+        elif self._room_to_grow(sample, speed):
+            self._healthy_streak += 1
+            self._pressure_streak = 0
+        else:
+            self._pressure_streak = 0
+            self._healthy_streak = 0
+
+        decision = "hold"
+        cooled_down = time.time() - self._last_change >= COOLDOWN_SECONDS
+        if pressure and self._pressure_streak >= SCALE_DOWN_AFTER and self.target > self.min_workers:
+            self.target -= 1
+            decision = "scale_down"
+            self.last_reason = pressure
+        elif self._healthy_streak >= SCALE_UP_AFTER and cooled_down and self.target < self.max_workers:
+            self.target += 1
+            decision = "scale_up"
+            self.last_reason = "headroom"
+
+        if decision != "hold":
+            self._last_change = time.time()
+            self._pressure_streak = 0
+            self._healthy_streak = 0
+        self.decisions[decision] += 1
+        self._write_metrics(decision)
+        return self.target
+
+    def _write_metrics(self, decision):
+        metrics = {
+            "target_workers": self.target,
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "last_decision": decision,
+            "last_reason": self.last_reason,
+            "decisions_total": self.decisions,
+            "sample": self.last_sample,
+        }
+        try:
+            with open(self.metrics_file + ".tmp", "w") as f:
+                json.dump(metrics, f, indent=4)
+            os.replace(self.metrics_file + ".tmp", self.metrics_file)
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write {self.metrics_file}: {e}")
@@ -1,5 +1,6 @@
 import os
 import boto3
+from botocore.config import Config
 import time
 import sys
 import io
@@ -10,7 +11,32 @@ import tempfile
 import shutil
 import random
 import signal
+import queue
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from s3_leases import S3LeaseJobState, DEFAULT_LEASE_SECONDS
+from shard_assignment import ShardedJobState, parse_shard
+from job_scheduler import plan_job_order, probe_source, probe_sources, ORDER_MODES
+from worker_supervisor import WorkerSupervisor, strip_cli_options
+from concurrency_controller import ConcurrencyController
+from listing_cache import ListingSnapshot, DEFAULT_MAX_AGE_SECONDS
+from event_ingest import S3EventSource
+from source_preflight import preflight_source, PreflightError
+from pipeline_metrics import METRICS, start_server as start_metrics_server
+from job_events import JobEventLog, detect_instance_type
+from process_accounting import run_with_rusage
+from job_profiler import JobProfiler
+from job_tracing import JobTracer, DEFAULT_UPLOAD_SAMPLE_RATE
+from failure_policy import classify_failure, backoff_seconds, PERMANENT, MAX_TRANSIENT_ATTEMPTS
+from source_dedupe import DEDUPE_MODES, DedupeMiss, etag_fingerprint, file_fingerprint, clone_outputs, COPY_THREADS
+from near_duplicates import NEAR_DUPE_MODES, DEFAULT_THRESHOLD as DEFAULT_NEAR_DUPE_THRESHOLD
+import near_duplicates
+from encode_cache import EncodeCache, settings_fingerprint, DEFAULT_CACHE_DIR as DEFAULT_ENCODE_CACHE_DIR
+from hls_master import rendition_variant, build_master_playlist, parse_media_playlist
+import trick_play
+from state_files import (load_json_file_with_lock, save_json_file_with_lock, update_json_file_with_lock,
+                         load_quarantined_videos, FAILED_VIDEOS_FILE, QUARANTINE_FILE, NEAR_DUPES_FILE)
 
 # Import fcntl for Linux file locking (EC2)
 try:
@@ -37,14 +63,83 @@ PROCESSED_LOG_FILE = "processed_videos.json"
 # File to track videos currently being processed (in-progress lock)
 IN_PROGRESS_FILE = "in_progress_videos.json"
 
+# Per-encode timings used by job_scheduler.py to predict encode time
+ENCODE_HISTORY_FILE = "encode_history.json"
+MAX_HISTORY_RECORDS = 5000
+
 # Global variable to track current video being processed (for cleanup on interrupt)
 CURRENT_VIDEO_KEY = None
 
+# Structured per-stage events (job_events/*.jsonl, summarised by job_report.py)
+EVENT_LOG = JobEventLog()
+
+# cProfile + ffmpeg -benchmark artifacts per job (enabled by --profile)
+PROFILER = JobProfiler()
+
+# One OTLP/JSON trace per job (job_events/traces/)
+TRACER = JobTracer()
+
+# Job-state backend in use (FileJobState, S3LeaseJobState or ShardedJobState), set in main
+JOB_STATE = None
+
+# Ordered job list written by the --workers supervisor and read by its workers
+JOB_PLAN_FILE = "job_plan.json"
+
+# Keys received from S3 upload events in --daemon mode, not yet converted
+INGEST_QUEUE_FILE = "ingest_queue.json"
+
+# Retry state (FAILED_VIDEOS_FILE) and quarantine (QUARANTINE_FILE) are defined in
+# state_files.py, so requeue_quarantined.py can edit them without importing this module
+
+# Why the current job failed: {"stage", "detail", "returncode"}, reset by submit_job
+LAST_FAILURE = None
+
+# Worker label (set by the supervisor) and ffmpeg thread budget (0 = ffmpeg decides)
+WORKER_ID = None
+FFMPEG_THREADS = 0
+
+# Validate sources with ranged reads before downloading them (--no-preflight disables)
+PREFLIGHT_ENABLED = True
+
+# Source fingerprint -> outputs of its first encode (--dedupe etag|sha256|off)
+DEDUPE_INDEX_FILE = "dedupe_index.json"
+DEDUPE_MODE = "off"
+
+# Perceptual fingerprints of encoded sources (--near-dupes); the near-duplicates
+# found for review are in NEAR_DUPES_FILE (state_files.py)
+NEAR_DUPE_INDEX_FILE = "near_duplicate_index.json"
+NEAR_DUPE_MODE = "off"
+NEAR_DUPE_THRESHOLD = DEFAULT_NEAR_DUPE_THRESHOLD
+
+# Source ETag and output settings of every completed job (--reprocess-changed)
+COMPLETED_JOBS_FILE = "completed_jobs.json"
+
+# Local cache of finished encodes (--encode-cache-gb), and reproducible ffmpeg output (--bitexact)
+ENCODE_CACHE = None
+BITEXACT = False
+BITEXACT_ARGS = ["-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact"]
+FFMPEG_VERSION = None
+
+# I-frame playlists and thumbnail sprites for seek previews (--no-trick-play disables)
+TRICK_PLAY_ENABLED = True
+
+# Set by SIGUSR1 when the supervisor scales down: finish the current video, then exit
+DRAIN_REQUESTED = False
+
 # Define your AWS region
 AWS_REGION = "us-east-1"
 
+# Threads that share the S3 client: the dedupe copy pool and the parallel
+# listing default; main() grows the pool for a larger --listing-threads.
+# botocore keeps only 10 connections otherwise and discards the rest.
+S3_MAX_POOL_CONNECTIONS = max(COPY_THREADS, 16)
+
+def make_s3_client(max_pool_connections=S3_MAX_POOL_CONNECTIONS):
+    """S3 client with one pooled connection per concurrent thread"""
+    return boto3.client("s3", region_name=AWS_REGION, config=Config(max_pool_connections=max_pool_connections))
+
 # Initialize S3 client
-s3 = boto3.client("s3", region_name=AWS_REGION)
+s3 = make_s3_client()
 
 print("FFmpeg S3 Video Converter initialized successfully.")
 
@@ -82,6 +177,42 @@ def check_ffmpeg():
         print("Please install FFmpeg first: https://ffmpeg.org/download.html")
         return False
 
+def ffmpeg_version():
+    """First line of `ffmpeg -version`, read once"""
+    global FFMPEG_VERSION
+    if FFMPEG_VERSION is None:
+        try:
+            result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+            FFMPEG_VERSION = (result.stdout.splitlines() or ["unknown"])[0].strip()
+        except OSError:
+            FFMPEG_VERSION = "unknown"
+    return FFMPEG_VERSION
+
+def output_settings():
+    """Settings that change what viewers get; --reprocess-changed re-encodes when they change"""
+    return {
+        "renditions": RENDITIONS,
+        "video": ["libx264", "main", "fast", "yuv420p"],
+        "audio": ["aac", AUDIO_BITRATE, AUDIO_SAMPLE_RATE, 2],
+        "segment_length": SEGMENT_LENGTH,
+        "gop_seconds": GOP_SIZE_SECONDS,
+        "ffmpeg": ffmpeg_version(),
+        "trick_play": trick_play.trick_play_settings() if TRICK_PLAY_ENABLED else False,
+    }
+
+def encode_settings():
+    """Everything besides the source that decides the ffmpeg output bytes (keys the encode cache)"""
+    return dict(output_settings(), threads=FFMPEG_THREADS, bitexact=BITEXACT)
+
+def note_failure(stage, detail, returncode=None):
+    """Remember why the current job failed, for classification after submit_job returns"""
+    global LAST_FAILURE
+    LAST_FAILURE = {"stage": stage, "detail": (detail or "")[-4000:], "returncode": returncode}
+
+def last_failure_message():
+    """Tail of the current job's failure detail, for span status"""
+    return (LAST_FAILURE or {}).get("detail", "")[-500:]
+
 def get_video_framerate(video_path):
     """Get video framerate using ffprobe"""
     try:
@@ -104,11 +235,13 @@ def get_video_framerate(video_path):
     except:
         return 30  # Default to 30fps if detection fails
 
-def convert_video_ffmpeg(input_path, output_dir, input_file_name):
+def convert_video_ffmpeg(input_path, output_dir, input_file_name, source_info=None, resource_usage=None):
     """
     Convert video to HLS using FFmpeg
     Replicates MediaConvert settings exactly
     Process each rendition separately to avoid dimension issues
+    source_info: optional probe result (duration/width/height) used to report encode speed
+    resource_usage: optional list, receives one rusage dict per rendition ffmpeg run
     """
     print(f"Starting FFmpeg conversion...")
     print(f"  Input: {input_path}")
@@ -119,6 +252,8 @@ def convert_video_ffmpeg(input_path, output_dir, input_file_name):
     
     # Get video framerate for GOP size calculation
     fps = get_video_framerate(input_path)
+    source_info = source_info or {}
+    source_duration = source_info.get("duration")
     gop_size_frames = int(fps * GOP_SIZE_SECONDS)  # 4 seconds worth of frames
     
     print(f"  Detected framerate: {fps:.2f} fps")
@@ -134,11 +269,18 @@ def convert_video_ffmpeg(input_path, output_dir, input_file_name):
         
         output_playlist = os.path.join(output_dir, f"MASTER_{name_mod}.m3u8")
         segment_pattern = os.path.join(output_dir, f"seg_{name_mod}_%04d.ts")
+        scale_filter = f"scale='trunc(oh*a/2)*2:{rendition['height']}',format=yuv420p"  # Ensure even width
+        # One rendition's run also tiles thumbnails off the same decoded frames
+        sprites = TRICK_PLAY_ENABLED and name_mod == trick_play.SPRITE_RENDITION
+        if sprites:
+            video_args = ["-filter_complex", trick_play.sprite_filter(scale_filter), "-map", "[v]", "-map", "0:a:0?"]
+        else:
+            video_args = ["-vf", scale_filter]
         
         # Build FFmpeg command for this rendition
         cmd = [
             "ffmpeg", "-y", "-i", input_path,
-            "-vf", f"scale='trunc(oh*a/2)*2:{rendition['height']}',format=yuv420p",  # Ensure even width
+            *video_args,
             "-c:v", "libx264",
             "-profile:v", "main",
             "-preset", "fast",
@@ -148,6 +290,7 @@ def convert_video_ffmpeg(input_path, output_dir, input_file_name):
             "-g", str(gop_size_frames),
             "-keyint_min", str(gop_size_frames),
             "-sc_threshold", "0",
+            "-threads", str(FFMPEG_THREADS),
             "-c:a", "aac",
             "-b:a", str(AUDIO_BITRATE),
             "-ar", str(AUDIO_SAMPLE_RATE),
@@ -156,20 +299,47 @@ def convert_video_ffmpeg(input_path, output_dir, input_file_name):
             "-hls_time", str(SEGMENT_LENGTH),
             "-hls_playlist_type", "vod",
             "-hls_segment_filename", segment_pattern,
-            "-loglevel", "error",  # Suppress verbose output
-            output_playlist
+            "-loglevel", PROFILER.ffmpeg_loglevel(),  # Suppress verbose output unless profiling
+            *PROFILER.ffmpeg_args(),
+            *(BITEXACT_ARGS if BITEXACT else []),
+            output_playlist,
+            *(trick_play.sprite_output_args(output_dir) if sprites else [])
         ]
         
         # Run FFmpeg for this rendition
+        rendition_span = TRACER.start_span("encode_rendition", rendition=name_mod,
+                                           height=rendition['height'], bitrate=rendition['bitrate'])
         rendition_start = time.time()
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result, usage = run_with_rusage(cmd)
         rendition_time = time.time() - rendition_start
+        PROFILER.save_ffmpeg_log(EVENT_LOG.job_id, name_mod, result.stderr)
+        usage = dict(usage or {}, rendition=name_mod, height=rendition['height'],
+                     bitrate=rendition['bitrate'], threads=FFMPEG_THREADS)
+        if resource_usage is not None:
+            resource_usage.append(usage)
         
         if result.returncode != 0:
             print(f"❌ FAILED")
             print(f"  Error: {result.stderr}")
+            note_failure("encode", result.stderr, result.returncode)
+            TRACER.end_span(rendition_span, ok=False, message=result.stderr, returncode=result.returncode)
             return False
-        print(f"✅ ({rendition_time:.1f}s)")
+        TRACER.end_span(rendition_span, **{k: v for k, v in usage.items() if k not in ("rendition", "height", "bitrate")})
+        METRICS.encode_seconds.observe(rendition_time, rendition=name_mod)
+        EVENT_LOG.stage("rendition", rendition_time, source_duration=source_duration,
+                        source_width=source_info.get("width"), source_height=source_info.get("height"),
+                        realtime_factor=round(source_duration / rendition_time, 3)
+                        if source_duration and rendition_time > 0 else None,
+                        **{k: v for k, v in usage.items() if k != "wall_seconds"})
+        cost = ""
+        if "user_cpu_seconds" in usage:
+            cost = f", cpu={usage['user_cpu_seconds'] + usage['sys_cpu_seconds']:.0f}s, rss={usage['max_rss_mb']:.0f}MB"
+        if source_duration and rendition_time > 0:
+            METRICS.encode_speed.observe(source_duration / rendition_time, rendition=name_mod)
+            # Same meaning as ffmpeg's speed= (media seconds per wall second); the supervisor reads it
+            print(f"✅ ({rendition_time:.1f}s, speed={source_duration / rendition_time:.2f}x{cost})")
+        else:
+            print(f"✅ ({rendition_time:.1f}s{cost})")
     
     elapsed = time.time() - start_time
     print(f"✅ All renditions completed in {elapsed:.1f} seconds total")
@@ -179,24 +349,17 @@ def convert_video_ffmpeg(input_path, output_dir, input_file_name):
         playlist = os.path.join(output_dir, f"MASTER_{rendition['name_modifier']}.m3u8")
         if not os.path.exists(playlist):
             print(f"❌ Missing output playlist: {playlist}")
+            note_failure("encode", f"missing output playlist {os.path.basename(playlist)}")
             return False
     
-    # Create master playlist - Match MediaConvert format
+    # Create master playlist - Match MediaConvert format, with measured bandwidth/codecs/resolution
     print(f"📝 Creating master playlist...")
-    master_playlist = "#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-INDEPENDENT-SEGMENTS\n"
-    
-    for rendition in RENDITIONS:
-        # Calculate average bandwidth (typically 60-70% of max)
-        avg_bandwidth = int(rendition['bitrate'] * 0.65)
-        total_bandwidth = rendition['bitrate'] + AUDIO_BITRATE
-        
-        # Add stream info with detailed attributes like MediaConvert
-        master_playlist += f'#EXT-X-STREAM-INF:BANDWIDTH={total_bandwidth},'
-        master_playlist += f'AVERAGE-BANDWIDTH={avg_bandwidth},'
-        master_playlist += f'CODECS="avc1.4d401f,mp4a.40.2",'
-        master_playlist += f'RESOLUTION={rendition["width"]}x{rendition["height"]},'
-        master_playlist += f'FRAME-RATE={fps:.3f}\n'
-        master_playlist += f"MASTER_{rendition['name_modifier']}.m3u8\n"
+    variants = [rendition_variant(output_dir, rendition, AUDIO_BITRATE) for rendition in RENDITIONS]
+    for variant in variants:
+        print(f"   {variant['uri']}: {variant['resolution']}, {variant['codecs']}, "
+              f"peak {variant['bandwidth'] / 1000:.0f} kbps, average {(variant['average_bandwidth'] or 0) / 1000:.0f} kbps")
+    iframe_variants = write_trick_play(output_dir, variants) if TRICK_PLAY_ENABLED else []
+    master_playlist = build_master_playlist(variants, fps, iframe_variants)
     
     master_file = os.path.join(output_dir, "MASTER.m3u8")
     with open(master_file, 'w') as f:
@@ -205,26 +368,207 @@ def convert_video_ffmpeg(input_path, output_dir, input_file_name):
     print(f"✅ All {len(RENDITIONS)} renditions + master playlist created successfully")
     return True
 
-def download_from_s3(bucket, key, local_path):
-    """Download file from S3 with progress indication"""
+def write_trick_play(output_dir, variants):
+    """
+    I-frame playlists for every rendition and thumbnails.vtt for the sprite sheets
+    Returns: I-frame variants for the master playlist. Failures only cost the seek previews.
+    """
+    trick_play_start = time.time()
+    iframe_variants = []
+    for rendition, variant in zip(RENDITIONS, variants):
+        try:
+            iframes = trick_play.write_iframe_playlist(output_dir, rendition['name_modifier'])
+        except (OSError, ValueError, IndexError) as e:
+            print(f"⚠️  Warning: No I-frame playlist for {rendition['name_modifier']}: {e}")
+            continue
+        if iframes is None:
+            print(f"⚠️  Warning: No keyframes found in {rendition['name_modifier']} segments, skipping its I-frame playlist")
+            continue
+        iframe_variants.append(dict(iframes, codecs=variant["codecs"].split(",")[0], resolution=variant["resolution"]))
+    try:
+        with open(os.path.join(output_dir, f"MASTER_{trick_play.SPRITE_RENDITION}.m3u8")) as f:
+            duration = sum(d or 0 for _, d in parse_media_playlist(f.read())["segments"])
+        thumbnails = trick_play.write_thumbnail_vtt(output_dir, duration)
+    except (OSError, ValueError) as e:
+        thumbnails = 0
+        print(f"⚠️  Warning: No thumbnail track: {e}")
+    EVENT_LOG.stage("trick_play", time.time() - trick_play_start,
+                    iframe_playlists=len(iframe_variants), thumbnails=thumbnails)
+    print(f"🎞️  Trick play: {len(iframe_variants)} I-frame playlists, {thumbnails} thumbnails")
+    return iframe_variants
+
+def download_from_s3(bucket, key, local_path, file_size=None):
+    """Download file from S3 with progress indication (file_size skips the HEAD when the caller has it)"""
     print(f"⬇️  Downloading from S3: s3://{bucket}/{key}")
     try:
         # Get file size for progress indication
-        response = s3.head_object(Bucket=bucket, Key=key)
-        file_size = response['ContentLength']
+        if file_size is None:
+            file_size = s3.head_object(Bucket=bucket, Key=key)['ContentLength']
         print(f"   File size: {file_size / (1024*1024):.2f} MB")
         
         # Skip files that are too small (likely corrupted or metadata files)
         if file_size < 1024:  # Less than 1KB
             print(f"⚠️  Skipping file - too small ({file_size} bytes), likely corrupted or metadata file")
+            note_failure("download", f"source too small ({file_size} bytes)")
             return False
         
+        download_start = time.time()
         s3.download_file(bucket, key, local_path)
+        METRICS.stage_seconds.observe(time.time() - download_start, stage="download")
+        EVENT_LOG.stage("download", time.time() - download_start, bytes=file_size)
+        METRICS.bytes_downloaded.inc(file_size)
         print(f"✅ Download complete: {local_path}")
         return True
     except Exception as e:
         print(f"❌ Download failed: {e}")
+        note_failure("download", str(e))
+        return False
+
+def reuse_duplicate_encode(fingerprint, video_key, output_bucket, dest_path):
+    """Copy the outputs of an earlier encode of the same source; False means encode normally"""
+    index = load_json_file_with_lock(DEDUPE_INDEX_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    entry = index.get(fingerprint) if isinstance(index, dict) else None
+    # Reprocessing the original itself (--force) encodes it again, and so does a
+    # duplicate of something encoded with different (or unrecorded) settings
+    if not entry or (entry["bucket"], entry["prefix"]) == (output_bucket, dest_path):
         return False
+    if entry.get("settings") != settings_fingerprint(output_settings()):
+        return False
+    
+    print(f"♻️  Same source as {entry['key']} - copying its outputs instead of re-encoding")
+    copied = copy_earlier_outputs(entry, output_bucket, dest_path)
+    if copied is None:
+        update_json_file_with_lock(DEDUPE_INDEX_FILE,
+                                   lambda data: {k: v for k, v in data.items() if k != fingerprint}, default={})
+    return bool(copied)
+
+def copy_earlier_outputs(entry, output_bucket, dest_path):
+    """
+    Clone the outputs recorded in a dedupe/near-duplicate index entry to dest_path
+    Returns: True when copied, None if they no longer exist, False if the copy failed
+    """
+    copy_start = time.time()
+    span = TRACER.start_span("dedupe_copy", source_key=entry["key"])
+    try:
+        copied, copied_bytes = clone_outputs(s3, entry["bucket"], entry["prefix"], output_bucket, dest_path)
+    except DedupeMiss as e:
+        TRACER.end_span(span, ok=False, message=str(e))
+        print(f"⚠️  Earlier outputs are gone ({e}) - encoding this copy")
+        return None
+    except Exception as e:
+        TRACER.end_span(span, ok=False, message=str(e))
+        print(f"⚠️  Could not copy earlier outputs ({e}) - encoding this copy")
+        return False
+    TRACER.end_span(span, files=copied, bytes=copied_bytes)
+    METRICS.stage_seconds.observe(time.time() - copy_start, stage="dedupe_copy")
+    EVENT_LOG.stage("dedupe_copy", time.time() - copy_start, source_key=entry["key"],
+                    files=copied, bytes=copied_bytes)
+    print(f"✅ Copied {copied} files ({copied_bytes / (1024*1024):.2f} MB) from s3://{entry['bucket']}/{entry['prefix']}")
+    return True
+
+def record_dedupe_output(fingerprint, video_key, output_bucket, dest_path):
+    """Remember where this source's outputs live; the first encode of a fingerprint wins"""
+    entry = {"key": video_key, "bucket": output_bucket, "prefix": dest_path,
+             "settings": settings_fingerprint(output_settings()), "recorded_at": time.time()}
+
+    def add(index):
+        # Re-encoded with new settings: point the fingerprint at the current outputs
+        if index.get(fingerprint, {}).get("settings") != entry["settings"]:
+            index[fingerprint] = entry
+        return index
+
+    try:
+        update_json_file_with_lock(DEDUPE_INDEX_FILE, add, default={})
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update {DEDUPE_INDEX_FILE}: {e}")
+
+def check_near_duplicate(local_path, video_key, source_info, output_bucket, dest_path):
+    """
+    Compare the downloaded source with the perceptual fingerprints of earlier encodes
+    Returns: (fingerprint to index after upload or None,
+              None to encode / True when outputs were reused / False when held for review)
+    """
+    reviewed = load_json_file_with_lock(NEAR_DUPES_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    if isinstance(reviewed, dict) and reviewed.get(video_key, {}).get("released_at"):
+        # Held before and released by an operator (requeue_quarantined.py)
+        return None, None
+    
+    print(f"🔍 Fingerprinting for near-duplicates...", end=" ", flush=True)
+    fingerprint_start = time.time()
+    span = TRACER.start_span("fingerprint")
+    try:
+        fingerprint = near_duplicates.fingerprint(local_path, source_info.get("duration"))
+    except Exception as e:
+        TRACER.end_span(span, ok=False, message=str(e))
+        print(f"⚠️  skipped ({e})")
+        return None, None
+    index = load_json_file_with_lock(NEAR_DUPE_INDEX_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    match, scores = near_duplicates.find_near_duplicate(
+        fingerprint, index if isinstance(index, dict) else {}, NEAR_DUPE_THRESHOLD, exclude_key=video_key)
+    fingerprint_seconds = time.time() - fingerprint_start
+    TRACER.end_span(span, match=match, similarity=scores and scores["similarity"])
+    METRICS.stage_seconds.observe(fingerprint_seconds, stage="fingerprint")
+    EVENT_LOG.stage("fingerprint", fingerprint_seconds, match=match, **(scores or {}))
+    if not match:
+        print(f"✅ no match ({fingerprint_seconds:.1f}s)")
+        return fingerprint, None
+    
+    print(f"👯 near-duplicate of {match}")
+    print(f"   Similarity {scores['similarity']:.3f} (video {scores['video']:.3f}, audio {scores['audio']})")
+    flagged = dict(scores, match=match, action=NEAR_DUPE_MODE, flagged_at=time.time())
+    try:
+        update_json_file_with_lock(NEAR_DUPES_FILE, lambda data: dict(data, **{video_key: flagged}), default={})
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update {NEAR_DUPES_FILE}: {e}")
+    
+    if NEAR_DUPE_MODE == "reuse":
+        # Entries recorded before settings were stored can't be checked, so they aren't reused either
+        if index[match].get("settings") != settings_fingerprint(output_settings()):
+            print(f"   {match} was encoded with different settings - encoding this one")
+            return fingerprint, None
+        print(f"♻️  Copying the outputs of {match} instead of re-encoding")
+        if copy_earlier_outputs(index[match], output_bucket, dest_path):
+            return None, True
+        return None, None
+    if NEAR_DUPE_MODE == "skip":
+        note_failure("near_duplicate", f"near-duplicate of {match} (similarity {scores['similarity']:.3f})")
+        return None, False
+    print(f"   Flagged for review in {NEAR_DUPES_FILE} - encoding anyway")
+    return None, None
+
+def record_near_duplicate_fingerprint(fingerprint, video_key, output_bucket, dest_path):
+    """Index an encoded source's fingerprint with the location of its outputs"""
+    entry = dict(fingerprint, key=video_key, bucket=output_bucket, prefix=dest_path,
+                 settings=settings_fingerprint(output_settings()), recorded_at=time.time())
+    try:
+        update_json_file_with_lock(NEAR_DUPE_INDEX_FILE, lambda index: dict(index, **{video_key: entry}), default={})
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update {NEAR_DUPE_INDEX_FILE}: {e}")
+
+def preflight_check(bucket, key, size=None):
+    """Validate the source container with ranged reads; False only for a broken source"""
+    preflight_start = time.time()
+    try:
+        info = preflight_source(s3, bucket, key, size=size)
+        METRICS.stage_seconds.observe(time.time() - preflight_start, stage="preflight")
+        EVENT_LOG.stage("preflight", time.time() - preflight_start, ok=True, container=info["container"],
+                        bytes=info.get("bytes_read"))
+    except PreflightError as e:
+        EVENT_LOG.stage("preflight", time.time() - preflight_start, ok=False, reason=str(e))
+        print(f"❌ Pre-flight check failed: {e}")
+        note_failure("preflight", str(e))
+        return False
+    except Exception as e:
+        # A validator hiccup shouldn't block the job - ffmpeg gets the final word
+        print(f"⚠️  Pre-flight check skipped: {e}")
+        return True
+    
+    if info["container"] == "iso":
+        print(f"🔎 Pre-flight OK: moov at {info.get('moov_position', '?')}, "
+              f"video {info.get('video_codec', '?')} ({info['bytes_read'] / (1024*1024):.1f} MB read)")
+    else:
+        print(f"🔎 Pre-flight OK: {info['container']} container")
+    return True
 
 def upload_directory_to_s3(local_dir, bucket, s3_prefix):
     """Upload entire directory to S3, preserving structure"""
@@ -232,6 +576,7 @@ def upload_directory_to_s3(local_dir, bucket, s3_prefix):
     
     uploaded_count = 0
     total_size = 0
+    upload_start = time.time()
     
     try:
         for root, dirs, files in os.walk(local_dir):
@@ -246,28 +591,39 @@ def upload_directory_to_s3(local_dir, bucket, s3_prefix):
                     extra_args['ContentType'] = 'application/vnd.apple.mpegurl'
                 elif file.endswith('.ts'):
                     extra_args['ContentType'] = 'video/mp2t'
+                elif file.endswith('.vtt'):
+                    extra_args['ContentType'] = 'text/vtt'
+                elif file.endswith('.jpg'):
+                    extra_args['ContentType'] = 'image/jpeg'
                 
                 # Upload file with proper Content-Type
                 file_size = os.path.getsize(local_path)
+                file_span = TRACER.start_span("upload_file", sample=True, key=s3_key, bytes=file_size)
                 s3.upload_file(local_path, bucket, s3_key, ExtraArgs=extra_args)
+                TRACER.end_span(file_span)
                 uploaded_count += 1
                 total_size += file_size
                 
                 if uploaded_count % 10 == 0:
                     print(f"   Uploaded {uploaded_count} files...")
         
+        METRICS.stage_seconds.observe(time.time() - upload_start, stage="upload")
+        EVENT_LOG.stage("upload", time.time() - upload_start, bytes=total_size, files=uploaded_count)
+        METRICS.bytes_uploaded.inc(total_size)
         print(f"✅ Upload complete: {uploaded_count} files ({total_size / (1024*1024):.2f} MB)")
         return True
     except Exception as e:
         print(f"❌ Upload failed: {e}")
+        note_failure("upload", str(e))
         return False
 
-def submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix):
+def output_path_for(input_key, output_prefix, s3_input_folder_prefix):
     """
-    Process a single video - exact replica of convert_video.py submit_job logic
+    Output key prefix (without bucket) a source's HLS files go under
+    Shared by submit_job and reconcile_outputs.py
     """
     # Extract file name and folder structure - EXACT MATCH to convert_video.py lines 35-50
-    input_file_name, input_file_extension = os.path.splitext(os.path.basename(input_key))
+    input_file_name = os.path.splitext(os.path.basename(input_key))[0]
     
     # Replace spaces with underscores in the filename for URL-safe paths
     input_file_name = input_file_name.replace(" ", "_")
@@ -287,53 +643,171 @@ def submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_f
     # Construct the output destination, preserving folder structure
     # Ensure no double-slash if input_folder is empty
     if input_folder:
-        destination = f"s3://{output_bucket}/{output_prefix}{input_folder}/{input_file_name}/"
-    else:
-        destination = f"s3://{output_bucket}/{output_prefix}{input_file_name}/"
-    
-    # Parse destination for upload
-    dest_path = destination.replace(f"s3://{output_bucket}/", "")
+        return f"{output_prefix}{input_folder}/{input_file_name}/"
+    return f"{output_prefix}{input_file_name}/"
+
+def submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix, source_head=None):
+    """
+    Process a single video - exact replica of convert_video.py submit_job logic
+    source_head: head_object response for the source, if the caller already has one
+    """
+    input_file_name, input_file_extension = os.path.splitext(os.path.basename(input_key))
+    input_file_name = input_file_name.replace(" ", "_")
+    dest_path = output_path_for(input_key, output_prefix, s3_input_folder_prefix)
+    destination = f"s3://{output_bucket}/{dest_path}"
     
     print(f"\n{'='*60}")
     print(f"Processing: {input_key}")
     print(f"Output destination: {destination}")
     print(f"{'='*60}")
     
+    global LAST_FAILURE
+    LAST_FAILURE = None
+    
     # Create temporary directory for processing
     temp_dir = tempfile.mkdtemp(prefix="ffmpeg_convert_")
+    job_start = time.time()
     
     try:
+        # Step 0: Reuse an earlier encode of the same source, then
+        # reject broken sources from a few ranged reads before the full download
+        # One HEAD per job: its size also serves the pre-flight check and the download
+        fingerprint = source_etag = None
+        if source_head is None and (DEDUPE_MODE == "etag" or ENCODE_CACHE):
+            source_head = s3.head_object(Bucket=input_bucket, Key=input_key)
+        source_size = source_head.get("ContentLength") if source_head else None
+        if DEDUPE_MODE == "etag" or ENCODE_CACHE:
+            source_etag = etag_fingerprint(source_head)
+        if DEDUPE_MODE == "etag":
+            fingerprint = source_etag
+            if fingerprint and reuse_duplicate_encode(fingerprint, input_key, output_bucket, dest_path):
+                shutil.rmtree(temp_dir)
+                return True
+        
+        # Same source and settings encoded here before (retry after an upload failure, --force rerun)
+        temp_output = os.path.join(temp_dir, "output")
+        cache_key = ENCODE_CACHE.key(source_etag, settings_fingerprint(encode_settings())) \
+            if ENCODE_CACHE and source_etag else None
+        cached = ENCODE_CACHE.restore(cache_key, temp_output) if cache_key else None
+        if cached:
+            print(f"\n💾 Encode cache hit ({len(cached['files'])} files, "
+                  f"{cached['bytes'] / (1024*1024):.2f} MB) - skipping download and encode")
+            EVENT_LOG.stage("encode_cache", 0, hit=True, bytes=cached["bytes"])
+            print("\n[3/4] Uploading cached outputs to S3...")
+            span = TRACER.start_span("upload", bucket=output_bucket, prefix=dest_path, cached=True,
+                                     file_sample_rate=TRACER.upload_sample_rate)
+            ok = upload_directory_to_s3(temp_output, output_bucket, dest_path)
+            TRACER.end_span(span, ok, last_failure_message())
+            if not ok:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return False
+            if fingerprint:
+                record_dedupe_output(fingerprint, input_key, output_bucket, dest_path)
+            shutil.rmtree(temp_dir)
+            print(f"✅ Successfully processed from encode cache: {input_key}")
+            return True
+        
+        if PREFLIGHT_ENABLED:
+            span = TRACER.start_span("preflight")
+            ok = preflight_check(input_bucket, input_key, source_size)
+            TRACER.end_span(span, ok, last_failure_message())
+            if not ok:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return False
+        
         # Step 1: Download from S3
         print("\n[1/4] Downloading from S3...")
         temp_input = os.path.join(temp_dir, f"input{input_file_extension}")
-        if not download_from_s3(input_bucket, input_key, temp_input):
+        span = TRACER.start_span("download", bucket=input_bucket)
+        ok = download_from_s3(input_bucket, input_key, temp_input, source_size)
+        TRACER.end_span(span, ok, last_failure_message(),
+                        bytes=os.path.getsize(temp_input) if ok else None)
+        if not ok:
+            shutil.rmtree(temp_dir, ignore_errors=True)
             return False
         
+        if DEDUPE_MODE == "sha256":
+            fingerprint = file_fingerprint(temp_input)
+            if reuse_duplicate_encode(fingerprint, input_key, output_bucket, dest_path):
+                shutil.rmtree(temp_dir)
+                return True
+        
         # Step 2: Convert with FFmpeg
         print("\n[2/4] Converting video with FFmpeg...")
-        temp_output = os.path.join(temp_dir, "output")
         
         # Simulate job status polling like MediaConvert
         print("Job Status: PROCESSING")
         
-        success = convert_video_ffmpeg(temp_input, temp_output, input_file_name)
+        span = TRACER.start_span("probe")
+        probe_start = time.time()
+        source_info = probe_source(temp_input) or {}
+        TRACER.end_span(span, source_duration=source_info.get("duration"),
+                        source_width=source_info.get("width"), source_height=source_info.get("height"))
+        METRICS.stage_seconds.observe(time.time() - probe_start, stage="probe")
+        EVENT_LOG.stage("probe", time.time() - probe_start, source_duration=source_info.get("duration"),
+                        source_width=source_info.get("width"), source_height=source_info.get("height"))
+        
+        near_fingerprint = None
+        if NEAR_DUPE_MODE != "off":
+            near_fingerprint, outcome = check_near_duplicate(temp_input, input_key, source_info,
+                                                             output_bucket, dest_path)
+            if outcome is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return outcome
+        
+        span = TRACER.start_span("encode", renditions=len(RENDITIONS), ffmpeg_threads=FFMPEG_THREADS)
+        encode_start = time.time()
+        resource_usage = []
+        success = convert_video_ffmpeg(temp_input, temp_output, input_file_name, source_info, resource_usage)
+        encode_seconds = time.time() - encode_start
+        TRACER.end_span(span, success, last_failure_message())
+        EVENT_LOG.stage("encode", encode_seconds, ok=success, source_duration=source_info.get("duration"))
         
         if not success:
             print("Job Status: ERROR")
+            shutil.rmtree(temp_dir, ignore_errors=True)
             return False
         
         print("Job Status: COMPLETE")
         
+        # Before the upload, so a failed upload's retry doesn't encode again
+        if cache_key:
+            ENCODE_CACHE.store(cache_key, temp_output, input_key)
+        
+        # Feed the scheduler's cost model
+        record_encode_history({
+            "key": input_key,
+            "size_bytes": os.path.getsize(temp_input),
+            "duration": source_info.get("duration"),
+            "width": source_info.get("width"),
+            "height": source_info.get("height"),
+            "encode_seconds": round(encode_seconds, 2),
+            "cpu_seconds": round(sum(u.get("user_cpu_seconds", 0) + u.get("sys_cpu_seconds", 0)
+                                     for u in resource_usage), 2),
+            "max_rss_mb": max((u.get("max_rss_mb", 0) for u in resource_usage), default=0),
+            "recorded_at": time.time(),
+        })
+        
         # Step 3: Upload to S3
         print("\n[3/4] Uploading to S3...")
-        if not upload_directory_to_s3(temp_output, output_bucket, dest_path):
+        span = TRACER.start_span("upload", bucket=output_bucket, prefix=dest_path,
+                                 file_sample_rate=TRACER.upload_sample_rate)
+        ok = upload_directory_to_s3(temp_output, output_bucket, dest_path)
+        TRACER.end_span(span, ok, last_failure_message())
+        if not ok:
+            shutil.rmtree(temp_dir, ignore_errors=True)
             return False
+        if fingerprint:
+            record_dedupe_output(fingerprint, input_key, output_bucket, dest_path)
+        if near_fingerprint:
+            record_near_duplicate_fingerprint(near_fingerprint, input_key, output_bucket, dest_path)
         
         # Step 4: Cleanup
         print("\n[4/4] Cleaning up temporary files...")
         shutil.rmtree(temp_dir)
         print("✅ Cleanup complete")
         
+        METRICS.stage_seconds.observe(time.time() - job_start, stage="job")
         print(f"\n{'='*60}")
         print(f"✅ Successfully processed: {input_key}")
         print(f"   Output: {destination}")
@@ -344,6 +818,7 @@ def submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_f
         
     except Exception as e:
         print(f"\n❌ Error processing {input_key}: {e}")
+        note_failure("job", f"{type(e).__name__}: {e}")
         import traceback
         traceback.print_exc()
         
@@ -357,71 +832,95 @@ def submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_f
 
 def list_s3_video_objects(bucket_name, prefix):
     """List all video files in S3 bucket - EXACT MATCH to convert_video.py lines 219-233"""
+    return [obj["Key"] for obj in list_s3_video_object_info(bucket_name, prefix)]
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.flv', '.wmv')
+
+def is_video_listing_entry(obj):
+    """Filter applied to every listed object (shared by all listers)"""
+    key = obj["Key"]
+    # Get filename from key
+    filename = key.split('/')[-1]
+    
+    # Skip macOS metadata files (._filename) and files with 0 size
+    if filename.startswith('._'):
+        return False
+    
+    # Skip files that are too small (likely corrupted)
+    if obj.get('Size', 0) < 1024:  # Skip files smaller than 1KB
+        return False
+    
+    return key.lower().endswith(VIDEO_EXTENSIONS)
+
+def video_object_info(obj):
+    """Keep only the listing fields the planner and snapshot need"""
+    return {
+        "Key": obj["Key"],
+        "Size": obj.get("Size", 0),
+        "ETag": obj.get("ETag"),
+        "LastModified": obj.get("LastModified"),
+    }
+
+def list_s3_video_object_info(bucket_name, prefix, listing_threads=1):
+    """
+    Same filtering as list_s3_video_objects, but keeps the listing metadata
+    listing_threads > 1 lists sub-prefixes concurrently (see iter_s3_video_objects_parallel)
+    Returns: list of dicts with Key, Size, ETag and LastModified
+    """
+    if listing_threads > 1:
+        # Sorted so the result matches single-threaded listing order
+        return sorted(iter_s3_video_objects_parallel(bucket_name, prefix, listing_threads),
+                      key=lambda obj: obj["Key"])
+
     video_objects = []
     paginator = s3.get_paginator('list_objects_v2')
     pages = paginator.paginate(Bucket=bucket_name, Prefix=prefix)
 
-    video_extensions = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.flv', '.wmv')
-
     for page in pages:
         if "Contents" in page:
             for obj in page["Contents"]:
-                key = obj["Key"]
-                # Get filename from key
-                filename = key.split('/')[-1]
-                
-                # Skip macOS metadata files (._filename) and files with 0 size
-                if filename.startswith('._'):
-                    continue
-                
-                # Skip files that are too small (likely corrupted)
-                if obj.get('Size', 0) < 1024:  # Skip files smaller than 1KB
-                    continue
-                
-                if key.lower().endswith(video_extensions):
-                    video_objects.append(key)
+                if is_video_listing_entry(obj):
+                    video_objects.append(video_object_info(obj))
     return video_objects
 
-def load_json_file_with_lock(file_path, lock_type=fcntl.LOCK_SH if LOCK_AVAILABLE else None):
+def iter_s3_video_objects_parallel(bucket_name, prefix, max_workers=16, max_depth=4):
     """
-    Load JSON file with file locking for thread-safe reads
+    List a prefix by walking its folders with Delimiter='/' on a bounded thread pool
+    Filtered objects are yielded as each page arrives, in no particular order.
+    Below max_depth a folder is listed recursively in one pagination, so deep
+    module/lesson trees don't turn into thousands of tiny requests.
     """
-    if not os.path.exists(file_path):
-        return []
-    
-    try:
-        with open(file_path, 'r') as f:
-            if LOCK_AVAILABLE and lock_type:
-                fcntl.flock(f.fileno(), lock_type)
-            try:
-                data = json.load(f)
-            finally:
-                if LOCK_AVAILABLE and lock_type:
-                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-        return data
-    except json.JSONDecodeError:
-        return []
-    except Exception as e:
-        print(f"⚠️  Warning: Could not read {file_path}: {e}")
-        return []
+    arrived = queue.Queue()
 
-def save_json_file_with_lock(file_path, data):
-    """
-    Save JSON file with exclusive file locking for thread-safe writes
-    """
-    try:
-        with open(file_path, 'w') as f:
-            if LOCK_AVAILABLE:
-                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    def list_level(level_prefix, depth):
+        params = {"Bucket": bucket_name, "Prefix": level_prefix}
+        if depth < max_depth:
+            params["Delimiter"] = "/"
+        sub_prefixes = []
+        for page in s3.get_paginator('list_objects_v2').paginate(**params):
+            batch = [video_object_info(obj) for obj in page.get("Contents", []) if is_video_listing_entry(obj)]
+            if batch:
+                arrived.put(batch)
+            sub_prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        return sub_prefixes
+
+    def drain():
+        while True:
             try:
-                json.dump(data, f, indent=4)
-            finally:
-                if LOCK_AVAILABLE:
-                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-        return True
-    except Exception as e:
-        print(f"❌ Error saving {file_path}: {e}")
-        return False
+                yield from arrived.get_nowait()
+            except queue.Empty:
+                return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(list_level, prefix, 0): 0}
+        while pending:
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            yield from drain()
+            for future in done:
+                depth = pending.pop(future)
+                for sub_prefix in future.result():
+                    pending[pool.submit(list_level, sub_prefix, depth + 1)] = depth + 1
+        yield from drain()
 
 def load_processed_videos():
     """Load list of already processed videos with thread-safe locking"""
@@ -441,6 +940,159 @@ def save_in_progress_videos(in_progress_videos):
     """Save list of videos currently being processed"""
     save_json_file_with_lock(IN_PROGRESS_FILE, list(in_progress_videos))
 
+def load_encode_history():
+    """Load recorded encode timings (list of dicts)"""
+    return load_json_file_with_lock(ENCODE_HISTORY_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+
+def record_encode_history(entry):
+    """Append one encode record to the history file"""
+    try:
+        update_json_file_with_lock(
+            ENCODE_HISTORY_FILE, lambda history: (history + [entry])[-MAX_HISTORY_RECORDS:])
+        return True
+    except Exception as e:
+        print(f"⚠️  Warning: Could not record encode history: {e}")
+        return False
+
+def enqueue_ingested_videos(video_objects):
+    """Add keys from S3 upload events to the local ingest queue (shared by all daemons on this host)"""
+    new_keys = [obj["Key"] for obj in video_objects]
+
+    def add(queued):
+        present = set(queued)
+        return queued + [k for k in new_keys if k not in present]
+
+    reopen_replaced_sources(video_objects)
+    update_json_file_with_lock(INGEST_QUEUE_FILE, add)
+    print(f"📥 Queued {len(new_keys)} new upload(s): {', '.join(new_keys[:3])}{' ...' if len(new_keys) > 3 else ''}")
+
+def reopen_replaced_sources(video_objects):
+    """
+    Reopen keys whose upload event carries a different ETag than the completed encode
+    (a source replaced at the same key), so the daemon doesn't drop them as already done
+    """
+    records = load_json_file_with_lock(COMPLETED_JOBS_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    records = records if isinstance(records, dict) else {}
+    replaced = [obj["Key"] for obj in video_objects
+                if obj["Key"] in records and obj.get("ETag")
+                and records[obj["Key"]].get("etag") != obj["ETag"].strip('"')]
+    if replaced:
+        JOB_STATE.reopen(replaced)
+        print(f"🔁 {len(replaced)} upload(s) replace an already encoded source, reopened: "
+              f"{', '.join(replaced[:3])}{' ...' if len(replaced) > 3 else ''}")
+    return replaced
+
+def remove_from_ingest_queue(video_key):
+    try:
+        update_json_file_with_lock(INGEST_QUEUE_FILE, lambda queued: [k for k in queued if k != video_key])
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update {INGEST_QUEUE_FILE}: {e}")
+
+def load_failed_videos():
+    """Load retry state for failed videos: {video_key: {attempts, next_retry_at, ...}}"""
+    data = load_json_file_with_lock(FAILED_VIDEOS_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    return data if isinstance(data, dict) else {}
+
+def retry_eligible_videos(all_videos):
+    """Drop quarantined videos and videos still waiting out their retry backoff"""
+    quarantined = load_quarantined_videos()
+    failed = load_failed_videos()
+    now = time.time()
+    return [
+        v for v in all_videos
+        if v not in quarantined and failed.get(v, {}).get("next_retry_at", 0) <= now
+    ]
+
+def record_video_failure(video_key, failure):
+    """
+    Classify a failure and either schedule a retry or quarantine the video
+    Returns: the failure record (with "quarantined" set when it was quarantined)
+    """
+    failure = failure or {"stage": "job", "detail": "", "returncode": None}
+    failure_class, reason = classify_failure(failure["stage"], failure["detail"], failure.get("returncode"))
+    record = {
+        "class": failure_class,
+        "reason": reason,
+        "stage": failure["stage"],
+        "diagnostic": failure["detail"][-2000:],
+    }
+
+    def schedule(attempts):
+        record.update({"attempts": attempts, "failed_at": time.time()})
+        record["quarantined"] = failure_class == PERMANENT or attempts >= MAX_TRANSIENT_ATTEMPTS
+        if record["quarantined"]:
+            record.pop("next_retry_at", None)
+        else:
+            record["next_retry_at"] = time.time() + backoff_seconds(attempts)
+
+    # Used as-is if the state file can't be updated
+    schedule(1)
+
+    def update_failed(failed):
+        schedule(failed.get(video_key, {}).get("attempts", 0) + 1)
+        if record["quarantined"]:
+            failed.pop(video_key, None)
+        else:
+            failed[video_key] = record
+        return failed
+
+    try:
+        update_json_file_with_lock(FAILED_VIDEOS_FILE, update_failed, default={})
+        if record["quarantined"]:
+            update_json_file_with_lock(
+                QUARANTINE_FILE,
+                lambda quarantined: dict(quarantined, **{video_key: dict(record, quarantined_at=time.time())}),
+                default={},
+            )
+    except Exception as e:
+        print(f"⚠️  Warning: Could not record failure for {video_key}: {e}")
+    return record
+
+def record_completed_job(video_key, source_head):
+    """Remember which source version and settings produced a completed job's outputs"""
+    if not source_head:
+        return
+    record = {
+        "etag": (source_head.get("ETag") or "").strip('"'),
+        "size": source_head.get("ContentLength"),
+        "settings": settings_fingerprint(output_settings()),
+        "completed_at": time.time(),
+    }
+    try:
+        update_json_file_with_lock(COMPLETED_JOBS_FILE, lambda data: dict(data, **{video_key: record}), default={})
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update {COMPLETED_JOBS_FILE}: {e}")
+
+def find_changed_sources(video_objects):
+    """
+    Completed sources whose content (ETag/size) or output settings changed since they were encoded
+    video_objects: listing dicts with Key, Size and ETag
+    Returns: (changed keys, number of listed keys with no completion record)
+    """
+    records = load_json_file_with_lock(COMPLETED_JOBS_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    records = records if isinstance(records, dict) else {}
+    settings = settings_fingerprint(output_settings())
+    changed = []
+    unrecorded = 0
+    for obj in video_objects:
+        record = records.get(obj["Key"])
+        if record is None:
+            unrecorded += 1
+        elif (record.get("etag") != (obj.get("ETag") or "").strip('"') or record.get("size") != obj.get("Size")
+              or record.get("settings") != settings):
+            changed.append(obj["Key"])
+    return changed, unrecorded
+
+def clear_video_failure(video_key):
+    """Forget retry state once a video succeeds"""
+    if video_key not in load_failed_videos():
+        return
+    try:
+        update_json_file_with_lock(
+            FAILED_VIDEOS_FILE, lambda failed: {k: v for k, v in failed.items() if k != video_key}, default={})
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update {FAILED_VIDEOS_FILE}: {e}")
+
 def acquire_next_video(all_videos, max_retries=10):
     """
     Thread-safe way to get the next video to process
@@ -457,23 +1109,23 @@ def acquire_next_video(all_videos, max_retries=10):
                     # Load both processed and in-progress videos
                     processed = set(json.load(pf) if os.path.getsize(PROCESSED_LOG_FILE) > 0 else [])
                     
-                    # Also check in-progress file
-                    in_progress = load_in_progress_videos()
+                    selected = []
                     
-                    # Find a video that's neither processed nor in progress
-                    available_videos = [v for v in all_videos if v not in processed and v not in in_progress]
+                    def claim(in_progress):
+                        # Find a video that's neither processed nor in progress, and mark it in-progress
+                        in_progress_set = set(in_progress)
+                        for v in all_videos:
+                            if v not in processed and v not in in_progress_set:
+                                selected.append(v)
+                                return in_progress + [v]
+                        return in_progress
                     
-                    if not available_videos:
-                        return None, False  # No more videos to process
+                    update_json_file_with_lock(IN_PROGRESS_FILE, claim)
                     
-                    # Pick the first available video
-                    selected_video = available_videos[0]
-                    
-                    # Mark it as in-progress
-                    in_progress.add(selected_video)
-                    save_in_progress_videos(in_progress)
+                    if not selected:
+                        return None, False  # No more videos to process
                     
-                    return selected_video, True
+                    return selected[0], True
                     
                 finally:
                     if LOCK_AVAILABLE:
@@ -501,16 +1153,12 @@ def mark_video_complete(video_key):
     Mark a video as completed (move from in-progress to processed)
     """
     try:
-        # Add to processed list
-        processed = load_processed_videos()
-        processed.add(video_key)
-        save_processed_videos(processed)
+        # Add to processed list (read-modify-write under one lock, so parallel completions aren't lost)
+        update_json_file_with_lock(
+            PROCESSED_LOG_FILE, lambda processed: processed if video_key in processed else processed + [video_key])
         
         # Remove from in-progress list
-        in_progress = load_in_progress_videos()
-        if video_key in in_progress:
-            in_progress.remove(video_key)
-            save_in_progress_videos(in_progress)
+        update_json_file_with_lock(IN_PROGRESS_FILE, lambda in_progress: [v for v in in_progress if v != video_key])
         
         return True
     except Exception as e:
@@ -522,15 +1170,63 @@ def mark_video_failed(video_key):
     Remove video from in-progress (so it can be retried later)
     """
     try:
-        in_progress = load_in_progress_videos()
-        if video_key in in_progress:
-            in_progress.remove(video_key)
-            save_in_progress_videos(in_progress)
+        update_json_file_with_lock(IN_PROGRESS_FILE, lambda in_progress: [v for v in in_progress if v != video_key])
         return True
     except Exception as e:
         print(f"❌ Error marking video failed: {e}")
         return False
 
+class FileJobState:
+    """
+    Job-state backend using processed_videos.json / in_progress_videos.json
+    Safe for parallel workers on one host (flock), not across instances
+    """
+
+    name = "file"
+
+    def acquire_next_video(self, all_videos, max_retries=10):
+        return acquire_next_video(all_videos, max_retries)
+
+    def mark_video_complete(self, video_key):
+        return mark_video_complete(video_key)
+
+    def mark_video_failed(self, video_key):
+        return mark_video_failed(video_key)
+
+    def is_video_complete(self, video_key):
+        return video_key in load_processed_videos()
+
+    def status_counts(self, all_videos, fresh=True):
+        """Return (completed, in_progress, remaining) across all workers (the local files are always fresh)"""
+        processed = load_processed_videos()
+        in_progress = load_in_progress_videos()
+        remaining = len([v for v in all_videos if v not in processed and v not in in_progress])
+        return len(processed), len(in_progress), remaining
+
+    def reopen(self, video_keys):
+        """Forget these keys were completed so they are processed again (--reprocess-changed)"""
+        reopened = set(video_keys)
+        update_json_file_with_lock(PROCESSED_LOG_FILE, lambda processed: [k for k in processed if k not in reopened])
+
+    def reset(self):
+        save_processed_videos(set())
+        save_in_progress_videos(set())
+
+def settle_listing_snapshot(snapshot, video_keys):
+    """After a --new-only run: forget pending sources that are now complete, keep the rest for next time"""
+    try:
+        if JOB_STATE.name == "file":
+            # One read instead of one per key
+            is_complete = load_processed_videos().__contains__
+        else:
+            JOB_STATE.status_counts(video_keys)  # refresh the S3 markers
+            is_complete = JOB_STATE.is_video_complete
+        remaining = snapshot.settle(is_complete)
+        if remaining:
+            print(f"📇 {remaining} added/changed sources still pending for the next --new-only run")
+    except Exception as e:
+        print(f"⚠️  Warning: Could not update listing snapshot: {e}")
+
 def signal_handler(sig, frame):
     """
     Handle Ctrl+C and other interrupts gracefully
@@ -540,105 +1236,106 @@ def signal_handler(sig, frame):
     print("\n\n⚠️  Interrupt received! Cleaning up...")
     if CURRENT_VIDEO_KEY:
         print(f"🔓 Releasing lock on: {CURRENT_VIDEO_KEY}")
-        mark_video_failed(CURRENT_VIDEO_KEY)
+        (JOB_STATE or FileJobState()).mark_video_failed(CURRENT_VIDEO_KEY)
     print("✅ Cleanup complete. Exiting.")
     sys.exit(0)
 
-# Main execution - EXACT MATCH to convert_video.py lines 246-295
-if __name__ == "__main__":
-    # Check FFmpeg availability first
-    if not check_ffmpeg():
-        sys.exit(1)
-    
-    # Add argument for forcing re-processing - EXACT MATCH to CLI
-    parser = argparse.ArgumentParser(description="Submit videos to FFmpeg for HLS conversion (S3 to S3).")
-    parser.add_argument("s3_input_folder_prefix", help="Input S3 folder path, e.g. AI CERTs/...")
-    parser.add_argument("input_bucket", help="Input S3 bucket name, e.g. aicertslms")
-    parser.add_argument("output_bucket", help="Output S3 bucket name, e.g. cdn.netcomplus.com")
-    parser.add_argument("output_prefix", help="Output S3 folder prefix, e.g. streams/AI CERTs/...")
-    parser.add_argument("--force", action="store_true", help="Force reprocessing all videos, ignoring processed_videos.json")
-    args = parser.parse_args()
-
-    # Register signal handler for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    s3_input_folder_prefix = args.s3_input_folder_prefix
-    input_bucket = args.input_bucket
-    output_bucket = args.output_bucket
-    output_prefix = args.output_prefix
-    force_reprocess = args.force
-
-    # Get all videos from S3
-    print(f"Listing video objects in s3://{input_bucket}/{s3_input_folder_prefix}...")
-    all_video_keys = list_s3_video_objects(input_bucket, s3_input_folder_prefix)
+def process_claimed_video(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix):
+    """
+    Convert a video this worker has claimed and record the outcome in JOB_STATE
+    Returns: True on success
+    """
+    global CURRENT_VIDEO_KEY
     
-    if not all_video_keys:
-        print(f"No video files found in s3://{input_bucket}/{s3_input_folder_prefix}")
-        sys.exit(0)
+    # Set current video for signal handler
+    CURRENT_VIDEO_KEY = input_key
     
-    # Load processed and in-progress videos
-    processed_videos = load_processed_videos()
-    in_progress_videos = load_in_progress_videos()
+    print(f"\n{'='*60}")
+    print(f"🎬 Acquired video: {input_key}")
+    print(f"{'='*60}")
     
-    print(f"📊 Status:")
-    print(f"   Total videos in S3: {len(all_video_keys)}")
-    print(f"   Already processed: {len(processed_videos)}")
-    print(f"   Currently in progress: {len(in_progress_videos)}")
-    print(f"   Available to process: {len([v for v in all_video_keys if v not in processed_videos and v not in in_progress_videos])}")
-
-    if force_reprocess:
-        print("\n⚠️  Force reprocessing enabled. Clearing processed and in-progress lists...")
-        save_processed_videos(set())
-        save_in_progress_videos(set())
-        print("All videos will be reprocessed.")
+    # Process the video
+    job_id = EVENT_LOG.start_job(input_key, bucket=input_bucket)
+    job_start = time.time()
+    TRACER.start_trace("job", video_key=input_key, job_id=job_id, worker_id=EVENT_LOG.worker_id,
+                       instance_type=detect_instance_type())
+    PROFILER.start(job_id)
+    # The source version this job encodes, recorded on completion for --reprocess-changed
+    try:
+        source_head = s3.head_object(Bucket=input_bucket, Key=input_key)
+    except Exception:
+        source_head = None
+    success = False
+    try:
+        success = submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix,
+                             source_head)
+    finally:
+        profile_dir = PROFILER.stop()
+        TRACER.end_trace(success, last_failure_message(),
+                         failure_stage=None if success else (LAST_FAILURE or {}).get("stage"))
+    if profile_dir:
+        EVENT_LOG.emit("profile", path=profile_dir)
+        print(f"🔬 Profile saved: {profile_dir}")
     
-    print(f"\n🚀 Starting video conversion (parallel-safe mode)...")
-    if LOCK_AVAILABLE:
-        print("✅ File locking enabled - safe for parallel processing")
+    if success:
+        # Mark as complete
+        JOB_STATE.mark_video_complete(input_key)
+        record_completed_job(input_key, source_head)
+        clear_video_failure(input_key)
+        METRICS.jobs.inc(result="completed")
+        EVENT_LOG.end_job("completed", time.time() - job_start)
+        print(f"\n✅ Video marked as COMPLETED")
     else:
-        print("⚠️  File locking not available - avoid running multiple instances")
+        # Mark as failed (removes from in-progress), then decide between retry and quarantine
+        JOB_STATE.mark_video_failed(input_key)
+        record = record_video_failure(input_key, LAST_FAILURE)
+        METRICS.jobs.inc(result="failed")
+        METRICS.failures.inc(**{"class": record["class"], "stage": record["stage"]})
+        EVENT_LOG.end_job("failed", time.time() - job_start, failure_class=record["class"],
+                          failure_reason=record["reason"], failure_stage=record["stage"],
+                          quarantined=record.get("quarantined"))
+        if record.get("quarantined"):
+            print(f"\n❌ Video marked as FAILED ({record['class']}: {record['reason']}) - "
+                  f"quarantined after {record['attempts']} attempt(s), see {QUARANTINE_FILE}")
+        else:
+            retry_in = record["next_retry_at"] - time.time()
+            print(f"\n❌ Video marked as FAILED ({record['class']}: {record['reason']}) - "
+                  f"retry {record['attempts'] + 1}/{MAX_TRANSIENT_ATTEMPTS} in {retry_in / 60:.1f} min")
     
+    # Clear current video after processing
+    CURRENT_VIDEO_KEY = None
+    return success
+
+def run_worker(all_video_keys, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix):
+    """
+    Claim and process videos until none are left
+    Returns: (success_count, failed_count)
+    """
     success_count = 0
     failed_count = 0
     
     # Process videos one at a time, but use thread-safe acquisition
     while True:
-        # Acquire next video to process
-        input_key, should_continue = acquire_next_video(all_video_keys)
+        if DRAIN_REQUESTED:
+            print("\n🛑 Drain requested by supervisor - not taking another video.")
+            break
+        
+        # Acquire next video to process (skipping quarantined videos and ones in retry backoff)
+        input_key, should_continue = JOB_STATE.acquire_next_video(retry_eligible_videos(all_video_keys))
         
         if not should_continue or input_key is None:
             print("\n✅ No more videos to process.")
             break
         
-        # Set current video for signal handler
-        CURRENT_VIDEO_KEY = input_key
-        
-        print(f"\n{'='*60}")
-        print(f"🎬 Acquired video: {input_key}")
-        print(f"{'='*60}")
-        
-        # Process the video
-        success = submit_job(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix)
-        
-        if success:
-            # Mark as complete
-            mark_video_complete(input_key)
+        if process_claimed_video(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix):
             success_count += 1
-            print(f"\n✅ Video marked as COMPLETED")
         else:
-            # Mark as failed (removes from in-progress so it can be retried)
-            mark_video_failed(input_key)
             failed_count += 1
-            print(f"\n❌ Video marked as FAILED (can be retried)")
-        
-        # Clear current video after processing
-        CURRENT_VIDEO_KEY = None
         
-        # Show current progress
-        total_processed = len(load_processed_videos())
-        total_in_progress = len(load_in_progress_videos())
-        remaining = len([v for v in all_video_keys if v not in load_processed_videos() and v not in load_in_progress_videos()])
+        # Show current progress (from cached job state; the final summary re-lists)
+        total_processed, total_in_progress, remaining = JOB_STATE.status_counts(all_video_keys, fresh=False)
+        METRICS.queue_depth.set(remaining)
+        METRICS.in_progress.set(total_in_progress)
         
         print(f"\n📊 Overall Progress:")
         print(f"   ✅ Completed: {total_processed}/{len(all_video_keys)}")
@@ -656,9 +1353,7 @@ if __name__ == "__main__":
     print("="*60)
     
     # Show overall status
-    final_processed = len(load_processed_videos())
-    final_in_progress = len(load_in_progress_videos())
-    final_remaining = len([v for v in all_video_keys if v not in load_processed_videos() and v not in load_in_progress_videos()])
+    final_processed, final_in_progress, final_remaining = JOB_STATE.status_counts(all_video_keys)
     
     print(f"\n📊 Overall Status (all workers):")
     print(f"   ✅ Completed: {final_processed}/{len(all_video_keys)}")
@@ -666,8 +1361,367 @@ if __name__ == "__main__":
     print(f"   ⏳ Remaining: {final_remaining}")
     print("="*60)
     
+    quarantined_videos = load_quarantined_videos()
+    quarantined = [v for v in all_video_keys if v in quarantined_videos]
+    backing_off = len(all_video_keys) - len(retry_eligible_videos(all_video_keys)) - len(quarantined)
+    if quarantined or backing_off:
+        print(f"   🚫 Quarantined: {len(quarantined)} (requeue with requeue_quarantined.py)")
+        print(f"   ⏱️  Waiting for retry backoff: {backing_off}")
+    
     if final_remaining > 0 or final_in_progress > 0:
         print("\n💡 Tip: Other workers may still be processing, or you can run this script again to continue.")
     else:
         print("\n🎉 All videos have been processed!")
+    
+    return success_count, failed_count
+
+def run_daemon(event_source, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix):
+    """
+    Convert uploads as their S3 notifications arrive, without listing the bucket
+    Accepted keys are written to the ingest queue before their SQS messages are
+    deleted, then claimed through JOB_STATE like any other job
+    """
+    print(f"\n📡 Daemon mode: waiting for uploads under s3://{input_bucket}/{s3_input_folder_prefix}")
+    success_count = 0
+    failed_count = 0
+    
+    while not DRAIN_REQUESTED:
+        pending = retry_eligible_videos(load_json_file_with_lock(INGEST_QUEUE_FILE))
+        
+        # Long-poll only when idle, so a busy daemon goes straight back to encoding
+        try:
+            event_source.poll(wait_seconds=0 if pending else None, on_accepted=enqueue_ingested_videos)
+        except Exception as e:
+            print(f"⚠️  Polling {event_source.queue_url} failed: {e}")
+            time.sleep(random.uniform(5, 15))
+            continue
+        
+        pending = retry_eligible_videos(load_json_file_with_lock(INGEST_QUEUE_FILE))
+        METRICS.queue_depth.set(len(pending))
+        if not pending:
+            continue
+        
+        input_key, should_continue = JOB_STATE.acquire_next_video(pending)
+        if input_key is None:
+            # Everything queued is done or claimed by another daemon; drop finished keys
+            completed = [k for k in pending if JOB_STATE.is_video_complete(k)]
+            for key in completed:
+                remove_from_ingest_queue(key)
+            if not completed:
+                time.sleep(1)
+            continue
+        
+        if process_claimed_video(input_key, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix):
+            success_count += 1
+            remove_from_ingest_queue(input_key)
+        else:
+            failed_count += 1
+            if input_key in load_quarantined_videos():
+                remove_from_ingest_queue(input_key)
+        
+        print(f"\n📊 Daemon: ✅ {success_count} | ❌ {failed_count} | ⏳ queued {len(pending) - 1} | "
+              f"events {event_source.stats}")
+    
+    print("\n🛑 Daemon stopped.")
+    return success_count, failed_count
+
+def drain_handler(sig, frame):
+    """Stop after the current video (sent by the supervisor when scaling down)"""
+    global DRAIN_REQUESTED
+    DRAIN_REQUESTED = True
+    print("\n🛑 Drain requested - finishing current video before exiting")
+
+# Main execution - EXACT MATCH to convert_video.py lines 246-295
+if __name__ == "__main__":
+    # Add argument for forcing re-processing - EXACT MATCH to CLI
+    parser = argparse.ArgumentParser(description="Submit videos to FFmpeg for HLS conversion (S3 to S3).")
+    parser.add_argument("s3_input_folder_prefix", help="Input S3 folder path, e.g. AI CERTs/...")
+    parser.add_argument("input_bucket", help="Input S3 bucket name, e.g. aicertslms")
+    parser.add_argument("output_bucket", help="Output S3 bucket name, e.g. cdn.netcomplus.com")
+    parser.add_argument("output_prefix", help="Output S3 folder prefix, e.g. streams/AI CERTs/...")
+    parser.add_argument("--force", action="store_true", help="Force reprocessing all videos, ignoring processed_videos.json")
+    parser.add_argument("--coordination", choices=["file", "s3"], default="file",
+                        help="Job-state backend: 'file' (flock on local JSON, one host) or 's3' (lease objects, many hosts)")
+    parser.add_argument("--lease-bucket", help="Bucket holding S3 lease objects (default: output bucket)")
+    parser.add_argument("--lease-prefix", help="Prefix for S3 lease objects (default: _coordination/<input bucket>/)")
+    parser.add_argument("--lease-seconds", type=int, default=DEFAULT_LEASE_SECONDS,
+                        help="Seconds before an unrenewed S3 lease (or --shard claim) can be taken over")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="Own only keys with hash(key) %% N == i, then steal from other shards' tails (S3 claim markers, no shared lock)")
+    parser.add_argument("--order", choices=ORDER_MODES, default="lpt",
+                        help="Dispatch order: lpt = longest predicted encode first (default), spt = shortest first, listing = S3 listing order")
+    parser.add_argument("--probe-sources", action="store_true",
+                        help="ffprobe every source over a presigned URL before planning, for better encode-time predictions")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="Supervisor mode: list and plan once, then run N pinned worker processes and restart any that crash")
+    parser.add_argument("--max-restarts", type=int, default=5, help="Restarts allowed per crashed worker in --workers mode")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="With --workers N: scale between --min-workers and N concurrent encodes from load, memory, scratch disk and ffmpeg speed")
+    parser.add_argument("--min-workers", type=int, default=1, help="Lower bound for --adaptive")
+    parser.add_argument("--ffmpeg-threads", type=int, default=0, help="ffmpeg -threads value per encode (0 = ffmpeg decides)")
+    parser.add_argument("--listing-threads", type=int, default=1,
+                        help="List sub-folders concurrently with this many threads (1 = single paginated listing)")
+    parser.add_argument("--listing-cache", action="store_true",
+                        help="Keep a local snapshot of the input listing, reuse it while fresh and report added/changed/deleted sources")
+    parser.add_argument("--listing-max-age", type=int, default=DEFAULT_MAX_AGE_SECONDS,
+                        help="Seconds a listing snapshot is reused without re-listing (with --listing-cache)")
+    parser.add_argument("--new-only", action="store_true",
+                        help="With --listing-cache: re-list and queue only sources added or changed since the last snapshot "
+                             "(the first run only saves the baseline snapshot and queues nothing)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Instead of listing, convert uploads as S3 ObjectCreated events arrive on --queue-url")
+    parser.add_argument("--queue-url", help="SQS queue receiving the input bucket's ObjectCreated notifications (with --daemon)")
+    parser.add_argument("--no-preflight", action="store_true",
+                        help="Skip the ranged-read container check before each download")
+    parser.add_argument("--dedupe", choices=DEDUPE_MODES, default="off",
+                        help="Copy an earlier encode's outputs for duplicate sources, matched by ETag+size "
+                             "or by SHA-256 of the download (default: off)")
+    parser.add_argument("--near-dupes", choices=NEAR_DUPE_MODES, default="off",
+                        help="Fingerprint sources to catch re-exports of already encoded videos: "
+                             "flag them for review, skip (quarantine) them, or reuse the earlier outputs (default: off)")
+    parser.add_argument("--near-dupe-threshold", type=float, default=DEFAULT_NEAR_DUPE_THRESHOLD,
+                        help=f"Similarity (0-1) at which sources count as near-duplicates (default: {DEFAULT_NEAR_DUPE_THRESHOLD})")
+    parser.add_argument("--reprocess-changed", action="store_true",
+                        help="Re-encode completed videos whose source was replaced (new ETag/size) or whose "
+                             "renditions, audio/segment settings or ffmpeg version changed")
+    parser.add_argument("--encode-cache-gb", type=float, default=0,
+                        help="Keep up to this many GB of finished encodes on local disk, reused when the same source "
+                             "and settings come round again (default: 0 = off)")
+    parser.add_argument("--encode-cache-dir", default=DEFAULT_ENCODE_CACHE_DIR,
+                        help=f"Directory for --encode-cache-gb (default: {DEFAULT_ENCODE_CACHE_DIR})")
+    parser.add_argument("--bitexact", action="store_true",
+                        help="Ask ffmpeg for bit-identical output across runs (no encoder version tags)")
+    parser.add_argument("--no-trick-play", action="store_true",
+                        help="Don't write I-frame playlists and thumbnail sprites (seek previews)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this port (supervised worker wN uses port + N)")
+    parser.add_argument("--profile", action="store_true",
+                        help="cProfile each job and run ffmpeg with -benchmark_all; artifacts under job_events/profiles/")
+    parser.add_argument("--trace-upload-sample", type=float, default=DEFAULT_UPLOAD_SAMPLE_RATE,
+                        help="Fraction of uploaded files that get their own trace span (default: 0.05)")
+    parser.add_argument("--job-list", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.shard and args.coordination == "s3":
+        parser.error("--shard uses its own S3 claim markers; don't combine it with --coordination s3")
+    if args.force and args.reprocess_changed:
+        parser.error("--force already re-encodes everything; use one of --force and --reprocess-changed")
+    if args.new_only and not args.listing_cache:
+        parser.error("--new-only needs --listing-cache")
+    if args.daemon and not args.queue_url:
+        parser.error("--daemon needs --queue-url")
+    if args.daemon and args.workers:
+        parser.error("--daemon runs a single worker; start one daemon per worker instead of --workers")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.listing_threads > S3_MAX_POOL_CONNECTIONS:
+        s3 = make_s3_client(args.listing_threads)
+    
+    WORKER_ID = args.worker_id
+    FFMPEG_THREADS = args.ffmpeg_threads
+    PREFLIGHT_ENABLED = not args.no_preflight
+    DEDUPE_MODE = args.dedupe
+    NEAR_DUPE_MODE = args.near_dupes
+    NEAR_DUPE_THRESHOLD = args.near_dupe_threshold
+    BITEXACT = args.bitexact
+    TRICK_PLAY_ENABLED = not args.no_trick_play
+    if args.encode_cache_gb > 0:
+        ENCODE_CACHE = EncodeCache(int(args.encode_cache_gb * 1024**3), args.encode_cache_dir)
+    EVENT_LOG = JobEventLog(worker_id=WORKER_ID)
+    PROFILER = JobProfiler(enabled=args.profile)
+    TRACER = JobTracer(worker_id=WORKER_ID, upload_sample_rate=args.trace_upload_sample)
+    # Listing, planning and state setup; stopped when the first job starts
+    PROFILER.start(f"startup-{EVENT_LOG.host}-{EVENT_LOG.worker_id}-{os.getpid()}")
+    
+    # Check FFmpeg availability first (supervised workers rely on the supervisor's check)
+    if not args.job_list and not check_ffmpeg():
+        sys.exit(1)
+
+    # Register signal handler for graceful shutdown
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, drain_handler)
+    
+    # Metrics endpoint per worker process (the supervisor itself runs no jobs)
+    if args.metrics_port is not None and not args.workers:
+        metrics_port = args.metrics_port
+        if WORKER_ID and WORKER_ID[1:].isdigit():
+            metrics_port += int(WORKER_ID[1:])
+        try:
+            start_metrics_server(metrics_port)
+            print(f"📈 Metrics: http://localhost:{metrics_port}/metrics")
+        except OSError as e:
+            print(f"⚠️  Could not start metrics endpoint on port {metrics_port}: {e}")
+    
+    s3_input_folder_prefix = args.s3_input_folder_prefix
+    input_bucket = args.input_bucket
+    output_bucket = args.output_bucket
+    output_prefix = args.output_prefix
+    force_reprocess = args.force
+
+    if args.shard:
+        JOB_STATE = ShardedJobState(
+            s3,
+            args.lease_bucket or output_bucket,
+            args.lease_prefix or f"_coordination/{input_bucket}/",
+            args.shard[0],
+            args.shard[1],
+            stale_seconds=args.lease_seconds,
+        )
+    elif args.coordination == "s3":
+        JOB_STATE = S3LeaseJobState(
+            s3,
+            args.lease_bucket or output_bucket,
+            args.lease_prefix or f"_coordination/{input_bucket}/",
+            lease_seconds=args.lease_seconds,
+        )
+    else:
+        JOB_STATE = FileJobState()
+
+    if args.daemon:
+        event_source = S3EventSource(
+            boto3.client("sqs", region_name=AWS_REGION),
+            args.queue_url,
+            input_bucket,
+            s3_input_folder_prefix,
+            accept=is_video_listing_entry,
+        )
+        PROFILER.stop()
+        run_daemon(event_source, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix)
+        sys.exit(0)
+    
+    snapshot = None
+    if args.job_list:
+        # Supervised worker: the supervisor already listed and planned
+        all_video_keys = load_json_file_with_lock(args.job_list)
+        print(f"📋 Worker {WORKER_ID}: {len(all_video_keys)} videos in plan {args.job_list}")
+        if not all_video_keys:
+            sys.exit(0)
+    else:
+        # Get all videos from S3 (or a recent local snapshot of the listing)
+        snapshot = ListingSnapshot(input_bucket, s3_input_folder_prefix) if args.listing_cache else None
+        if snapshot and snapshot.is_fresh(args.listing_max_age) and not args.new_only:
+            print(f"📇 Using listing snapshot from {snapshot.age_seconds() / 60:.1f} min ago ({snapshot.path})")
+            video_objects = snapshot.objects()
+        else:
+            print(f"Listing video objects in s3://{input_bucket}/{s3_input_folder_prefix}...")
+            video_objects = list_s3_video_object_info(input_bucket, s3_input_folder_prefix,
+                                                      listing_threads=args.listing_threads)
+            print(f"   Found {len(video_objects)} videos")
+            if snapshot:
+                had_snapshot = snapshot.refreshed_at is not None
+                delta = snapshot.refresh(video_objects)
+                if had_snapshot:
+                    print(f"📇 Changes since last snapshot: {delta.summary()}")
+                    for key in delta.deleted[:10]:
+                        print(f"   - deleted: {key}")
+                    if args.new_only:
+                        # Changed sources are already marked complete; reopen them once
+                        changed = snapshot.pending_changed()
+                        if changed:
+                            JOB_STATE.reopen(changed)
+                            snapshot.mark_reopened(changed)
+                        # Pending also keeps earlier deltas that a crashed or failed run didn't finish
+                        queued = set(snapshot.pending)
+                        video_objects = [obj for obj in video_objects if obj["Key"] in queued]
+                        print(f"   Queueing only the {len(video_objects)} added/changed sources "
+                              f"({len(changed)} changed reopened)")
+                else:
+                    print(f"📇 Saved first listing snapshot: {snapshot.path}")
+                    if args.new_only:
+                        print("   It is the baseline for --new-only: nothing queued this run. Later --new-only "
+                              "runs queue what is added or changed from now on; run once without --new-only "
+                              "to process the existing catalog.")
+                        sys.exit(0)
+        
+        if not video_objects:
+            print(f"No video files found in s3://{input_bucket}/{s3_input_folder_prefix}")
+            sys.exit(0)
+        
+        # Plan dispatch order from listing sizes, probes and past encode timings
+        probes = None
+        if args.probe_sources:
+            print(f"🔍 Probing {len(video_objects)} sources for duration and resolution...")
+            probes = probe_sources(s3, input_bucket, [obj["Key"] for obj in video_objects])
+        all_video_keys, predicted_seconds = plan_job_order(
+            video_objects, load_encode_history(), probes, mode=args.order)
+        if predicted_seconds:
+            print(f"📋 Job order: {args.order.upper()} - predicted total encode time "
+                  f"{sum(predicted_seconds.values()) / 3600:.1f} h, "
+                  f"longest job {max(predicted_seconds.values()) / 60:.1f} min")
+        
+        if args.reprocess_changed:
+            changed, unrecorded = find_changed_sources(video_objects)
+            print(f"🔁 {len(changed)} completed videos changed since they were encoded (source or settings)")
+            for key in changed[:10]:
+                print(f"   ~ {key}")
+            if unrecorded:
+                print(f"   {unrecorded} listed videos have no completion record (not yet done, or done before "
+                      f"{COMPLETED_JOBS_FILE} existed) - left as they are")
+            JOB_STATE.reopen(changed)
+        
+        # Load processed and in-progress videos
+        completed_count, in_progress_count, available_count = JOB_STATE.status_counts(all_video_keys)
+        
+        print(f"📊 Status:")
+        print(f"   Total videos in S3: {len(all_video_keys)}")
+        print(f"   Already processed: {completed_count}")
+        print(f"   Currently in progress: {in_progress_count}")
+        print(f"   Available to process: {available_count}")
+
+        if force_reprocess:
+            print("\n⚠️  Force reprocessing enabled. Clearing processed and in-progress lists...")
+            JOB_STATE.reset()
+            # Otherwise duplicates would be copied from outputs that are about to be replaced
+            save_json_file_with_lock(DEDUPE_INDEX_FILE, {})
+            save_json_file_with_lock(NEAR_DUPE_INDEX_FILE, {})
+            print("All videos will be reprocessed.")
+    
+    print(f"\n🚀 Starting video conversion (parallel-safe mode)...")
+    if JOB_STATE.name == "s3":
+        print(f"✅ S3 lease coordination: s3://{JOB_STATE.bucket}/{JOB_STATE.prefix} - safe across instances")
+    elif JOB_STATE.name == "shard":
+        owned = len(JOB_STATE.owned_keys(all_video_keys))
+        print(f"✅ Shard {JOB_STATE.shard_index}/{JOB_STATE.shard_count}: owns {owned} videos, steals from other shards when done")
+    elif LOCK_AVAILABLE:
+        print("✅ File locking enabled - safe for parallel processing")
+    else:
+        print("⚠️  File locking not available - avoid running multiple instances")
+    
+    if args.workers:
+        # Supervisor mode: workers reuse this listing and plan instead of re-listing
+        save_json_file_with_lock(JOB_PLAN_FILE, all_video_keys)
+        child_command = [sys.executable, os.path.abspath(__file__)] + strip_cli_options(
+            sys.argv[1:],
+            options_with_value=("--workers", "--job-list", "--worker-id", "--ffmpeg-threads",
+                                "--min-workers", "--max-restarts"),
+            flags=("--force", "--reprocess-changed", "--probe-sources", "--adaptive"),
+        ) + ["--job-list", JOB_PLAN_FILE]
+        print(f"\n👷 Supervising {args.workers} workers (plan: {JOB_PLAN_FILE})")
+        controller = None
+        if args.adaptive:
+            controller = ConcurrencyController(args.min_workers, args.workers,
+                                               initial_workers=args.min_workers)
+            print(f"📈 Adaptive concurrency: {controller.min_workers}-{controller.max_workers} workers "
+                  f"(decisions in {controller.metrics_file})")
+        supervisor = WorkerSupervisor(
+            args.workers,
+            child_command,
+            max_restarts=args.max_restarts,
+            controller=controller,
+            # S3 leases expire on their own; local in-progress entries need an explicit release
+            on_crash=JOB_STATE.mark_video_failed if JOB_STATE.name == "file" else None,
+        )
+        PROFILER.stop()
+        exit_code = supervisor.run()
+        if args.new_only:
+            settle_listing_snapshot(snapshot, all_video_keys)
+        sys.exit(exit_code)
+    
+    PROFILER.stop()
+    run_worker(all_video_keys, input_bucket, output_bucket, output_prefix, s3_input_folder_prefix)
+    if snapshot and args.new_only:
+        settle_listing_snapshot(snapshot, all_video_keys)
+
 
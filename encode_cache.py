@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Local Encode Cache
+Keeps the HLS outputs of recent encodes on local disk, keyed by the source
+fingerprint (ETag + size, see source_dedupe.py) and a hash of everything
+that decides the ffmpeg output (renditions, audio and segment settings,
+ffmpeg version, thread count, bitexact flags). A retry after an upload
+failure, or a --force rerun after an upload-side fix, then skips the
+download and encode and only uploads again.
+
+Layout:
+    encode_cache/<cache key>/entry.json     source key, file list, size
+    encode_cache/<cache key>/<outputs>      MASTER*.m3u8 and seg_*.ts
+
+Files are hard-linked in and out where the filesystem allows, so storing
+and restoring cost no copies. The directory mtime is the LRU clock; the
+least recently used entries are evicted once the cache is over max_bytes.
+Entries are renamed into place, so workers sharing the cache never see a
+half-written one.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+DEFAULT_CACHE_DIR = "encode_cache"
+ENTRY_FILE = "entry.json"
+
+
+def settings_fingerprint(settings):
+    """Stable short hash of a JSON-serialisable settings dict"""
+    encoded = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class EncodeCache:
+    def __init__(self, max_bytes, root=DEFAULT_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, source_fingerprint, settings_hash):
+        return hashlib.sha256(f"{source_fingerprint}|{settings_hash}".encode("utf-8")).hexdigest()[:32]
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def restore(self, key, output_dir):
+        """Link a cached encode into output_dir; False on a miss or if it was evicted meanwhile"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, ENTRY_FILE)) as f:
+                entry = json.load(f)
+            os.makedirs(output_dir, exist_ok=True)
+            for name in entry["files"]:
+                _link_or_copy(os.path.join(entry_dir, name), os.path.join(output_dir, name))
+            os.utime(entry_dir)
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return False
+        return entry
+
+    def store(self, key, output_dir, video_key):
+        """Add an encode's outputs; returns the bytes stored (0 if already cached or on error)"""
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            os.utime(entry_dir)
+            return 0
+        staging = os.path.join(self.root, f".staging-{os.getpid()}-{key}")
+        try:
+            os.makedirs(staging)
+            files = sorted(os.listdir(output_dir))
+            for name in files:
+                _link_or_copy(os.path.join(output_dir, name), os.path.join(staging, name))
+            size = sum(os.path.getsize(os.path.join(staging, name)) for name in files)
+            with open(os.path.join(staging, ENTRY_FILE), "w") as f:
+                json.dump({"key": video_key, "files": files, "bytes": size, "stored_at": time.time()}, f)
+            os.rename(staging, entry_dir)
+        except OSError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            # Another worker stored the same encode first
+            if os.path.exists(entry_dir):
+                return 0
+            print(f"⚠️  Warning: Could not cache encode: {e}")
+            return 0
+        self.evict()
+        return size
+
+    def entries(self):
+        """[(last_used, bytes, key)] for every complete entry"""
+        result = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            try:
+                with open(os.path.join(self.root, name, ENTRY_FILE)) as f:
+                    size = json.load(f)["bytes"]
+                result.append((os.path.getmtime(os.path.join(self.root, name)), size, name))
+            except (OSError, ValueError, KeyError):
+                continue
+        return result
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            # Rename first so a concurrent restore fails cleanly instead of linking half an entry
+            doomed = os.path.join(self.root, f".evicting-{os.getpid()}-{key}")
+            try:
+                os.rename(self._entry_dir(key), doomed)
+            except OSError:
+                continue
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+            evicted += 1
+        if evicted:
+            print(f"🧹 Encode cache: evicted {evicted} entries, {total / (1024**3):.2f} GB kept")
+        return evicted
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+S3 Event Ingestion
+Turns S3 ObjectCreated notifications delivered through an SQS queue (directly
+or wrapped in an SNS envelope) into video jobs, so new uploads are converted
+as they arrive instead of waiting for the next batch listing.
+
+Events are filtered with the same rules as list_s3_video_objects (bucket,
+input prefix, '._' files, under-1KB files, video extensions) and
+deduplicated on (key, ETag), since S3 delivers notifications at least once.
+"""
+
+import json
+from collections import OrderedDict
+from urllib.parse import unquote_plus
+
+# Remember this many (key, etag) pairs for duplicate suppression
+DEDUPE_WINDOW = 100000
+
+
+def parse_s3_event_records(message_body):
+    """
+    Extract ObjectCreated records from an SQS message body
+    Returns: list of dicts with Bucket, Key, Size, ETag and EventName
+    """
+    try:
+        payload = json.loads(message_body)
+    except (TypeError, json.JSONDecodeError):
+        return []
+
+    # S3 -> SNS -> SQS wraps the notification in an SNS envelope
+    if isinstance(payload, dict) and "Records" not in payload and "Message" in payload:
+        try:
+            payload = json.loads(payload["Message"])
+        except (TypeError, json.JSONDecodeError):
+            return []
+
+    records = []
+    for record in (payload.get("Records") or []) if isinstance(payload, dict) else []:
+        event_name = record.get("eventName", "")
+        if not event_name.startswith("ObjectCreated"):
+            continue
+        s3_info = record.get("s3", {})
+        obj = s3_info.get("object", {})
+        if "key" not in obj:
+            continue
+        records.append({
+            "Bucket": s3_info.get("bucket", {}).get("name"),
+            # Keys in notifications are URL-encoded with '+' for spaces
+            "Key": unquote_plus(obj["key"]),
+            "Size": obj.get("size", 0),
+            "ETag": obj.get("eTag"),
+            "EventName": event_name,
+        })
+    return records
+
+
+class S3EventSource:
+    """
+    Poll an SQS queue for S3 upload notifications
+    accept(obj) applies the listing filter; only accepted, unseen objects are returned
+    """
+
+    def __init__(self, sqs_client, queue_url, bucket, prefix, accept, wait_seconds=20,
+                 visibility_timeout=60):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.bucket = bucket
+        self.prefix = prefix
+        self.accept = accept
+        self.wait_seconds = wait_seconds
+        self.visibility_timeout = visibility_timeout
+        self._seen = OrderedDict()
+        self.stats = {"messages": 0, "records": 0, "accepted": 0, "duplicates": 0, "filtered": 0}
+
+    def _is_duplicate(self, obj):
+        marker = (obj["Key"], obj.get("ETag"))
+        if marker in self._seen:
+            self._seen.move_to_end(marker)
+            return True
+        self._seen[marker] = True
+        if len(self._seen) > DEDUPE_WINDOW:
+            self._seen.popitem(last=False)
+        return False
+
+    def poll(self, wait_seconds=None, on_accepted=None):
+        """
+        Receive one batch of messages and return the new video objects
+        on_accepted(objects) is called before the messages are deleted, so a
+        crash between receive and enqueue redelivers instead of losing uploads
+        """
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=self.wait_seconds if wait_seconds is None else wait_seconds,
+            VisibilityTimeout=self.visibility_timeout,
+        )
+        messages = response.get("Messages", [])
+        accepted = []
+        for message in messages:
+            self.stats["messages"] += 1
+            for obj in parse_s3_event_records(message.get("Body")):
+                self.stats["records"] += 1
+                if obj["Bucket"] != self.bucket or not obj["Key"].startswith(self.prefix) \
+                        or not self.accept(obj):
+                    self.stats["filtered"] += 1
+                    continue
+                if self._is_duplicate(obj):
+                    self.stats["duplicates"] += 1
+                    continue
+                accepted.append(obj)
+
+        if accepted and on_accepted:
+            try:
+                on_accepted(accepted)
+            except Exception:
+                # Leave the messages for redelivery and forget we saw them
+                for obj in accepted:
+                    self._seen.pop((obj["Key"], obj.get("ETag")), None)
+                raise
+        self.stats["accepted"] += len(accepted)
+
+        for message in messages:
+            self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message["ReceiptHandle"])
+        return accepted
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Failure Classification
+Decides whether a failed job is worth retrying. Corrupt or unsupported
+sources (missing moov atom, no video stream, undecodable data, 404/403 on the
+source) fail the same way every time, so they are 'permanent' and go straight
+to quarantine. Throttling, timeouts, dropped connections and OOM kills are
+'transient' and retried with exponential backoff until MAX_TRANSIENT_ATTEMPTS.
+Anything unrecognised is treated as transient, so a new error message costs a
+few retries rather than silently dropping a video.
+"""
+
+import random
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+MAX_TRANSIENT_ATTEMPTS = 5
+BASE_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 6 * 3600
+
+# (substring of lowercased diagnostic, reason) - first match wins
+PERMANENT_PATTERNS = [
+    ("moov atom not found", "missing moov atom (truncated or unfinished upload)"),
+    ("invalid data found when processing input", "undecodable source data"),
+    ("does not contain any stream", "source has no streams"),
+    ("could not find codec parameters", "could not determine codec parameters"),
+    ("matches no streams", "source has no video stream"),
+    ("no video stream", "source has no video stream"),
+    ("invalid nal unit", "corrupt H.264 bitstream"),
+    ("source too small", "source too small"),
+    ("preflight", "failed pre-flight validation"),
+    ("nosuchkey", "source no longer exists"),
+    ("the specified key does not exist", "source no longer exists"),
+    # botocore's HeadObject/download_file 404: "An error occurred (404) when calling the HeadObject operation: Not Found"
+    ("(404) when calling", "source no longer exists"),
+    ("accessdenied", "access denied to source"),
+    ("forbidden", "access denied to source"),
+]
+
+TRANSIENT_PATTERNS = [
+    ("slowdown", "S3 throttling"),
+    ("throttl", "throttling"),
+    ("requesttimeout", "request timeout"),
+    ("timed out", "timeout"),
+    ("timeout", "timeout"),
+    ("internalerror", "S3 internal error"),
+    ("serviceunavailable", "service unavailable"),
+    ("connection reset", "connection reset"),
+    ("connection aborted", "connection aborted"),
+    ("endpointconnectionerror", "could not reach endpoint"),
+    ("broken pipe", "broken pipe"),
+    ("no space left on device", "scratch disk full"),
+    ("cannot allocate memory", "out of memory"),
+]
+
+
+def classify_failure(stage, detail, returncode=None):
+    """
+    Classify one failure
+    stage: 'preflight', 'download', 'near_duplicate', 'encode', 'upload' or 'job'
+    detail: ffmpeg stderr or exception text
+    Returns: (failure_class, reason)
+    """
+    text = (detail or "").lower()
+
+    # Held for an operator to compare with the earlier encode (see near_duplicates.py)
+    if stage == "near_duplicate":
+        return PERMANENT, "near-duplicate of an encoded source"
+
+    # ffmpeg killed by a signal (OOM killer, supervisor restart) says nothing about the source
+    if returncode is not None and returncode < 0:
+        return TRANSIENT, f"ffmpeg killed by signal {-returncode}"
+
+    for pattern, reason in TRANSIENT_PATTERNS:
+        if pattern in text:
+            return TRANSIENT, reason
+    for pattern, reason in PERMANENT_PATTERNS:
+        if pattern in text:
+            return PERMANENT, reason
+    if stage == "preflight":
+        return PERMANENT, "failed pre-flight validation"
+    return TRANSIENT, f"unclassified {stage} failure"
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter for the given attempt count (1-based)"""
+    delay = min(BASE_BACKOFF_SECONDS * (2 ** max(0, attempts - 1)), MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
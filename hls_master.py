@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+HLS Master Playlist
+Builds MASTER.m3u8 from what the encode actually produced rather than
+from the rendition table:
+
+    BANDWIDTH           peak segment bitrate (segment bytes * 8 / #EXTINF),
+                        which is what the HLS spec asks for
+    AVERAGE-BANDWIDTH   all segment bytes * 8 / total duration
+    CODECS              avc1.PPCCLL from the profile and level ffprobe reads
+                        off the first segment, plus mp4a.40.2 when there is
+                        an AAC track
+    RESOLUTION          the segment's real width x height (the scale filter
+                        keeps the source aspect ratio, so widths differ from
+                        the nominal ones for non-16:9 sources)
+
+Segment sizes include the MPEG-TS container and audio, so both bandwidths
+are what a player actually downloads. A field that can't be measured falls
+back to the nominal rendition value with a warning.
+"""
+
+import os
+import json
+import subprocess
+
+# H.264 profile_idc per ffprobe profile name (first byte of the avc1.PPCCLL codec string)
+AVC_PROFILE_IDC = {"Baseline": 66, "Constrained Baseline": 66, "Main": 77, "High": 100}
+
+# constraint_set flags x264 writes for each profile (second byte of avc1.PPCCLL)
+AVC_CONSTRAINT_FLAGS = {"Constrained Baseline": 0xC0, "Main": 0x40}
+
+AAC_LC_CODEC = "mp4a.40.2"
+FALLBACK_VIDEO_CODEC = "avc1.4d401f"
+
+
+def parse_media_playlist(text):
+    """{"target_duration", "endlist", "segments": [(uri, duration)]}"""
+    playlist = {"target_duration": None, "endlist": False, "segments": []}
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist["target_duration"] = int(line.split(":", 1)[1])
+        elif line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+        elif line == "#EXT-X-ENDLIST":
+            playlist["endlist"] = True
+        elif line and not line.startswith("#"):
+            playlist["segments"].append((line, duration))
+            duration = None
+    return playlist
+
+
+def avc_codec_string(profile, level):
+    """RFC 6381 codec string for an ffprobe profile name and level (31 -> level 3.1); None if unknown"""
+    profile_idc = AVC_PROFILE_IDC.get(profile)
+    if profile_idc is None or not level or level < 0:
+        return None
+    return f"avc1.{profile_idc:02x}{AVC_CONSTRAINT_FLAGS.get(profile, 0):02x}{int(level):02x}"
+
+
+def measure_bandwidth(output_dir, playlist_name):
+    """
+    Peak and average bitrate of one rendition from its segment files
+    Returns: {"bandwidth", "average_bandwidth", "first_segment"} or None if nothing to measure
+    """
+    with open(os.path.join(output_dir, playlist_name)) as f:
+        playlist = parse_media_playlist(f.read())
+    peak, total_bytes, total_duration = 0, 0, 0.0
+    for uri, duration in playlist["segments"]:
+        size = os.path.getsize(os.path.join(output_dir, uri))
+        total_bytes += size
+        if duration and duration > 0:
+            total_duration += duration
+            peak = max(peak, size * 8 / duration)
+    if not total_duration:
+        return None
+    return {
+        "bandwidth": int(round(peak)),
+        "average_bandwidth": int(round(total_bytes * 8 / total_duration)),
+        "first_segment": os.path.join(output_dir, playlist["segments"][0][0]),
+    }
+
+
+def probe_stream_info(segment_path):
+    """{"width", "height", "codecs"} read from one output segment"""
+    cmd = ["ffprobe", "-v", "error", "-show_streams", "-of", "json", segment_path]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-300:] or "ffprobe failed")
+    streams = json.loads(result.stdout).get("streams", [])
+    video = next((s for s in streams if s.get("codec_type", "video") == "video" and s.get("width")), None)
+    if video is None:
+        raise RuntimeError("no video stream")
+    codecs = [avc_codec_string(video.get("profile"), video.get("level"))]
+    if any(s.get("codec_type") == "audio" and s.get("codec_name") == "aac" for s in streams):
+        codecs.append(AAC_LC_CODEC)
+    return {"width": video["width"], "height": video["height"], "codecs": codecs}
+
+
+def rendition_variant(output_dir, rendition, audio_bitrate):
+    """Measured #EXT-X-STREAM-INF attributes for one rendition, nominal values where measuring failed"""
+    playlist_name = f"MASTER_{rendition['name_modifier']}.m3u8"
+    variant = {
+        "uri": playlist_name,
+        "bandwidth": rendition["bitrate"] + audio_bitrate,
+        "average_bandwidth": None,
+        "codecs": f"{FALLBACK_VIDEO_CODEC},{AAC_LC_CODEC}",
+        "resolution": f"{rendition['width']}x{rendition['height']}",
+    }
+    try:
+        measured = measure_bandwidth(output_dir, playlist_name)
+    except (OSError, ValueError) as e:
+        measured = None
+        print(f"⚠️  Warning: Could not measure {rendition['name_modifier']} bandwidth: {e}")
+    if measured is None:
+        return variant
+    variant["bandwidth"] = measured["bandwidth"]
+    variant["average_bandwidth"] = measured["average_bandwidth"]
+    try:
+        info = probe_stream_info(measured["first_segment"])
+    except (OSError, ValueError, RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️  Warning: Could not probe {rendition['name_modifier']} output, using nominal CODECS/RESOLUTION: {e}")
+        return variant
+    video_codec = info["codecs"][0] or FALLBACK_VIDEO_CODEC
+    variant["codecs"] = ",".join([video_codec] + info["codecs"][1:])
+    variant["resolution"] = f"{info['width']}x{info['height']}"
+    return variant
+
+
+def build_master_playlist(variants, fps, iframe_variants=()):
+    """
+    MASTER.m3u8 text for rendition_variant() results, in MediaConvert's attribute order
+    iframe_variants: optional {"uri", "bandwidth", "average_bandwidth", "codecs", "resolution"}
+    for #EXT-X-I-FRAME-STREAM-INF (see trick_play.py)
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for variant in variants:
+        attributes = [f"BANDWIDTH={variant['bandwidth']}"]
+        if variant["average_bandwidth"]:
+            attributes.append(f"AVERAGE-BANDWIDTH={variant['average_bandwidth']}")
+        attributes += [f'CODECS="{variant["codecs"]}"', f"RESOLUTION={variant['resolution']}", f"FRAME-RATE={fps:.3f}"]
+        lines.append("#EXT-X-STREAM-INF:" + ",".join(attributes))
+        lines.append(variant["uri"])
+    for variant in iframe_variants:
+        lines.append(f"#EXT-X-I-FRAME-STREAM-INF:BANDWIDTH={variant['bandwidth']},"
+                     f"AVERAGE-BANDWIDTH={variant['average_bandwidth']},"
+                     f'CODECS="{variant["codecs"]}",RESOLUTION={variant["resolution"]},URI="{variant["uri"]}"')
+    return "\n".join(lines) + "\n"
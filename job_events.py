@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Structured Job Event Log
+One JSON object per line for every job stage, next to the human-readable
+emoji output. Each worker process appends to its own file under
+job_events/ (no locking, no interleaved lines); job_report.py reads them all.
+
+Every event carries: ts, event, job_id, video_key, worker_id, host and
+instance_type. Stage events add stage, seconds and whatever the stage knows
+(bytes, source duration/resolution, rendition, realtime factor, result).
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+import urllib.request
+
+JOB_EVENTS_DIR = "job_events"
+
+# EC2 instance metadata (IMDSv2); answers in well under a second on EC2
+IMDS_URL = "http://169.254.169.254/latest"
+IMDS_TIMEOUT_SECONDS = 0.5
+
+_instance_type = None
+
+
+def detect_instance_type():
+    """EC2 instance type from $INSTANCE_TYPE or instance metadata, else 'unknown'"""
+    global _instance_type
+    if _instance_type is not None:
+        return _instance_type
+    _instance_type = os.environ.get("INSTANCE_TYPE")
+    if not _instance_type:
+        try:
+            token_request = urllib.request.Request(
+                f"{IMDS_URL}/api/token", method="PUT",
+                headers={"X-aws-ec2-metadata-token-ttl-seconds": "60"})
+            token = urllib.request.urlopen(token_request, timeout=IMDS_TIMEOUT_SECONDS).read().decode()
+            type_request = urllib.request.Request(
+                f"{IMDS_URL}/meta-data/instance-type", headers={"X-aws-ec2-metadata-token": token})
+            _instance_type = urllib.request.urlopen(type_request, timeout=IMDS_TIMEOUT_SECONDS).read().decode()
+        except Exception:
+            _instance_type = "unknown"
+    return _instance_type
+
+
+def new_job_id():
+    """One ID per attempt, so a retried video shows up as separate jobs"""
+    return uuid.uuid4().hex[:16]
+
+
+class JobEventLog:
+    """Append-only JSON-lines event writer for one worker process"""
+
+    def __init__(self, worker_id=None, events_dir=JOB_EVENTS_DIR):
+        self.host = socket.gethostname()
+        self.worker_id = worker_id or f"pid{os.getpid()}"
+        self.events_dir = events_dir
+        self.path = os.path.join(events_dir, f"{self.host}-{self.worker_id}-{os.getpid()}.jsonl")
+        self.job_id = None
+        self.video_key = None
+        self._lock = threading.Lock()
+
+    def start_job(self, video_key, **fields):
+        self.job_id = new_job_id()
+        self.video_key = video_key
+        self.emit("job_start", folder=os.path.dirname(video_key), **fields)
+        return self.job_id
+
+    def stage(self, stage, seconds, **fields):
+        self.emit("stage", stage=stage, seconds=round(seconds, 3), **fields)
+
+    def end_job(self, result, seconds, **fields):
+        self.emit("job_end", result=result, seconds=round(seconds, 3),
+                  folder=os.path.dirname(self.video_key or ""), **fields)
+        self.job_id = None
+
+    def emit(self, event, **fields):
+        record = {
+            "ts": round(time.time(), 3),
+            "event": event,
+            "job_id": self.job_id,
+            "video_key": self.video_key,
+            "worker_id": self.worker_id,
+            "host": self.host,
+            "instance_type": detect_instance_type(),
+        }
+        record.update(fields)
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(self.events_dir, exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write job event: {e}")
+
+
+def iter_events(paths):
+    """Yield events from .jsonl files or directories of them, skipping torn lines"""
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".jsonl"))
+        else:
+            files = [path]
+        for file_path in files:
+            with open(file_path, "r") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Job Profiler (--profile)
+Answers "is this worker slow in Python, in ffmpeg or waiting on I/O?":
+    - cProfile of the worker thread for each job (JSON state files, boto3,
+      S3 transfers) and for startup (listing, planning)
+    - ffmpeg run with -benchmark -benchmark_all, its log kept per rendition
+
+Artifacts go next to the job event log:
+    job_events/profiles/<job_id>/python.prof        load with pstats, snakeviz or flameprof
+    job_events/profiles/<job_id>/python_top.txt     top functions by cumulative time
+    job_events/profiles/<job_id>/ffmpeg_<rendition>.log.gz
+
+cProfile only sees the thread that started it, so lease heartbeats and
+other background threads are not included.
+"""
+
+import os
+import gzip
+import pstats
+import cProfile
+
+from job_events import JOB_EVENTS_DIR
+
+PROFILE_SUBDIR = "profiles"
+TOP_FUNCTIONS = 40
+
+
+class JobProfiler:
+    """No-op unless enabled, so call sites don't need to check --profile"""
+
+    def __init__(self, enabled=False, events_dir=JOB_EVENTS_DIR):
+        self.enabled = enabled
+        self.root = os.path.join(events_dir, PROFILE_SUBDIR)
+        self._profile = None
+        self._name = None
+
+    def profile_dir(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def ffmpeg_args(self):
+        """Extra ffmpeg options; the bench: lines are logged at info level"""
+        if not self.enabled:
+            return []
+        return ["-benchmark", "-benchmark_all", "-nostats"]
+
+    def ffmpeg_loglevel(self):
+        return "info" if self.enabled else "error"
+
+    def start(self, name):
+        if not self.enabled:
+            return
+        self.stop()
+        self._name = name
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self):
+        """Stop the running profile and write its artifacts; returns the directory"""
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        profile, name = self._profile, self._name
+        self._profile = self._name = None
+        try:
+            path = self.profile_dir(name)
+            profile.dump_stats(os.path.join(path, "python.prof"))
+            with open(os.path.join(path, "python_top.txt"), "w") as f:
+                stats = pstats.Stats(profile, stream=f)
+                stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            return path
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write profile for {name}: {e}")
+            return None
+
+    def save_ffmpeg_log(self, name, rendition, stderr):
+        if not self.enabled or not name:
+            return
+        try:
+            with gzip.open(os.path.join(self.profile_dir(name), f"ffmpeg_{rendition}.log.gz"), "wt") as f:
+                f.write(stderr or "")
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write ffmpeg benchmark log: {e}")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Job Throughput Report
+Summarises the structured event logs written by convert_ffmpeg.py:
+    - p50/p95/p99 latency per stage (preflight, download, probe, encode, upload, job)
+    - realtime factor (source seconds per wall second) per rendition
+    - throughput by folder and by instance type
+    - ffmpeg CPU-seconds, cores used and peak RSS per rendition (capacity planning)
+
+Usage:
+    python3 job_report.py                      # reads job_events/
+    python3 job_report.py logs/host1 logs/host2
+    python3 job_report.py --since-hours 24 --folder-depth 2
+"""
+
+import os
+import math
+import time
+import argparse
+from collections import defaultdict
+
+from job_events import JOB_EVENTS_DIR, iter_events
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = math.ceil(pct / 100 * len(ordered)) - 1
+    return ordered[min(max(index, 0), len(ordered) - 1)]
+
+
+def folder_group(folder, depth):
+    parts = [p for p in folder.split("/") if p]
+    return "/".join(parts[:depth]) or "(root)"
+
+
+def summarize(events, folder_depth=2):
+    """Aggregate events into the report tables"""
+    stage_seconds = defaultdict(list)
+    rendition_rtf = defaultdict(list)
+    rendition_cost = defaultdict(list)
+    source_duration = {}
+    jobs = []
+
+    for event in events:
+        if event.get("event") == "stage":
+            stage = event.get("stage")
+            seconds = event.get("seconds") or 0
+            stage_seconds[stage].append(seconds)
+            if stage == "rendition" and event.get("source_duration") and seconds > 0:
+                rendition_rtf[event.get("rendition")].append(event["source_duration"] / seconds)
+                stage_seconds[f"rendition {event.get('rendition')}"].append(seconds)
+            if stage == "rendition" and "user_cpu_seconds" in event:
+                rendition_cost[event.get("rendition")].append(event)
+            if stage == "probe" and event.get("source_duration"):
+                source_duration[event.get("job_id")] = event["source_duration"]
+        elif event.get("event") == "job_end":
+            stage_seconds["job"].append(event.get("seconds") or 0)
+            jobs.append(event)
+
+    groups = {"folder": defaultdict(list), "instance_type": defaultdict(list)}
+    for job in jobs:
+        groups["folder"][folder_group(job.get("folder", ""), folder_depth)].append(job)
+        groups["instance_type"][job.get("instance_type") or "unknown"].append(job)
+
+    throughput = {}
+    for name, grouped in groups.items():
+        rows = {}
+        for group, group_jobs in grouped.items():
+            done = [j for j in group_jobs if j.get("result") == "completed"]
+            # Wall-clock span from the first job start to the last job end
+            span = max(j["ts"] for j in group_jobs) - min(j["ts"] - (j.get("seconds") or 0) for j in group_jobs)
+            workers = {(j.get("host"), j.get("worker_id")) for j in group_jobs}
+            media = sum(source_duration.get(j.get("job_id"), 0) for j in done)
+            busy = sum(j.get("seconds") or 0 for j in done)
+            rows[group] = {
+                "completed": len(done),
+                "failed": len(group_jobs) - len(done),
+                "workers": len(workers),
+                "videos_per_hour": len(done) / span * 3600 if span > 0 else 0,
+                "media_hours": media / 3600,
+                "realtime_factor": media / busy if busy > 0 else 0,
+            }
+        throughput[name] = rows
+
+    return stage_seconds, rendition_rtf, throughput, rendition_cost
+
+
+def print_capacity(rendition_cost):
+    print("\n" + "="*80)
+    print("🧮 ffmpeg resource cost per rendition")
+    print("="*80)
+    print(f"{'rendition':<12}{'count':>7}{'cpu s/src min':>15}{'p95':>8}{'cores':>7}{'rss MB':>8}{'max':>8}"
+          f"{'in blk':>8}{'out blk':>9}")
+    for rendition, events in sorted(rendition_cost.items(), key=lambda item: str(item[0])):
+        cpu = [e["user_cpu_seconds"] + e["sys_cpu_seconds"] for e in events]
+        per_minute = [c / (e["source_duration"] / 60) for c, e in zip(cpu, events) if e.get("source_duration")]
+        cores = [c / e["seconds"] for c, e in zip(cpu, events) if e.get("seconds")]
+        rss = [e["max_rss_mb"] for e in events]
+        print(f"{str(rendition):<12}{len(events):>7}"
+              f"{percentile(per_minute, 50) if per_minute else 0:>15.1f}"
+              f"{percentile(per_minute, 95) if per_minute else 0:>8.1f}"
+              f"{percentile(cores, 50) if cores else 0:>7.2f}"
+              f"{percentile(rss, 50):>8.0f}{max(rss):>8.0f}"
+              f"{sum(e.get('in_blocks', 0) for e in events) // len(events):>8}"
+              f"{sum(e.get('out_blocks', 0) for e in events) // len(events):>9}")
+
+
+def print_report(stage_seconds, rendition_rtf, throughput, rendition_cost):
+    print("="*80)
+    print("⏱️  Stage latency (seconds)")
+    print("="*80)
+    print(f"{'stage':<22}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'total':>12}")
+    order = ["preflight", "download", "probe", "encode", "upload", "job"]
+    stages = [s for s in order if s in stage_seconds] + sorted(
+        s for s in stage_seconds if s not in order and s != "rendition")
+    for stage in stages:
+        values = stage_seconds[stage]
+        print(f"{stage:<22}{len(values):>8}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+              f"{percentile(values, 99):>10.1f}{sum(values):>12.0f}")
+
+    print("\n" + "="*80)
+    print("🎞️  Realtime factor per rendition (source seconds per wall second, higher is faster)")
+    print("="*80)
+    print(f"{'rendition':<22}{'count':>8}{'p50':>10}{'p5':>10}{'p1':>10}")
+    for rendition, values in sorted(rendition_rtf.items(), key=lambda item: str(item[0])):
+        # Slow tail: the 5th/1st percentile is the rendition's p95/p99 latency
+        print(f"{str(rendition):<22}{len(values):>8}{percentile(values, 50):>10.2f}"
+              f"{percentile(values, 5):>10.2f}{percentile(values, 1):>10.2f}")
+
+    for name, rows in throughput.items():
+        print("\n" + "="*80)
+        print(f"🚀 Throughput by {name.replace('_', ' ')}")
+        print("="*80)
+        print(f"{name:<34}{'done':>7}{'failed':>8}{'workers':>9}{'videos/h':>10}{'media h':>9}{'RTF':>7}")
+        for group, row in sorted(rows.items(), key=lambda item: -item[1]["completed"]):
+            print(f"{group[:33]:<34}{row['completed']:>7}{row['failed']:>8}{row['workers']:>9}"
+                  f"{row['videos_per_hour']:>10.1f}{row['media_hours']:>9.1f}{row['realtime_factor']:>7.2f}")
+    if rendition_cost:
+        print_capacity(rendition_cost)
+    print("="*80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise convert_ffmpeg.py job event logs")
+    parser.add_argument("paths", nargs="*", default=[JOB_EVENTS_DIR],
+                        help=f"Event log files or directories (default: {JOB_EVENTS_DIR}/)")
+    parser.add_argument("--since-hours", type=float, help="Only include events from the last N hours")
+    parser.add_argument("--folder-depth", type=int, default=2,
+                        help="Group throughput by this many leading folder levels (default: 2)")
+    args = parser.parse_args()
+
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        print(f"❌ Not found: {', '.join(missing)}")
+        raise SystemExit(1)
+
+    events = iter_events(args.paths)
+    if args.since_hours:
+        cutoff = time.time() - args.since_hours * 3600
+        events = (e for e in events if e.get("ts", 0) >= cutoff)
+
+    report = summarize(events, args.folder_depth)
+    if not report[0]:
+        print("No job events found.")
+    else:
+        print_report(*report)
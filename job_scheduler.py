@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Cost-Model Job Ordering
+Predicts how long each source will take to encode and orders the job list so
+workers pick the longest jobs first (LPT). Every job-state backend hands out
+the first available key in list order, so the ordered list is the dispatch
+order. Longest-first keeps a multi-hour livestream recording from starting
+last while every other worker sits idle; shortest-first (SPT) is available
+when early visible progress matters more than makespan.
+
+The model is fitted from encode_history.json (written by convert_ffmpeg.py
+after every successful encode):
+  - with a probed duration:  encode_seconds = duration * rate[resolution class]
+  - with only a size:        encode_seconds = size_bytes * seconds_per_byte
+"""
+
+import json
+import subprocess
+from statistics import median
+from concurrent.futures import ThreadPoolExecutor
+
+ORDER_MODES = ("lpt", "spt", "listing")
+
+# Used until there is enough history (c6g.xlarge, all 5 renditions, preset fast)
+DEFAULT_SECONDS_PER_MEDIA_SECOND = {"sd": 0.6, "hd": 1.1, "fhd": 1.8, "uhd": 4.0}
+DEFAULT_SECONDS_PER_BYTE = 1.5 / (1024 * 1024)
+
+# Minimum samples before a learned rate replaces the default
+MIN_SAMPLES = 3
+
+
+def resolution_class(height):
+    """Bucket a source height so rates are learned per resolution class"""
+    if not height:
+        return "fhd"
+    if height <= 576:
+        return "sd"
+    if height <= 720:
+        return "hd"
+    if height <= 1080:
+        return "fhd"
+    return "uhd"
+
+
+class EncodeCostModel:
+    """Predict encode wall-clock seconds for a source"""
+
+    def __init__(self, media_rates=None, seconds_per_byte=DEFAULT_SECONDS_PER_BYTE):
+        self.media_rates = dict(DEFAULT_SECONDS_PER_MEDIA_SECOND)
+        if media_rates:
+            self.media_rates.update(media_rates)
+        self.seconds_per_byte = seconds_per_byte
+
+    @classmethod
+    def fit(cls, history):
+        """
+        Learn rates from history records
+        Medians rather than means so one stalled encode doesn't skew the model
+        """
+        per_class = {}
+        per_byte = []
+        for record in history:
+            encode_seconds = record.get("encode_seconds")
+            if not encode_seconds or encode_seconds <= 0:
+                continue
+            duration = record.get("duration")
+            if duration:
+                per_class.setdefault(resolution_class(record.get("height")), []).append(
+                    encode_seconds / duration)
+            if record.get("size_bytes"):
+                per_byte.append(encode_seconds / record["size_bytes"])
+
+        media_rates = {
+            klass: median(rates) for klass, rates in per_class.items() if len(rates) >= MIN_SAMPLES
+        }
+        seconds_per_byte = median(per_byte) if len(per_byte) >= MIN_SAMPLES else DEFAULT_SECONDS_PER_BYTE
+        return cls(media_rates, seconds_per_byte)
+
+    def predict(self, size_bytes=None, duration=None, height=None):
+        if duration:
+            return duration * self.media_rates[resolution_class(height)]
+        return (size_bytes or 0) * self.seconds_per_byte
+
+
+def probe_source(url):
+    """
+    Read duration and resolution from a (presigned) URL with ffprobe
+    ffprobe only fetches the container header, not the whole file
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:format=duration",
+        "-of", "json",
+        url
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout)
+        stream = (data.get("streams") or [{}])[0]
+        return {
+            "duration": float(data.get("format", {}).get("duration") or 0) or None,
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+        }
+    except Exception:
+        return None
+
+
+def probe_sources(s3_client, bucket, keys, max_workers=8):
+    """Probe many S3 sources concurrently through presigned URLs"""
+    def probe_one(key):
+        url = s3_client.generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=900)
+        return key, probe_source(url)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return {key: info for key, info in pool.map(probe_one, keys) if info}
+
+
+def plan_job_order(video_objects, history=None, probes=None, mode="lpt"):
+    """
+    Order video keys for dispatch
+    video_objects: list of dicts with at least Key and Size (see list_s3_video_object_info)
+    history: encode history records used to fit the model
+    probes: optional {key: {"duration", "width", "height"}}
+    Returns: (ordered_keys, predictions) where predictions maps key -> seconds
+    """
+    if mode not in ORDER_MODES:
+        raise ValueError(f"unknown order mode '{mode}', expected one of {ORDER_MODES}")
+
+    keys = [obj["Key"] for obj in video_objects]
+    if mode == "listing":
+        return keys, {}
+
+    model = EncodeCostModel.fit(history or [])
+    # A copy: the history fill-in below must not leak into the caller's probes
+    probes = dict(probes or {})
+
+    # Anything probed on a previous encode is as good as a fresh probe
+    for record in history or []:
+        if record.get("key") and record.get("duration") and record["key"] not in probes:
+            probes[record["key"]] = record
+
+    predictions = {}
+    for obj in video_objects:
+        info = probes.get(obj["Key"], {})
+        predictions[obj["Key"]] = model.predict(
+            size_bytes=obj.get("Size"),
+            duration=info.get("duration"),
+            height=info.get("height"),
+        )
+
+    # sorted() is stable, so ties keep listing order
+    ordered = sorted(keys, key=lambda k: predictions[k], reverse=(mode == "lpt"))
+    return ordered, predictions
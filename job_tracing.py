@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Job Tracing
+Records every job as a trace of nested spans (job > preflight, download,
+probe, encode > one span per rendition, upload > sampled per-file spans) and
+appends it to job_events/traces/<host>-<worker>-<pid>.jsonl as one OTLP/JSON
+ExportTraceServiceRequest per line - the format the OpenTelemetry
+collector's file exporter writes, so otelcol (filelog/otlpjsonfile
+receiver), Jaeger or Tempo can load it as-is.
+
+Uploads create hundreds of .ts files per job, so per-file spans are kept for
+a random sample (upload_sample_rate); the parent upload span carries the
+totals.
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import threading
+
+from job_events import JOB_EVENTS_DIR
+
+TRACES_SUBDIR = "traces"
+SERVICE_NAME = "ffmpeg-convert"
+DEFAULT_UPLOAD_SAMPLE_RATE = 0.05
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+class Span:
+    def __init__(self, trace_id, name, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": self.status or {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class JobTracer:
+    """One trace at a time per worker thread; spans nest in start order"""
+
+    def __init__(self, worker_id=None, events_dir=JOB_EVENTS_DIR, upload_sample_rate=DEFAULT_UPLOAD_SAMPLE_RATE):
+        self.host = socket.gethostname()
+        self.worker_id = worker_id or f"pid{os.getpid()}"
+        self.upload_sample_rate = upload_sample_rate
+        self.path = os.path.join(events_dir, TRACES_SUBDIR, f"{self.host}-{self.worker_id}-{os.getpid()}.jsonl")
+        self._local = threading.local()
+
+    def _state(self):
+        if not hasattr(self._local, "spans"):
+            self._local.spans = []
+            self._local.stack = []
+        return self._local
+
+    def start_trace(self, name, **attributes):
+        state = self._state()
+        root = Span(os.urandom(16).hex(), name, attributes=attributes)
+        state.spans, state.stack = [root], [root]
+        return root
+
+    def start_span(self, name, sample=False, **attributes):
+        """
+        Open a child of the innermost open span
+        sample=True keeps the span only for upload_sample_rate of calls (returns None otherwise)
+        """
+        state = self._state()
+        if not state.stack or (sample and random.random() >= self.upload_sample_rate):
+            return None
+        parent = state.stack[-1]
+        span = Span(parent.trace_id, name, parent.span_id, attributes)
+        state.spans.append(span)
+        state.stack.append(span)
+        return span
+
+    def end_span(self, span, ok=True, message=None, **attributes):
+        if span is None:
+            return
+        span.set(**attributes)
+        span.end_ns = time.time_ns()
+        span.status = {"code": STATUS_OK} if ok else {"code": STATUS_ERROR, "message": (message or "")[-500:]}
+        state = self._state()
+        if span not in state.stack:
+            return
+        # Close anything left open inside this span (early returns)
+        while state.stack and state.stack[-1] is not span:
+            self.end_span(state.stack[-1], ok=False, message="not ended before parent")
+        if state.stack:
+            state.stack.pop()
+
+    def end_trace(self, ok=True, message=None, **attributes):
+        """Close the root span and append the trace to the traces file"""
+        state = self._state()
+        if not state.stack:
+            return
+        self.end_span(state.stack[0], ok, message, **attributes)
+        spans, state.spans, state.stack = state.spans, [], []
+        self._write(spans)
+
+    def _write(self, spans):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({
+                "service.name": SERVICE_NAME,
+                "host.name": self.host,
+                "service.instance.id": f"{self.host}-{self.worker_id}",
+            })},
+            "scopeSpans": [{
+                "scope": {"name": "convert_ffmpeg"},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }]}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(request) + "\n")
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write trace: {e}")
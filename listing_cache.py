@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Persistent Listing Snapshot
+Keeps the filtered result of list_s3_video_object_info (key, size, ETag,
+LastModified) in a local JSON index per bucket/prefix, so a worker start can
+reuse a recent listing instead of paginating hundreds of thousands of keys
+again, and a refresh can say exactly which sources were added, changed or
+deleted since the previous run.
+
+S3 has no "changed since" listing, so a refresh is still one full pagination;
+the saving comes from reusing the snapshot while it is younger than
+max_age_seconds (every worker on a box, every restart) and from queueing only
+the delta when asked to.
+
+Added and changed keys are also kept in a pending list that survives
+refreshes until settle() sees them completed, so a delta isn't lost when
+the run that should process it crashes or fails some videos. The first
+listing is the baseline: it has no delta and leaves nothing pending.
+"""
+
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+
+SNAPSHOT_DIR = "listing_snapshots"
+DEFAULT_MAX_AGE_SECONDS = 15 * 60
+
+
+def snapshot_path(bucket, prefix, snapshot_dir=SNAPSHOT_DIR):
+    """One snapshot file per bucket/prefix pair"""
+    digest = hashlib.sha1(f"{bucket}/{prefix}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(snapshot_dir, f"{digest}.json")
+
+
+def _serialize_time(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ListingDelta:
+    """Keys added, changed (new ETag or size) and deleted between two listings"""
+
+    def __init__(self, added=None, changed=None, deleted=None):
+        self.added = added or []
+        self.changed = changed or []
+        self.deleted = deleted or []
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.deleted)
+
+    def summary(self):
+        return f"+{len(self.added)} added, ~{len(self.changed)} changed, -{len(self.deleted)} deleted"
+
+
+class ListingSnapshot:
+    """Local index of one bucket/prefix listing"""
+
+    def __init__(self, bucket, prefix, snapshot_dir=SNAPSHOT_DIR):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.path = snapshot_path(bucket, prefix, snapshot_dir)
+        self.refreshed_at = None
+        # key -> [size, etag, last_modified_iso], in listing order
+        self.entries = {}
+        # key -> "added" | "changed" (changed: completed output must be reopened first)
+        self.pending = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if data.get("bucket") != self.bucket or data.get("prefix") != self.prefix:
+            return False
+        self.refreshed_at = data.get("refreshed_at")
+        self.entries = data.get("objects", {})
+        self.pending = data.get("pending", {})
+        return True
+
+    def save(self):
+        """Atomic write so a concurrent reader never sees half a snapshot"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "bucket": self.bucket,
+                "prefix": self.prefix,
+                "refreshed_at": self.refreshed_at,
+                "objects": self.entries,
+                "pending": self.pending,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def age_seconds(self):
+        if self.refreshed_at is None:
+            return None
+        return time.time() - self.refreshed_at
+
+    def is_fresh(self, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        age = self.age_seconds()
+        return age is not None and age <= max_age_seconds
+
+    def objects(self):
+        """Snapshot contents in the same shape as list_s3_video_object_info"""
+        return [
+            {"Key": key, "Size": size, "ETag": etag, "LastModified": last_modified}
+            for key, (size, etag, last_modified) in self.entries.items()
+        ]
+
+    def refresh(self, video_objects):
+        """
+        Replace the snapshot with a new listing and return what changed
+        (nothing for the first listing, which becomes the baseline)
+        video_objects: result of list_s3_video_object_info
+        """
+        baseline = self.refreshed_at is None
+        new_entries = {
+            obj["Key"]: [obj.get("Size", 0), obj.get("ETag"), _serialize_time(obj.get("LastModified"))]
+            for obj in video_objects
+        }
+        delta = ListingDelta()
+        if not baseline:
+            for key, (size, etag, _) in new_entries.items():
+                old = self.entries.get(key)
+                if old is None:
+                    delta.added.append(key)
+                elif old[0] != size or old[1] != etag:
+                    delta.changed.append(key)
+            delta.deleted = [key for key in self.entries if key not in new_entries]
+
+        for key in delta.added:
+            self.pending.setdefault(key, "added")
+        for key in delta.changed:
+            self.pending[key] = "changed"
+        self.pending = {key: kind for key, kind in self.pending.items() if key in new_entries}
+        self.entries = new_entries
+        self.refreshed_at = time.time()
+        self.save()
+        return delta
+
+    def pending_changed(self):
+        return [key for key, kind in self.pending.items() if kind == "changed"]
+
+    def mark_reopened(self, video_keys):
+        """Changed keys whose completion was cleared only need processing now"""
+        for key in video_keys:
+            if key in self.pending:
+                self.pending[key] = "added"
+        self.save()
+
+    def settle(self, is_complete):
+        """Drop pending keys that are now complete; returns how many are still pending"""
+        self.pending = {key: kind for key, kind in self.pending.items()
+                        if kind == "changed" or not is_complete(key)}
+        self.save()
+        return len(self.pending)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Local S3 Stand-in
+Directory-backed replacement for the subset of the boto3 S3 client used by
+convert_ffmpeg.py, so coordination, listing and upload code can be exercised
+without AWS. Conditional writes (IfNoneMatch / IfMatch) are honoured and are
+atomic across processes on Linux (a per-bucket flock guards every write).
+
+LocalSQSClient is the matching in-memory stand-in for the SQS calls used by
+event_ingest.py.
+"""
+
+import os
+import io
+import json
+import shutil
+import hashlib
+import tempfile
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+
+from botocore.exceptions import ClientError
+
+try:
+    import fcntl
+    LOCK_AVAILABLE = True
+except ImportError:
+    LOCK_AVAILABLE = False
+
+
+def _client_error(code, status, operation, message=""):
+    """Build a ClientError shaped like the ones boto3 raises"""
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": message or code},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        },
+        operation,
+    )
+
+
+class LocalS3Paginator:
+    """Minimal paginator for list_objects_v2"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            params = dict(kwargs)
+            if token:
+                params["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**params)
+            yield page
+            if not page.get("IsTruncated"):
+                break
+            token = page["NextContinuationToken"]
+
+
+class LocalS3Client:
+    """
+    Stand-in for boto3.client("s3") backed by a local directory
+    Each object is stored as one data file plus one JSON metadata file
+    """
+
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir or tempfile.mkdtemp(prefix="local_s3_")
+        self.request_counts = {}
+        self._thread_lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------------
+    def _bucket_dir(self, bucket):
+        path = os.path.join(self.root_dir, bucket)
+        os.makedirs(os.path.join(path, "data"), exist_ok=True)
+        os.makedirs(os.path.join(path, "meta"), exist_ok=True)
+        return path
+
+    def _paths(self, bucket, key):
+        name = quote(key, safe="")
+        bucket_dir = self._bucket_dir(bucket)
+        return (os.path.join(bucket_dir, "data", name),
+                os.path.join(bucket_dir, "meta", name + ".json"))
+
+    def _count(self, operation):
+        with self._thread_lock:
+            self.request_counts[operation] = self.request_counts.get(operation, 0) + 1
+
+    def _locked(self, bucket):
+        """Context manager holding the bucket write lock (threads and processes)"""
+        client = self
+
+        class _Lock:
+            def __enter__(self):
+                client._thread_lock.acquire()
+                self.f = open(os.path.join(client._bucket_dir(bucket), ".lock"), "a")
+                if LOCK_AVAILABLE:
+                    fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+                return self
+
+            def __exit__(self, *exc):
+                if LOCK_AVAILABLE:
+                    fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+                self.f.close()
+                client._thread_lock.release()
+                return False
+
+        return _Lock()
+
+    def _read_meta(self, bucket, key):
+        _, meta_path = self._paths(bucket, key)
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, bucket, key, body, content_type=None):
+        data_path, meta_path = self._paths(bucket, key)
+        tmp_path = data_path + f".tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, data_path)
+        meta = {
+            "ETag": '"' + hashlib.md5(body).hexdigest() + '"',
+            "Size": len(body),
+            "LastModified": datetime.now(timezone.utc).isoformat(),
+            "ContentType": content_type or "binary/octet-stream",
+        }
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        return meta
+
+    @staticmethod
+    def _body_bytes(body):
+        if body is None:
+            return b""
+        if isinstance(body, str):
+            return body.encode("utf-8")
+        if hasattr(body, "read"):
+            return body.read()
+        return bytes(body)
+
+    # ------------------------------------------------------------------
+    # S3 API subset
+    # ------------------------------------------------------------------
+    def put_object(self, Bucket, Key, Body=None, IfNoneMatch=None, IfMatch=None,
+                   ContentType=None, **kwargs):
+        self._count("PutObject")
+        body = self._body_bytes(Body)
+        with self._locked(Bucket):
+            current = self._read_meta(Bucket, Key)
+            if IfNoneMatch == "*" and current is not None:
+                raise _client_error("PreconditionFailed", 412, "PutObject",
+                                    "At least one of the pre-conditions you specified did not hold")
+            if IfMatch is not None and (current is None or current["ETag"] != IfMatch):
+                if current is None:
+                    raise _client_error("NoSuchKey", 404, "PutObject")
+                raise _client_error("PreconditionFailed", 412, "PutObject",
+                                    "At least one of the pre-conditions you specified did not hold")
+            meta = self._write(Bucket, Key, body, ContentType)
+        return {"ETag": meta["ETag"]}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, **kwargs):
+        self._count("GetObject")
+        data_path, _ = self._paths(Bucket, Key)
+        meta = self._read_meta(Bucket, Key)
+        if meta is None:
+            raise _client_error("NoSuchKey", 404, "GetObject", "The specified key does not exist.")
+        if IfMatch is not None and meta["ETag"] != IfMatch:
+            raise _client_error("PreconditionFailed", 412, "GetObject")
+        with open(data_path, "rb") as f:
+            body = f.read()
+        size = len(body)
+        if Range:
+            start, end = self._parse_range(Range, size)
+            if start >= size:
+                raise _client_error("InvalidRange", 416, "GetObject")
+            body = body[start:end + 1]
+        return {
+            "Body": io.BytesIO(body),
+            "ContentLength": len(body),
+            "ETag": meta["ETag"],
+            "ContentType": meta["ContentType"],
+            "LastModified": datetime.fromisoformat(meta["LastModified"]),
+            "ContentRange": f"bytes {start}-{start + len(body) - 1}/{size}" if Range else None,
+        }
+
+    @staticmethod
+    def _parse_range(range_header, size):
+        """Parse 'bytes=a-b', 'bytes=a-' and 'bytes=-n' into inclusive offsets"""
+        spec = range_header.split("=", 1)[1]
+        first, last = spec.split("-", 1)
+        if first == "":
+            length = int(last)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+        return start, min(end, size - 1)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._count("HeadObject")
+        meta = self._read_meta(Bucket, Key)
+        if meta is None:
+            raise _client_error("404", 404, "HeadObject", "Not Found")
+        return {
+            "ContentLength": meta["Size"],
+            "ETag": meta["ETag"],
+            "ContentType": meta["ContentType"],
+            "LastModified": datetime.fromisoformat(meta["LastModified"]),
+        }
+
+    def delete_object(self, Bucket, Key, IfMatch=None, **kwargs):
+        self._count("DeleteObject")
+        data_path, meta_path = self._paths(Bucket, Key)
+        with self._locked(Bucket):
+            current = self._read_meta(Bucket, Key)
+            if IfMatch is not None and current is not None and current["ETag"] != IfMatch:
+                raise _client_error("PreconditionFailed", 412, "DeleteObject")
+            for path in (data_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource, ContentType=None, **kwargs):
+        self._count("CopyObject")
+        source = self.get_object(Bucket=CopySource["Bucket"], Key=CopySource["Key"])
+        with self._locked(Bucket):
+            meta = self._write(Bucket, Key, source["Body"].read(),
+                               ContentType or source["ContentType"])
+        return {"CopyObjectResult": {"ETag": meta["ETag"]}}
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, ContinuationToken=None,
+                        StartAfter=None, MaxKeys=1000, **kwargs):
+        self._count("ListObjectsV2")
+        meta_dir = os.path.join(self._bucket_dir(Bucket), "meta")
+        keys = sorted(
+            unquote(name[:-len(".json")])
+            for name in os.listdir(meta_dir)
+            if name.endswith(".json")
+        )
+        keys = [k for k in keys if k.startswith(Prefix)]
+        after = ContinuationToken or StartAfter
+        if after:
+            keys = [k for k in keys if k > after]
+
+        contents = []
+        common_prefixes = []
+        seen_prefixes = set()
+        last_key = None
+        for key in keys:
+            if len(contents) + len(common_prefixes) >= MaxKeys:
+                break
+            last_key = key
+            if Delimiter:
+                rest = key[len(Prefix):]
+                if Delimiter in rest:
+                    common = Prefix + rest.split(Delimiter, 1)[0] + Delimiter
+                    if common not in seen_prefixes:
+                        seen_prefixes.add(common)
+                        common_prefixes.append({"Prefix": common})
+                    continue
+            meta = self._read_meta(Bucket, key)
+            if meta is None:
+                continue
+            contents.append({
+                "Key": key,
+                "Size": meta["Size"],
+                "ETag": meta["ETag"],
+                "LastModified": datetime.fromisoformat(meta["LastModified"]),
+            })
+
+        truncated = last_key is not None and last_key != keys[-1]
+        if Delimiter and truncated:
+            # Skip the rest of a rolled-up prefix so it is not reported twice
+            last_prefix = common_prefixes[-1]["Prefix"] if common_prefixes else None
+            if last_prefix and last_key.startswith(last_prefix):
+                remaining = [k for k in keys if k > last_key and not k.startswith(last_prefix)]
+                truncated = bool(remaining)
+                last_key = last_prefix + "\uffff"
+        page = {"KeyCount": len(contents) + len(common_prefixes), "IsTruncated": truncated}
+        if contents:
+            page["Contents"] = contents
+        if common_prefixes:
+            page["CommonPrefixes"] = common_prefixes
+        if truncated:
+            page["NextContinuationToken"] = last_key
+        return page
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(f"LocalS3Client has no paginator for {operation_name}")
+        return LocalS3Paginator(self)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, **kwargs):
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read(),
+                            ContentType=(ExtraArgs or {}).get("ContentType"))
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        response = self.get_object(Bucket=Bucket, Key=Key)
+        with open(Filename, "wb") as f:
+            shutil.copyfileobj(response["Body"], f)
+
+    def total_requests(self):
+        """Total number of API calls served by this client instance"""
+        return sum(self.request_counts.values())
+
+
+def s3_object_created_event(bucket, key, size, etag=None):
+    """Build an S3 ObjectCreated:Put notification body like the one S3 sends to SQS"""
+    return json.dumps({
+        "Records": [{
+            "eventSource": "aws:s3",
+            "eventName": "ObjectCreated:Put",
+            "s3": {
+                "bucket": {"name": bucket},
+                "object": {"key": quote(key, safe="/").replace("%20", "+"), "size": size, "eTag": etag},
+            },
+        }]
+    })
+
+
+class LocalSQSClient:
+    """
+    In-memory stand-in for boto3.client("sqs") (receive/delete/send only)
+    Received messages stay invisible for VisibilityTimeout seconds, then reappear
+    """
+
+    def __init__(self):
+        self._messages = {}
+        self._lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self._messages.setdefault(QueueUrl, []).append(
+                {"MessageId": message_id, "Body": MessageBody, "visible_at": 0, "receipt": None})
+        return {"MessageId": message_id}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0,
+                        VisibilityTimeout=30, **kwargs):
+        deadline = time.time() + WaitTimeSeconds
+        while True:
+            now = time.time()
+            batch = []
+            with self._lock:
+                for message in self._messages.get(QueueUrl, []):
+                    if len(batch) >= MaxNumberOfMessages:
+                        break
+                    if message["visible_at"] <= now:
+                        message["visible_at"] = now + VisibilityTimeout
+                        message["receipt"] = str(uuid.uuid4())
+                        batch.append({"MessageId": message["MessageId"], "Body": message["Body"],
+                                      "ReceiptHandle": message["receipt"]})
+            if batch or now >= deadline:
+                return {"Messages": batch} if batch else {}
+            time.sleep(min(0.1, max(0, deadline - now)))
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        with self._lock:
+            self._messages[QueueUrl] = [
+                m for m in self._messages.get(QueueUrl, []) if m["receipt"] != ReceiptHandle
+            ]
+        return {}
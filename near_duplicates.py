@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate Detection
+Re-exported versions of the same lecture differ byte-for-byte, so the
+ETag/SHA-256 dedupe (source_dedupe.py) misses them. This fingerprints what
+the source looks and sounds like instead:
+
+    video   a 64-bit difference hash (dHash) of a 9x8 grey thumbnail every
+            SAMPLE_SECONDS, decoding keyframes only
+    audio   one bit per AUDIO_WINDOW_SECONDS: did the loudness go up or down
+            (mono, resampled to AUDIO_RATE)
+
+Two fingerprints are compared at the best alignment within MAX_SHIFT_SECONDS
+(re-exports often gain or lose a few seconds of intro). The similarity is
+the lower of the video and audio scores, so a shared slide template or a
+silent track alone can't make two lectures match. Unrelated sources score
+about 0.5 on audio.
+
+Only the first MAX_SAMPLE_SECONDS are fingerprinted, which keeps index
+entries at a few KB and the decode under a minute for long lectures.
+
+Usage:
+    python3 near_duplicates.py <file> <file>     # print the similarity of two local files
+"""
+
+import sys
+import array
+import subprocess
+
+NEAR_DUPE_MODES = ("off", "flag", "skip", "reuse")
+DEFAULT_THRESHOLD = 0.9
+
+SAMPLE_SECONDS = 5
+AUDIO_RATE = 2000
+AUDIO_WINDOW_SECONDS = 0.5
+MAX_SAMPLE_SECONDS = 1800
+MAX_SHIFT_SECONDS = 30
+
+# Wall-clock budget for each fingerprinting ffmpeg run (thumbnails, audio);
+# past it the source is encoded without a near-duplicate check
+FINGERPRINT_TIMEOUT_SECONDS = 600
+
+# Fingerprints must overlap this much of the longer one, and durations be this close
+MIN_OVERLAP = 0.8
+MIN_DURATION_RATIO = 0.9
+
+HASH_WIDTH, HASH_HEIGHT = 9, 8
+
+
+def _run_ffmpeg(cmd):
+    result = subprocess.run(cmd, capture_output=True, timeout=FINGERPRINT_TIMEOUT_SECONDS)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip()[-500:] or "ffmpeg failed")
+    return result.stdout
+
+
+def video_hashes(path):
+    """dHash of one thumbnail every SAMPLE_SECONDS, concatenated as 16 hex digits per thumbnail"""
+    raw = _run_ffmpeg([
+        "ffmpeg", "-v", "error", "-skip_frame", "nokey", "-i", path,
+        "-t", str(MAX_SAMPLE_SECONDS), "-an",
+        "-vf", f"fps=1/{SAMPLE_SECONDS},scale={HASH_WIDTH}:{HASH_HEIGHT}:flags=area,format=gray",
+        "-f", "rawvideo", "-",
+    ])
+    frame_size = HASH_WIDTH * HASH_HEIGHT
+    hashes = []
+    for start in range(0, len(raw) - frame_size + 1, frame_size):
+        frame = raw[start:start + frame_size]
+        bits = 0
+        for row in range(HASH_HEIGHT):
+            pixels = frame[row * HASH_WIDTH:(row + 1) * HASH_WIDTH]
+            for x in range(HASH_WIDTH - 1):
+                bits = (bits << 1) | (pixels[x] > pixels[x + 1])
+        hashes.append(f"{bits:016x}")
+    return "".join(hashes)
+
+
+def audio_bits(path):
+    """Loudness-envelope bits as a '0'/'1' string; empty if the source has no audio"""
+    try:
+        raw = _run_ffmpeg([
+            "ffmpeg", "-v", "error", "-i", path, "-t", str(MAX_SAMPLE_SECONDS), "-vn",
+            "-ac", "1", "-ar", str(AUDIO_RATE), "-f", "s16le", "-",
+        ])
+    except RuntimeError as e:
+        if "does not contain any stream" in str(e) or "matches no streams" in str(e):
+            return ""
+        raise
+    samples = array.array("h")
+    samples.frombytes(raw[:len(raw) - len(raw) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    window = int(AUDIO_RATE * AUDIO_WINDOW_SECONDS)
+    energy = [sum(map(abs, samples[i:i + window])) for i in range(0, len(samples) - window + 1, window)]
+    return "".join("1" if b > a else "0" for a, b in zip(energy, energy[1:]))
+
+
+def fingerprint(path, duration=None):
+    """Perceptual fingerprint of a local source (raises RuntimeError if ffmpeg can't decode it)"""
+    video = video_hashes(path)
+    if not video:
+        raise RuntimeError("no video frames decoded")
+    return {
+        "duration": duration or len(video) // 16 * SAMPLE_SECONDS,
+        "video": video,
+        "audio": audio_bits(path),
+    }
+
+
+def _best_alignment(a, a_bits, b, b_bits, unit, max_shift):
+    """
+    Best fraction of matching bits between two bit sequences, shifting b by
+    up to max_shift units either way (a unit is one thumbnail hash or one
+    audio window). Sequences are ints so each shift is one XOR.
+    Returns None if they never overlap enough.
+    """
+    a_units, b_units = a_bits // unit, b_bits // unit
+    longest = max(a_units, b_units)
+    best = None
+    for shift in range(-max_shift, max_shift + 1):
+        a_start, b_start = max(0, shift), max(0, -shift)
+        overlap = min(a_units - a_start, b_units - b_start)
+        if overlap <= 0 or overlap < MIN_OVERLAP * longest:
+            continue
+        mask = (1 << (overlap * unit)) - 1
+        a_part = (a >> ((a_units - a_start - overlap) * unit)) & mask
+        b_part = (b >> ((b_units - b_start - overlap) * unit)) & mask
+        value = 1 - bin(a_part ^ b_part).count("1") / (overlap * unit)
+        if best is None or value > best:
+            best = value
+    return best
+
+
+def similarity(a, b):
+    """
+    Compare two fingerprints
+    Returns: {"similarity", "video", "audio"} (audio None when either has no audio), or None if not comparable
+    """
+    durations = sorted([a.get("duration") or 0, b.get("duration") or 0])
+    if not durations[1] or durations[0] / durations[1] < MIN_DURATION_RATIO:
+        return None
+    hash_bits = (HASH_WIDTH - 1) * HASH_HEIGHT
+    video = _best_alignment(int(a["video"], 16), len(a["video"]) * 4, int(b["video"], 16), len(b["video"]) * 4,
+                            hash_bits, MAX_SHIFT_SECONDS // SAMPLE_SECONDS)
+    if video is None:
+        return None
+    audio = None
+    if a.get("audio") and b.get("audio"):
+        audio = _best_alignment(int(a["audio"], 2), len(a["audio"]), int(b["audio"], 2), len(b["audio"]),
+                                1, int(MAX_SHIFT_SECONDS / AUDIO_WINDOW_SECONDS))
+    scores = [s for s in (video, audio) if s is not None]
+    return {
+        "similarity": round(min(scores), 4),
+        "video": round(video, 4),
+        "audio": round(audio, 4) if audio is not None else None,
+    }
+
+
+def find_near_duplicate(source_print, index, threshold=DEFAULT_THRESHOLD, exclude_key=None):
+    """
+    Most similar indexed source at or above threshold
+    index: {video_key: fingerprint (plus any extra fields)}
+    Returns: (video_key, scores) or (None, None)
+    """
+    best_key, best_scores = None, None
+    for key, other in index.items():
+        if key == exclude_key:
+            continue
+        scores = similarity(source_print, other)
+        if scores and scores["similarity"] >= threshold and (
+                best_scores is None or scores["similarity"] > best_scores["similarity"]):
+            best_key, best_scores = key, scores
+    return best_key, best_scores
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    first, second = fingerprint(sys.argv[1]), fingerprint(sys.argv[2])
+    scores = similarity(first, second)
+    if scores is None:
+        print("❌ Not comparable (durations differ too much or too little overlap)")
+    else:
+        print(f"🔍 Similarity {scores['similarity']:.3f} (video {scores['video']:.3f}, audio {scores['audio']})")
+        print("👯 Near-duplicates" if scores["similarity"] >= DEFAULT_THRESHOLD else "✅ Different sources")
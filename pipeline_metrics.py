@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Pipeline Metrics
+Per-worker Prometheus/OpenMetrics endpoint. Workers always record into the
+module-level METRICS registry (a few dict updates per stage); start_server()
+exposes it over HTTP at /metrics when --metrics-port is given.
+
+Metrics (all prefixed ffmpeg_convert_):
+    stage_seconds{stage}             histogram: preflight, download, probe, upload, job
+    encode_seconds{rendition}        histogram: wall time per rendition encode
+    encode_speed_ratio{rendition}    histogram: source seconds per wall second
+    bytes_downloaded_total           counter
+    bytes_uploaded_total             counter
+    jobs_total{result}               counter: completed / failed
+    failures_total{class,stage}      counter: transient / permanent per stage
+    queue_depth                      gauge: videos not yet claimed
+    in_progress                      gauge: videos claimed by any worker
+
+Implemented on the standard library so workers don't need prometheus_client.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "ffmpeg_convert_"
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+SPEED_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric:
+    kind = None
+    # Appended to the name for the exposed family (HELP/TYPE lines and samples alike)
+    suffix = ""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = PREFIX + name + self.suffix
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        if not self.label_names and self.kind != "histogram":
+            # Export unlabelled series from the first scrape so rate() has a starting point
+            self._values[()] = 0
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.extend(self._render_series(label_values, value))
+        return lines
+
+    def _render_series(self, label_values, value):
+        return [f"{self.name}{_label_text(self.label_names, label_values)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    suffix = "_total"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_series(self, label_values, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            labels = _label_text(self.label_names, label_values, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _label_text(self.label_names, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class PipelineMetrics:
+    """Every metric one worker exports"""
+
+    def __init__(self):
+        self.stage_seconds = Histogram("stage_seconds", "Wall time per pipeline stage", ["stage"])
+        self.encode_seconds = Histogram("encode_seconds", "Wall time per rendition encode", ["rendition"])
+        self.encode_speed = Histogram("encode_speed_ratio", "Source seconds encoded per wall second",
+                                      ["rendition"], buckets=SPEED_BUCKETS)
+        self.bytes_downloaded = Counter("bytes_downloaded", "Source bytes downloaded from S3")
+        self.bytes_uploaded = Counter("bytes_uploaded", "HLS output bytes uploaded to S3")
+        self.jobs = Counter("jobs", "Finished jobs by result", ["result"])
+        self.failures = Counter("failures", "Failed jobs by failure class and stage", ["class", "stage"])
+        self.queue_depth = Gauge("queue_depth", "Videos not yet claimed by any worker")
+        self.in_progress = Gauge("in_progress", "Videos currently claimed by a worker")
+
+    def all(self):
+        return [self.stage_seconds, self.encode_seconds, self.encode_speed, self.bytes_downloaded,
+                self.bytes_uploaded, self.jobs, self.failures, self.queue_depth, self.in_progress]
+
+    def render(self):
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = PipelineMetrics()
+
+
+def start_server(port, metrics=METRICS, host="0.0.0.0"):
+    """Serve /metrics on a daemon thread; returns the server (port 0 picks a free port)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every 15s would drown the conversion log
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
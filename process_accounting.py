@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Per-process Resource Accounting
+Runs a child (ffmpeg) and collects its own rusage with os.wait4: user and
+system CPU seconds, peak RSS and block I/O. Unlike
+resource.getrusage(RUSAGE_CHILDREN), which only ever reports the largest
+child seen so far, this is exact per rendition.
+
+Falls back to a plain subprocess.run (usage None) where os.wait4 is missing.
+"""
+
+import os
+import sys
+import time
+import subprocess
+import threading
+
+WAIT4_AVAILABLE = hasattr(os, "wait4")
+
+
+def rusage_to_dict(usage, wall_seconds):
+    """Normalise a struct_rusage; ru_maxrss is KB on Linux but bytes on macOS"""
+    max_rss_kb = usage.ru_maxrss / 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return {
+        "wall_seconds": round(wall_seconds, 3),
+        "user_cpu_seconds": round(usage.ru_utime, 3),
+        "sys_cpu_seconds": round(usage.ru_stime, 3),
+        "max_rss_mb": round(max_rss_kb / 1024, 1),
+        "in_blocks": usage.ru_inblock,
+        "out_blocks": usage.ru_oublock,
+    }
+
+
+def run_with_rusage(cmd):
+    """
+    Run cmd to completion, capturing text stdout/stderr
+    Returns: (subprocess.CompletedProcess, usage dict or None)
+    """
+    start = time.time()
+    if not WAIT4_AVAILABLE:
+        return subprocess.run(cmd, capture_output=True, text=True), None
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    output = {"stdout": [], "stderr": []}
+
+    def drain(stream, name):
+        output[name].append(stream.read())
+        stream.close()
+
+    readers = [
+        threading.Thread(target=drain, args=(process.stdout, "stdout"), daemon=True),
+        threading.Thread(target=drain, args=(process.stderr, "stderr"), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    # Reap the child ourselves to get its rusage, then tell Popen it's done
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except BaseException:
+        # Same as subprocess.run: don't leave ffmpeg running if we're interrupted
+        process.kill()
+        process.wait()
+        raise
+    process.returncode = os.waitstatus_to_exitcode(status)
+    for reader in readers:
+        reader.join()
+
+    result = subprocess.CompletedProcess(cmd, process.returncode,
+                                         "".join(output["stdout"]), "".join(output["stderr"]))
+    return result, rusage_to_dict(usage, time.time() - start)
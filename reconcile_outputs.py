@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Reconcile Sources, Job State and HLS Outputs
+check_s3_output.py and friends look at one hard-coded key at a time. This
+lists the source prefix and the output prefix once each, maps every source
+to its destination with the same rule as submit_job (output_path_for), and
+reports for the whole catalog:
+
+    missing output      marked completed, but nothing under its destination
+    missing master      outputs exist but no MASTER.m3u8
+    incomplete          MASTER.m3u8 present, but a rendition playlist or its
+                        segments are missing, or renditions have different
+                        segment counts (an upload that died part way)
+    not recorded        complete outputs for a source the job state doesn't
+                        have as completed (left alone - nothing to redo)
+    orphaned            output folders no current source maps to (source
+                        deleted or renamed)
+    collisions          several sources mapping to one destination
+
+--requeue reopens every missing/incomplete source in the job state so the
+next run encodes it again. Only the listing is used; verify_hls_outputs.py
+parses the playlists and probes segments.
+
+Usage:
+    python3 reconcile_outputs.py "AI CERTs/Videos/" input-bucket output-bucket "streams/output/"
+    python3 reconcile_outputs.py ... --requeue
+    python3 reconcile_outputs.py ... --coordination s3 --json reconcile.json
+"""
+
+import re
+import sys
+import json
+import argparse
+from collections import defaultdict
+
+import convert_ffmpeg
+from convert_ffmpeg import (RENDITIONS, FileJobState, list_s3_video_object_info, output_path_for)
+from s3_leases import S3LeaseJobState
+from shard_assignment import ShardedJobState
+
+SEGMENT_PATTERN = re.compile(r"^seg_(.+)_\d+\.ts$")
+SHOW_EXAMPLES = 10
+
+
+class OutputFolder:
+    """What one destination folder holds, from the listing alone"""
+
+    def __init__(self):
+        self.master = False
+        self.playlists = set()
+        self.segments = defaultdict(int)
+        self.objects = 0
+        self.bytes = 0
+
+    def add(self, name, size):
+        self.objects += 1
+        self.bytes += size
+        if name == "MASTER.m3u8":
+            self.master = True
+        elif name.startswith("MASTER_") and name.endswith(".m3u8"):
+            self.playlists.add(name[len("MASTER_"):-len(".m3u8")])
+        else:
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                self.segments[match.group(1)] += 1
+
+    def is_hls(self):
+        return self.master or bool(self.playlists) or bool(self.segments)
+
+    def problems(self, renditions):
+        """Missing pieces as short strings (empty when complete)"""
+        problems = []
+        for name in renditions:
+            if name not in self.playlists:
+                problems.append(f"no MASTER_{name}.m3u8")
+            if not self.segments.get(name):
+                problems.append(f"no {name} segments")
+        counts = {self.segments[name] for name in renditions if self.segments.get(name)}
+        if len(counts) > 1:
+            problems.append(f"segment counts differ ({', '.join(f'{n}={self.segments[n]}' for n in renditions)})")
+        return problems
+
+
+def list_output_folders(s3_client, bucket, prefix):
+    """One pass over the output prefix: {folder prefix: OutputFolder}"""
+    folders = defaultdict(OutputFolder)
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            folder, _, name = obj["Key"].rpartition("/")
+            folders[folder + "/"].add(name, obj.get("Size", 0))
+    return folders
+
+
+def reconcile(sources, folders, is_complete, renditions):
+    """
+    sources: {video key: destination prefix}
+    Returns: dict of category -> list (see module docstring)
+    """
+    report = {"ok": [], "missing_output": [], "missing_master": [], "incomplete": [],
+              "not_recorded": [], "pending": [], "orphaned": [], "collisions": []}
+    by_destination = defaultdict(list)
+    for key, destination in sources.items():
+        by_destination[destination].append(key)
+    report["collisions"] = [{"destination": d, "sources": keys} for d, keys in by_destination.items() if len(keys) > 1]
+
+    for key, destination in sources.items():
+        folder = folders.get(destination)
+        completed = is_complete(key)
+        if folder is None or not folder.is_hls():
+            report["missing_output" if completed else "pending"].append({"key": key, "destination": destination})
+        elif not folder.master:
+            report["missing_master"].append({"key": key, "destination": destination, "completed": completed})
+        else:
+            problems = folder.problems(renditions)
+            if problems:
+                report["incomplete"].append({"key": key, "destination": destination, "completed": completed,
+                                             "problems": problems})
+            elif completed:
+                report["ok"].append({"key": key, "destination": destination})
+            else:
+                report["not_recorded"].append({"key": key, "destination": destination})
+
+    report["orphaned"] = [
+        {"destination": d, "objects": f.objects, "bytes": f.bytes}
+        for d, f in sorted(folders.items()) if f.is_hls() and d not in by_destination
+    ]
+    return report
+
+
+def make_job_state(args):
+    """Read-only use of the same job-state backend the workers used"""
+    if args.shard:
+        return ShardedJobState(convert_ffmpeg.s3, args.lease_bucket or args.output_bucket,
+                               args.lease_prefix or f"_coordination/{args.input_bucket}/", 0, 1)
+    if args.coordination == "s3":
+        return S3LeaseJobState(convert_ffmpeg.s3, args.lease_bucket or args.output_bucket,
+                               args.lease_prefix or f"_coordination/{args.input_bucket}/")
+    return FileJobState()
+
+
+def print_report(report):
+    def show(title, entries, describe):
+        print(f"\n{title}: {len(entries)}")
+        for entry in entries[:SHOW_EXAMPLES]:
+            print(f"   - {describe(entry)}")
+        if len(entries) > SHOW_EXAMPLES:
+            print(f"   ... and {len(entries) - SHOW_EXAMPLES} more")
+
+    print(f"\n✅ Complete: {len(report['ok'])}")
+    print(f"⏳ Not processed yet: {len(report['pending'])}")
+    show("❌ Marked completed but no output", report["missing_output"], lambda e: e["key"])
+    show("❌ Missing MASTER.m3u8", report["missing_master"], lambda e: e["key"])
+    show("⚠️  Incomplete renditions", report["incomplete"],
+         lambda e: f"{e['key']}: {'; '.join(e['problems'][:3])}")
+    show("ℹ️  Complete output, not marked completed", report["not_recorded"], lambda e: e["key"])
+    show("🗑️  Orphaned output folders", report["orphaned"],
+         lambda e: f"{e['destination']} ({e['objects']} objects, {e['bytes'] / (1024*1024):.1f} MB)")
+    show("⚠️  Sources sharing a destination", report["collisions"],
+         lambda e: f"{e['destination']} <- {', '.join(e['sources'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile sources, job state and HLS outputs in one pass")
+    parser.add_argument("s3_input_folder_prefix")
+    parser.add_argument("input_bucket")
+    parser.add_argument("output_bucket")
+    parser.add_argument("output_prefix")
+    parser.add_argument("--coordination", choices=["file", "s3"], default="file",
+                        help="Job-state backend the workers used (default: file)")
+    parser.add_argument("--shard", action="store_true", help="Workers ran with --shard")
+    parser.add_argument("--lease-bucket", help="Bucket holding S3 lease/shard markers (default: output bucket)")
+    parser.add_argument("--lease-prefix", help="Prefix for S3 lease/shard markers (default: _coordination/<input bucket>/)")
+    parser.add_argument("--listing-threads", type=int, default=16, help="Threads for listing the sources (default: 16)")
+    parser.add_argument("--requeue", action="store_true",
+                        help="Reopen missing/incomplete sources in the job state so the next run encodes them")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🔎 Reconcile Outputs")
+    print("="*60)
+    try:
+        print(f"Listing sources in s3://{args.input_bucket}/{args.s3_input_folder_prefix}...")
+        video_objects = list_s3_video_object_info(args.input_bucket, args.s3_input_folder_prefix,
+                                                  listing_threads=args.listing_threads)
+        sources = {obj["Key"]: output_path_for(obj["Key"], args.output_prefix, args.s3_input_folder_prefix)
+                   for obj in video_objects}
+        print(f"   {len(sources)} sources")
+
+        print(f"Listing outputs in s3://{args.output_bucket}/{args.output_prefix}...")
+        folders = list_output_folders(convert_ffmpeg.s3, args.output_bucket, args.output_prefix)
+        print(f"   {len(folders)} folders, {sum(f.objects for f in folders.values())} objects")
+
+        job_state = make_job_state(args)
+        job_state.status_counts(list(sources))
+        if job_state.name == "file":
+            # One read instead of one per key
+            processed = convert_ffmpeg.load_processed_videos()
+            is_complete = processed.__contains__
+        else:
+            is_complete = job_state.is_video_complete
+
+        report = reconcile(sources, folders, is_complete, [r["name_modifier"] for r in RENDITIONS])
+        print_report(report)
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\n📝 Full report: {args.json}")
+
+        broken = [e["key"] for category in ("missing_output", "missing_master", "incomplete")
+                  for e in report[category]]
+        if args.requeue and broken:
+            job_state.reopen(broken)
+            print(f"\n♻️  Requeued {len(broken)} videos. Workers will pick them up on their next run.")
+        elif broken:
+            print(f"\nRun again with --requeue to re-encode the {len(broken)} missing/incomplete videos.")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    print("="*60)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Requeue Quarantined Videos - Helper Script
+Lists quarantined_videos.json and releases videos back to the workers
+Use this after fixing or re-uploading a source that failed permanently
+
+Usage:
+    python3 requeue_quarantined.py                 # list quarantined videos
+    python3 requeue_quarantined.py --all           # requeue every quarantined video
+    python3 requeue_quarantined.py "<video key>"   # requeue specific videos
+"""
+
+import sys
+import time
+
+# Only the state-file helpers: importing convert_ffmpeg would create an S3 client
+from state_files import (QUARANTINE_FILE, FAILED_VIDEOS_FILE, NEAR_DUPES_FILE, load_quarantined_videos,
+                         update_json_file_with_lock)
+
+def list_quarantined(quarantined):
+    if not quarantined:
+        print(f"✅ No quarantined videos.")
+        return
+    print(f"🚫 {len(quarantined)} quarantined videos:\n")
+    for i, (video, record) in enumerate(quarantined.items(), 1):
+        print(f"   {i}. {video}")
+        print(f"      {record.get('class')} ({record.get('stage')}): {record.get('reason')}"
+              f" after {record.get('attempts')} attempt(s)")
+        diagnostic = (record.get('diagnostic') or '').strip().splitlines()
+        if diagnostic:
+            print(f"      Last error: {diagnostic[-1][:200]}")
+
+def requeue(quarantined, keys):
+    missing = [k for k in keys if k not in quarantined]
+    for key in missing:
+        print(f"⚠️  Not quarantined: {key}")
+    keys = [k for k in keys if k in quarantined]
+    if not keys:
+        return
+    
+    # Locked read-modify-write: workers may be adding records at the same time
+    released = set(keys)
+    update_json_file_with_lock(
+        QUARANTINE_FILE, lambda data: {k: v for k, v in data.items() if k not in released}, default={})
+    
+    # Start the retry count from scratch
+    update_json_file_with_lock(
+        FAILED_VIDEOS_FILE, lambda data: {k: v for k, v in data.items() if k not in released}, default={})
+    
+    # Near-duplicates held by --near-dupes skip are encoded normally once released
+    released_at = time.time()
+    update_json_file_with_lock(
+        NEAR_DUPES_FILE,
+        lambda data: {k: dict(v, released_at=released_at) if k in released else v for k, v in data.items()},
+        default={})
+    
+    for key in keys:
+        print(f"♻️  Requeued: {key}")
+    print(f"\n✅ Requeued {len(keys)} videos. Workers will pick them up on their next run.")
+
+if __name__ == "__main__":
+    print("="*60)
+    print("🚫 Quarantined Videos")
+    print("="*60)
+    try:
+        quarantined = load_quarantined_videos()
+        args = sys.argv[1:]
+        if not args:
+            list_quarantined(quarantined)
+        elif args == ["--all"]:
+            requeue(quarantined, list(quarantined))
+        else:
+            requeue(quarantined, args)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    print("="*60)
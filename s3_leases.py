@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+S3 Lease Coordination
+Multi-node replacement for the flock-based processed/in-progress JSON files.
+Every job gets one lease object in S3, created with a conditional write
+(If-None-Match: *) and renewed/taken over with If-Match on its ETag, so any
+number of instances can drain the same input prefix without a shared disk.
+
+Layout under the coordination prefix:
+    leases/<sha1 of video key>.json   - current owner, renewed while encoding
+    done/<sha1 of video key>.json     - written once the video is uploaded
+
+Only leases/ is listed on every claim; it holds just the jobs in flight.
+done/ grows with the catalog, so it is listed once and re-listed every
+DONE_RELIST_SECONDS. A video another node finished in between is caught
+by the done-marker HEAD after each claim.
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+# A lease not renewed for this long is considered abandoned and can be taken over
+DEFAULT_LEASE_SECONDS = 900
+
+# How long the cached listing of done markers is trusted between claims
+DONE_RELIST_SECONDS = 300
+
+# Error codes S3 returns when a conditional write loses the race
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412", "409")
+
+
+def default_worker_id():
+    """Identify this worker as host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_id_for_key(video_key):
+    """Stable object name for a video key (keys contain spaces and slashes)"""
+    return hashlib.sha1(video_key.encode("utf-8")).hexdigest()
+
+
+def _error_code(error):
+    return error.response.get("Error", {}).get("Code", "")
+
+
+class S3LeaseJobState:
+    """
+    Job-state backend storing one lease object per video in S3
+    Exposes the same methods as FileJobState in convert_ffmpeg.py
+    """
+
+    name = "s3"
+
+    def __init__(self, s3_client, bucket, prefix, worker_id=None,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, heartbeat=True):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix if not prefix or prefix.endswith("/") else prefix + "/"
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_enabled = heartbeat
+
+        # video_key -> ETag of the lease object we currently hold
+        self._held = {}
+        self._held_lock = threading.Lock()
+        self._heartbeats = {}
+
+        # Snapshot of the coordination prefix: leases re-listed on every acquire,
+        # done markers only every DONE_RELIST_SECONDS
+        self._done_ids = set()
+        self._done_listed_at = None
+        self._leases = {}
+
+    # ------------------------------------------------------------------
+    # Object helpers
+    # ------------------------------------------------------------------
+    def _lease_key(self, video_key):
+        return f"{self.prefix}leases/{job_id_for_key(video_key)}.json"
+
+    def _done_key(self, video_key):
+        return f"{self.prefix}done/{job_id_for_key(video_key)}.json"
+
+    def _lease_body(self, video_key):
+        now = time.time()
+        return json.dumps({
+            "video_key": video_key,
+            "owner": self.worker_id,
+            "renewed_at": now,
+            "expires_at": now + self.lease_seconds,
+        }).encode("utf-8")
+
+    def _list_ids(self, sub_prefix):
+        """List a sub-prefix and return {job_id: (etag, last_modified)}"""
+        found = {}
+        paginator = self.s3.get_paginator("list_objects_v2")
+        full_prefix = f"{self.prefix}{sub_prefix}/"
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=full_prefix):
+            for obj in page.get("Contents", []):
+                job_id = obj["Key"][len(full_prefix):].rsplit(".", 1)[0]
+                found[job_id] = (obj["ETag"], obj["LastModified"])
+        return found
+
+    def refresh(self, full=False):
+        """Reload active leases from S3, and the done markers when full or when the cached set is stale"""
+        if full or self._done_listed_at is None or time.time() - self._done_listed_at > DONE_RELIST_SECONDS:
+            listed_at = time.time()
+            self._done_ids = set(self._list_ids("done"))
+            self._done_listed_at = listed_at
+        self._leases = self._list_ids("leases")
+
+    def _lease_expired(self, last_modified):
+        age = (datetime.now(timezone.utc) - last_modified).total_seconds()
+        return age > self.lease_seconds
+
+    # ------------------------------------------------------------------
+    # Claim / renew / release
+    # ------------------------------------------------------------------
+    def _try_claim(self, video_key):
+        """Create or take over the lease for one video, returning True on success"""
+        job_id = job_id_for_key(video_key)
+        existing = self._leases.get(job_id)
+        try:
+            if existing is None:
+                response = self.s3.put_object(
+                    Bucket=self.bucket, Key=self._lease_key(video_key),
+                    Body=self._lease_body(video_key), IfNoneMatch="*",
+                    ContentType="application/json",
+                )
+            else:
+                etag, last_modified = existing
+                if not self._lease_expired(last_modified):
+                    return False
+                print(f"♻️  Taking over expired lease: {video_key}")
+                response = self.s3.put_object(
+                    Bucket=self.bucket, Key=self._lease_key(video_key),
+                    Body=self._lease_body(video_key), IfMatch=etag,
+                    ContentType="application/json",
+                )
+        except ClientError as e:
+            if _error_code(e) in CONFLICT_CODES or _error_code(e) == "NoSuchKey":
+                return False
+            raise
+
+        # The video may have been finished between our listing and the claim
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self._done_key(video_key))
+            self.s3.delete_object(Bucket=self.bucket, Key=self._lease_key(video_key))
+            self._done_ids.add(job_id)
+            return False
+        except ClientError as e:
+            if _error_code(e) not in ("404", "NoSuchKey", "NotFound"):
+                raise
+
+        with self._held_lock:
+            self._held[video_key] = response["ETag"]
+        return True
+
+    def renew(self, video_key):
+        """Extend our lease; returns False if another worker has taken it"""
+        with self._held_lock:
+            etag = self._held.get(video_key)
+        if etag is None:
+            return False
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket, Key=self._lease_key(video_key),
+                Body=self._lease_body(video_key), IfMatch=etag,
+                ContentType="application/json",
+            )
+        except ClientError as e:
+            if _error_code(e) in CONFLICT_CODES or _error_code(e) == "NoSuchKey":
+                print(f"⚠️  Lost lease on {video_key} (taken over by another worker)")
+                with self._held_lock:
+                    self._held.pop(video_key, None)
+                return False
+            print(f"⚠️  Lease renewal failed for {video_key}: {e}")
+            return True
+        with self._held_lock:
+            if video_key in self._held:
+                self._held[video_key] = response["ETag"]
+        return True
+
+    def holds_lease(self, video_key):
+        with self._held_lock:
+            return video_key in self._held
+
+    def _start_heartbeat(self, video_key):
+        if not self.heartbeat_enabled:
+            return
+        stop = threading.Event()
+
+        def beat():
+            # Renew at a third of the lease so one missed renewal is survivable
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.renew(video_key):
+                    break
+
+        thread = threading.Thread(target=beat, name=f"lease-{job_id_for_key(video_key)[:8]}",
+                                  daemon=True)
+        thread.start()
+        self._heartbeats[video_key] = stop
+
+    def _stop_heartbeat(self, video_key):
+        stop = self._heartbeats.pop(video_key, None)
+        if stop:
+            stop.set()
+
+    def _release(self, video_key):
+        self._stop_heartbeat(video_key)
+        with self._held_lock:
+            etag = self._held.pop(video_key, None)
+        if etag is None:
+            return
+        try:
+            self.s3.delete_object(Bucket=self.bucket, Key=self._lease_key(video_key), IfMatch=etag)
+        except ClientError as e:
+            if _error_code(e) not in CONFLICT_CODES:
+                print(f"⚠️  Could not delete lease for {video_key}: {e}")
+
+    # ------------------------------------------------------------------
+    # Job-state interface
+    # ------------------------------------------------------------------
+    def acquire_next_video(self, all_videos, max_retries=10):
+        """
+        Claim the first video that is neither done nor leased by a live worker
+        Returns: (video_key, should_continue) like convert_ffmpeg.acquire_next_video
+        """
+        for attempt in range(max_retries):
+            try:
+                self.refresh()
+                for video_key in all_videos:
+                    if job_id_for_key(video_key) in self._done_ids:
+                        continue
+                    if self._try_claim(video_key):
+                        self._start_heartbeat(video_key)
+                        return video_key, True
+                return None, False
+            except Exception as e:
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries} failed: {e}")
+                time.sleep(min(2 ** attempt, 30))
+
+        print("❌ Could not acquire a lease after maximum retries")
+        return None, False
+
+    def mark_video_complete(self, video_key):
+        """Write the done marker, then drop the lease"""
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket, Key=self._done_key(video_key),
+                Body=json.dumps({
+                    "video_key": video_key,
+                    "owner": self.worker_id,
+                    "completed_at": time.time(),
+                }).encode("utf-8"),
+                ContentType="application/json",
+            )
+            self._done_ids.add(job_id_for_key(video_key))
+            self._release(video_key)
+            return True
+        except Exception as e:
+            print(f"❌ Error marking video complete: {e}")
+            return False
+
+    def mark_video_failed(self, video_key):
+        """Drop the lease so another worker (or a later run) can retry"""
+        try:
+            self._release(video_key)
+            return True
+        except Exception as e:
+            print(f"❌ Error marking video failed: {e}")
+            return False
+
+    def is_video_complete(self, video_key):
+        """Uses the done markers seen by the last refresh"""
+        return job_id_for_key(video_key) in self._done_ids
+
+    def status_counts(self, all_videos, fresh=True):
+        """
+        Return (completed, in_progress, remaining) across every node
+        fresh=False counts from the markers cached by the last claim (no listing)
+        """
+        if fresh:
+            try:
+                self.refresh(full=True)
+            except Exception as e:
+                print(f"⚠️  Warning: Could not refresh lease state: {e}")
+        live_leases = {
+            job_id for job_id, (_, last_modified) in self._leases.items()
+            if not self._lease_expired(last_modified)
+        }
+        completed = in_progress = remaining = 0
+        for video_key in all_videos:
+            job_id = job_id_for_key(video_key)
+            if job_id in self._done_ids:
+                completed += 1
+            elif job_id in live_leases:
+                in_progress += 1
+            else:
+                remaining += 1
+        return completed, in_progress, remaining
+
+    def reopen(self, video_keys):
+        """Delete the done markers of these keys so they are processed again (--reprocess-changed)"""
+        for video_key in video_keys:
+            self.s3.delete_object(Bucket=self.bucket, Key=self._done_key(video_key))
+            self._done_ids.discard(job_id_for_key(video_key))
+
+    def reset(self):
+        """Remove every done marker and lease (used by --force)"""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for sub_prefix in ("done", "leases"):
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{sub_prefix}/"):
+                for obj in page.get("Contents", []):
+                    self.s3.delete_object(Bucket=self.bucket, Key=obj["Key"])
+        self._done_ids = set()
+        self._done_listed_at = None
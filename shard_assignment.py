@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Hash-Sharded Worker Assignment
+No-coordination alternative to lease polling for large fleets: worker i of N
+owns every key whose stable hash modulo N equals i, so it never has to look at
+anybody else's state while its own shard has work.
+
+Marker protocol (under the same coordination prefix as s3_leases.py):
+    claims/<sha1 of video key>.json   - created with If-None-Match: * before encoding
+    done/<sha1 of video key>.json     - written on success (shared with S3LeaseJobState)
+
+Owners walk their shard from the head; once it is empty they steal from the
+tail of the other shards, so owner and thief only collide on the last job.
+The markers are listed when a worker starts, when it starts stealing and
+when its last listing has nothing left to steal - not after every job.
+A failed job deletes its claim so it can be retried. Claims are renewed
+(If-Match on their ETag) every stale_seconds / 3 while the job runs, so a
+claim left behind by a crashed worker is taken over once it hasn't been
+renewed for stale_seconds.
+"""
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from s3_leases import default_worker_id, job_id_for_key, CONFLICT_CODES, DEFAULT_LEASE_SECONDS
+
+# A claim not renewed for this long is considered abandoned (same window as S3 leases)
+DEFAULT_STALE_CLAIM_SECONDS = DEFAULT_LEASE_SECONDS
+
+
+def parse_shard(spec):
+    """Parse an 'i/N' shard spec into (index, count) for argparse"""
+    try:
+        index_str, count_str = spec.split("/", 1)
+        index, count = int(index_str), int(count_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{spec}', expected i/N (e.g. 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{spec}', need 0 <= i < N")
+    return index, count
+
+
+def shard_for_key(video_key, shard_count):
+    """
+    Stable shard number for a key
+    Uses SHA-1 rather than hash(), which is salted per process
+    """
+    digest = hashlib.sha1(video_key.encode("utf-8")).hexdigest()
+    return int(digest[:16], 16) % shard_count
+
+
+def _error_code(error):
+    return error.response.get("Error", {}).get("Code", "")
+
+
+class ShardedJobState:
+    """
+    Job-state backend for --shard i/N
+    Exposes the same methods as FileJobState in convert_ffmpeg.py
+    """
+
+    name = "shard"
+
+    def __init__(self, s3_client, bucket, prefix, shard_index, shard_count,
+                 worker_id=None, stale_seconds=DEFAULT_STALE_CLAIM_SECONDS, heartbeat=True):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix if not prefix or prefix.endswith("/") else prefix + "/"
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.worker_id = worker_id or default_worker_id()
+        self.stale_seconds = stale_seconds
+        self.heartbeat_enabled = heartbeat
+
+        # job_id -> (etag, last_modified), loaded once and then kept up to date locally
+        self._claims = None
+        self._done_ids = set()
+        # video_key -> ETag of the claim marker we hold (the heartbeat thread updates it)
+        self._held = {}
+        self._held_lock = threading.Lock()
+        self._heartbeats = {}
+        self._failed_here = set()
+        self._stealing = False
+        self.stolen_count = 0
+
+    # ------------------------------------------------------------------
+    # Marker helpers
+    # ------------------------------------------------------------------
+    def _claim_key(self, video_key):
+        return f"{self.prefix}claims/{job_id_for_key(video_key)}.json"
+
+    def _done_key(self, video_key):
+        return f"{self.prefix}done/{job_id_for_key(video_key)}.json"
+
+    def _list_ids(self, sub_prefix):
+        found = {}
+        paginator = self.s3.get_paginator("list_objects_v2")
+        full_prefix = f"{self.prefix}{sub_prefix}/"
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=full_prefix):
+            for obj in page.get("Contents", []):
+                job_id = obj["Key"][len(full_prefix):].rsplit(".", 1)[0]
+                found[job_id] = (obj["ETag"], obj["LastModified"])
+        return found
+
+    def refresh(self):
+        """Reload claim and done markers from S3"""
+        self._done_ids = set(self._list_ids("done"))
+        self._claims = self._list_ids("claims")
+
+    def _claim_is_stale(self, job_id):
+        _, last_modified = self._claims[job_id]
+        age = (datetime.now(timezone.utc) - last_modified).total_seconds()
+        return age > self.stale_seconds
+
+    def _claim_body(self, video_key, stolen):
+        return json.dumps({
+            "video_key": video_key,
+            "owner": self.worker_id,
+            "shard": f"{self.shard_index}/{self.shard_count}",
+            "stolen": stolen,
+            "claimed_at": time.time(),
+        }).encode("utf-8")
+
+    def _try_claim(self, video_key, stolen=False):
+        job_id = job_id_for_key(video_key)
+        if job_id in self._done_ids or video_key in self._failed_here:
+            return False
+        params = {"Bucket": self.bucket, "Key": self._claim_key(video_key),
+                  "Body": self._claim_body(video_key, stolen), "ContentType": "application/json"}
+        if job_id in self._claims:
+            # No ETag: a claim we lost a race for since the last listing
+            if not self._claims[job_id][0] or not self._claim_is_stale(job_id):
+                return False
+            params["IfMatch"] = self._claims[job_id][0]
+        else:
+            params["IfNoneMatch"] = "*"
+        try:
+            response = self.s3.put_object(**params)
+        except ClientError as e:
+            if _error_code(e) in CONFLICT_CODES or _error_code(e) == "NoSuchKey":
+                # Someone else got there first (or renewed it); remember it so we don't ask again
+                self._claims[job_id] = ("", datetime.now(timezone.utc))
+                return False
+            raise
+        self._claims[job_id] = (response["ETag"], datetime.now(timezone.utc))
+
+        # A taken-over claim may belong to a video finished after our last listing
+        # (claims of finished videos are kept, so a fresh claim never needs this)
+        if "IfMatch" in params:
+            try:
+                self.s3.head_object(Bucket=self.bucket, Key=self._done_key(video_key))
+                self._done_ids.add(job_id)
+                return False
+            except ClientError as e:
+                if _error_code(e) not in ("404", "NoSuchKey", "NotFound"):
+                    raise
+
+        with self._held_lock:
+            self._held[video_key] = (response["ETag"], stolen)
+        self._start_heartbeat(video_key)
+        return True
+
+    def renew(self, video_key):
+        """Rewrite our claim marker so it isn't taken as stale; False if another worker took it over"""
+        with self._held_lock:
+            held = self._held.get(video_key)
+        if held is None:
+            return False
+        etag, stolen = held
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket, Key=self._claim_key(video_key), Body=self._claim_body(video_key, stolen),
+                IfMatch=etag, ContentType="application/json",
+            )
+        except ClientError as e:
+            if _error_code(e) in CONFLICT_CODES or _error_code(e) == "NoSuchKey":
+                print(f"⚠️  Lost claim on {video_key} (taken over by another worker)")
+                with self._held_lock:
+                    self._held.pop(video_key, None)
+                return False
+            print(f"⚠️  Claim renewal failed for {video_key}: {e}")
+            return True
+        with self._held_lock:
+            if video_key in self._held:
+                self._held[video_key] = (response["ETag"], stolen)
+        return True
+
+    def _start_heartbeat(self, video_key):
+        if not self.heartbeat_enabled:
+            return
+        stop = threading.Event()
+
+        def beat():
+            # Renew at a third of the stale window so one missed renewal is survivable
+            while not stop.wait(self.stale_seconds / 3):
+                if not self.renew(video_key):
+                    break
+
+        thread = threading.Thread(target=beat, name=f"claim-{job_id_for_key(video_key)[:8]}", daemon=True)
+        thread.start()
+        self._heartbeats[video_key] = stop
+
+    def _stop_heartbeat(self, video_key):
+        stop = self._heartbeats.pop(video_key, None)
+        if stop:
+            stop.set()
+
+    # ------------------------------------------------------------------
+    # Job-state interface
+    # ------------------------------------------------------------------
+    def owned_keys(self, all_videos):
+        return [v for v in all_videos if shard_for_key(v, self.shard_count) == self.shard_index]
+
+    def acquire_next_video(self, all_videos, max_retries=10):
+        """
+        Take the next key from our own shard; once it is empty, steal from the
+        tails of the other shards
+        Returns: (video_key, should_continue)
+        """
+        for attempt in range(max_retries):
+            try:
+                just_listed = self._claims is None
+                if just_listed:
+                    self.refresh()
+
+                for video_key in self.owned_keys(all_videos):
+                    if self._try_claim(video_key):
+                        return video_key, True
+
+                # Own shard drained - steal from the others, from a fresh listing the
+                # first time and then from the same one until it has nothing left
+                video_key = self._steal(all_videos) if self._stealing or just_listed else None
+                if video_key is None and not just_listed:
+                    self.refresh()
+                    video_key = self._steal(all_videos)
+                self._stealing = True
+                return video_key, video_key is not None
+            except Exception as e:
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries} failed: {e}")
+                time.sleep(min(2 ** attempt, 30))
+
+        print("❌ Could not claim a video after maximum retries")
+        return None, False
+
+    def _steal(self, all_videos):
+        """Claim a key from the tail of another shard; None if the current listing has none left"""
+        for offset in range(1, self.shard_count):
+            victim = (self.shard_index + offset) % self.shard_count
+            victim_keys = [v for v in all_videos if shard_for_key(v, self.shard_count) == victim]
+            for video_key in reversed(victim_keys):
+                if self._try_claim(video_key, stolen=True):
+                    self.stolen_count += 1
+                    print(f"🦝 Stole from shard {victim}/{self.shard_count}: {video_key}")
+                    return video_key
+        return None
+
+    def mark_video_complete(self, video_key):
+        """Write the done marker; the claim stays so nobody re-claims the key"""
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket, Key=self._done_key(video_key),
+                Body=json.dumps({
+                    "video_key": video_key,
+                    "owner": self.worker_id,
+                    "completed_at": time.time(),
+                }).encode("utf-8"),
+                ContentType="application/json",
+            )
+            self._done_ids.add(job_id_for_key(video_key))
+            self._stop_heartbeat(video_key)
+            with self._held_lock:
+                self._held.pop(video_key, None)
+            return True
+        except Exception as e:
+            print(f"❌ Error marking video complete: {e}")
+            return False
+
+    def mark_video_failed(self, video_key):
+        """Delete our claim so the key can be retried"""
+        self._stop_heartbeat(video_key)
+        with self._held_lock:
+            held = self._held.pop(video_key, None)
+        if held is None:
+            return True
+        etag = held[0]
+        try:
+            # Other workers (and the next run) see the deleted marker and retry it;
+            # this worker skips it so it doesn't spin on the same key
+            self._failed_here.add(video_key)
+            self.s3.delete_object(Bucket=self.bucket, Key=self._claim_key(video_key), IfMatch=etag)
+            return True
+        except Exception as e:
+            print(f"❌ Error marking video failed: {e}")
+            return False
+
+    def is_video_complete(self, video_key):
+        """Uses the done markers seen by the last refresh"""
+        return job_id_for_key(video_key) in self._done_ids
+
+    def status_counts(self, all_videos, fresh=True):
+        """
+        Return (completed, in_progress, remaining) across every shard
+        fresh=False counts from this worker's own view (no listing), so other
+        shards' progress only shows up after its next listing
+        """
+        if fresh:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️  Warning: Could not refresh shard markers: {e}")
+        if self._claims is None:
+            self._claims = {}
+        completed = in_progress = remaining = 0
+        for video_key in all_videos:
+            job_id = job_id_for_key(video_key)
+            if job_id in self._done_ids:
+                completed += 1
+            elif job_id in self._claims and not self._claim_is_stale(job_id):
+                in_progress += 1
+            else:
+                remaining += 1
+        return completed, in_progress, remaining
+
+    def reopen(self, video_keys):
+        """Delete the done and claim markers of these keys so they are processed again (--reprocess-changed)"""
+        for video_key in video_keys:
+            self.s3.delete_object(Bucket=self.bucket, Key=self._done_key(video_key))
+            self.s3.delete_object(Bucket=self.bucket, Key=self._claim_key(video_key))
+        self._claims = None
+        self._done_ids = set()
+        self._stealing = False
+
+    def reset(self):
+        """Remove every claim and done marker (used by --force)"""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for sub_prefix in ("done", "claims"):
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{sub_prefix}/"):
+                for obj in page.get("Contents", []):
+                    self.s3.delete_object(Bucket=self.bucket, Key=obj["Key"])
+        self._claims = None
+        self._done_ids = set()
+        self._stealing = False
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Job-claim Contention Soak Test
+test_parallel_local.py runs 20 keys with 2-5 s fake jobs, which never
+contends. This runs many processes (default 32) against a large backlog
+(default 50,000 keys) with a fast pluggable fake encoder, against every
+job-state backend:
+
+    file   FileJobState (processed/in-progress JSON + flock)
+    s3     S3LeaseJobState on the local S3 stand-in
+    shard  ShardedJobState on the local S3 stand-in (one shard per process)
+
+and reports claim throughput, acquire_next_video and mark_video_complete
+latency percentiles, time spent waiting on flock, and correctness:
+    duplicate  a key held by two workers at once, or claimed after it completed
+    lost       a completion the backend doesn't show at the end
+    stranded   a key the file backend still lists as in progress at the end
+
+Usage:
+    python3 soak_job_claims.py                                 # all backends, 32 processes, 50k keys, 120 s each
+    python3 soak_job_claims.py --backends file --processes 64 --duration 300
+    python3 soak_job_claims.py --encoder sleep:0.005-0.05 --failure-rate 0.02
+    python3 soak_job_claims.py --encoder mymodule:fake_encode  # fake_encode(video_key) -> True/False
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import importlib
+import multiprocessing
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+BACKENDS = ("file", "s3", "shard")
+SOAK_BUCKET = "soak"
+COORDINATION_PREFIX = "_coordination/"
+
+
+def backlog_keys(count):
+    """Synthetic keys spread over 100 folders, like a real course tree"""
+    return [f"soak/folder_{i % 100:02d}/video_{i:06d}.mp4" for i in range(count)]
+
+
+def make_encoder(spec):
+    """
+    Fake encoder from a spec:
+        noop                  return immediately
+        sleep:S / sleep:A-B   sleep S seconds, or uniformly between A and B
+        module:function       your own function(video_key) -> bool
+    """
+    if spec == "noop":
+        return lambda key: True
+    if spec.startswith("sleep:"):
+        bounds = [float(x) for x in spec[len("sleep:"):].split("-")]
+        low, high = bounds[0], bounds[-1]
+
+        def sleep_encoder(key):
+            time.sleep(random.uniform(low, high))
+            return True
+        return sleep_encoder
+    module_name, _, function_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def instrument_flock(stats):
+    """Time every blocking flock call in this process (file backend and the S3 stand-in both use it)"""
+    if fcntl is None:
+        return
+    original = fcntl.flock
+
+    def timed_flock(fd, operation):
+        if operation & fcntl.LOCK_UN:
+            return original(fd, operation)
+        start = time.perf_counter()
+        try:
+            return original(fd, operation)
+        finally:
+            stats["lock_wait"] += time.perf_counter() - start
+            stats["lock_calls"] += 1
+
+    fcntl.flock = timed_flock
+
+
+def make_backend(name, index, processes, work_dir):
+    from local_s3 import LocalS3Client
+    if name == "file":
+        import convert_ffmpeg
+        return convert_ffmpeg.FileJobState()
+    client = LocalS3Client(os.path.join(work_dir, "s3"))
+    if name == "s3":
+        from s3_leases import S3LeaseJobState
+        return S3LeaseJobState(client, SOAK_BUCKET, COORDINATION_PREFIX, worker_id=f"p{index}", heartbeat=False)
+    from shard_assignment import ShardedJobState
+    return ShardedJobState(client, SOAK_BUCKET, COORDINATION_PREFIX, index, processes, worker_id=f"p{index}")
+
+
+def soak_worker(index, backend_name, processes, work_dir, keys, encoder_spec, failure_rate, deadline):
+    """One contending process; writes its claim log to work_dir/worker_<index>.json"""
+    os.chdir(work_dir)
+    sys.stdout = open(os.path.join(work_dir, f"worker_{index}.log"), "w", buffering=1)
+    random.seed(os.getpid())
+    lock_stats = {"lock_wait": 0.0, "lock_calls": 0}
+    instrument_flock(lock_stats)
+
+    backend = make_backend(backend_name, index, processes, work_dir)
+    encode = make_encoder(encoder_spec)
+    claims = []
+    acquire_seconds = []
+    complete_seconds = []
+    errors = 0
+
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            key, should_continue = backend.acquire_next_video(keys, max_retries=3)
+        except Exception as e:
+            errors += 1
+            print(f"acquire error: {e}")
+            continue
+        acquire_seconds.append(time.perf_counter() - start)
+        if key is None:
+            break
+        claimed_at = time.time()
+
+        ok = encode(key) and random.random() >= failure_rate
+        # Stamped before marking so the recorded hold is never longer than the real one:
+        # another worker may legitimately claim a failed key before mark_video_failed returns
+        released_at = time.time()
+        start = time.perf_counter()
+        if ok:
+            ok = bool(backend.mark_video_complete(key))
+            complete_seconds.append(time.perf_counter() - start)
+        else:
+            backend.mark_video_failed(key)
+        claims.append([key, claimed_at, released_at, "completed" if ok else "failed"])
+
+    with open(os.path.join(work_dir, f"worker_{index}.json"), "w") as f:
+        json.dump({
+            "claims": claims,
+            "acquire_seconds": acquire_seconds,
+            "complete_seconds": complete_seconds,
+            "lock_wait": lock_stats["lock_wait"],
+            "lock_calls": lock_stats["lock_calls"],
+            "errors": errors,
+        }, f)
+
+
+def final_state(backend_name, work_dir, keys):
+    """(completed keys, keys still marked in progress) as the backend sees them after the run"""
+    os.chdir(work_dir)
+    if backend_name == "file":
+        import convert_ffmpeg
+        return convert_ffmpeg.load_processed_videos(), convert_ffmpeg.load_in_progress_videos()
+    backend = make_backend(backend_name, 0, 1, work_dir)
+    backend.refresh()
+    return {k for k in keys if backend.is_video_complete(k)}, set()
+
+
+def check_claims(all_claims, completed_keys):
+    """Count duplicate and lost claims from every worker's claim log"""
+    by_key = defaultdict(list)
+    for worker, (key, claimed_at, released_at, result) in all_claims:
+        by_key[key].append((claimed_at, released_at, result, worker))
+
+    duplicates = []
+    for key, claims in by_key.items():
+        claims.sort()
+        completed_at = None
+        for i, (claimed_at, released_at, result, worker) in enumerate(claims):
+            overlap = i > 0 and claimed_at < claims[i - 1][1]
+            after_done = completed_at is not None and claimed_at >= completed_at
+            if overlap or after_done:
+                duplicates.append((key, worker, "overlapping claim" if overlap else "claimed after completion"))
+            if result == "completed" and completed_at is None:
+                completed_at = released_at
+
+    lost = [key for key, claims in by_key.items()
+            if any(c[2] == "completed" for c in claims) and key not in completed_keys]
+    return duplicates, lost
+
+
+def run_backend(backend_name, args, keys):
+    work_dir = os.path.abspath(os.path.join(args.work_dir, backend_name))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    print(f"\n🔥 {backend_name}: {args.processes} processes, {len(keys):,} keys, up to {args.duration}s")
+
+    context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+    start = time.time()
+    deadline = start + args.duration
+    processes = [
+        context.Process(target=soak_worker, args=(i, backend_name, args.processes, work_dir, keys,
+                                                  args.encoder, args.failure_rate, deadline))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    wall = time.time() - start
+
+    all_claims = []
+    acquire_seconds, complete_seconds = [], []
+    lock_wait = lock_calls = errors = crashed = 0
+    for i in range(args.processes):
+        try:
+            with open(os.path.join(work_dir, f"worker_{i}.json")) as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            crashed += 1
+            continue
+        all_claims.extend((i, claim) for claim in result["claims"])
+        acquire_seconds += result["acquire_seconds"]
+        complete_seconds += result["complete_seconds"]
+        lock_wait += result["lock_wait"]
+        lock_calls += result["lock_calls"]
+        errors += result["errors"]
+
+    completed_keys, in_progress = final_state(backend_name, work_dir, keys)
+    duplicates, lost = check_claims(all_claims, completed_keys)
+    return {
+        "backend": backend_name,
+        "wall_seconds": round(wall, 1),
+        "claims": len(all_claims),
+        "claims_per_second": round(len(all_claims) / wall, 1) if wall else 0,
+        "completed": len(completed_keys),
+        "drained": len(completed_keys) == len(keys),
+        "acquire_ms": {p: round(percentile(acquire_seconds, p) * 1000, 2) for p in (50, 95, 99, 100)},
+        "complete_ms": {p: round(percentile(complete_seconds, p) * 1000, 2) for p in (50, 95, 99, 100)},
+        "lock_wait_seconds": round(lock_wait, 2),
+        "lock_wait_ms_per_claim": round(lock_wait / len(all_claims) * 1000, 2) if all_claims else 0,
+        "lock_calls": lock_calls,
+        "duplicates": len(duplicates),
+        "duplicate_examples": duplicates[:5],
+        "lost": len(lost),
+        "stranded": len(in_progress),
+        "errors": errors,
+        "crashed_workers": crashed,
+    }
+
+
+def print_result(r):
+    acquire, complete = r["acquire_ms"], r["complete_ms"]
+    print(f"   Claims: {r['claims']:,} in {r['wall_seconds']}s ({r['claims_per_second']}/s), "
+          f"completed {r['completed']:,}{' (drained)' if r['drained'] else ''}")
+    print(f"   acquire_next_video ms: p50 {acquire[50]}  p95 {acquire[95]}  p99 {acquire[99]}  max {acquire[100]}")
+    print(f"   mark_video_complete ms: p50 {complete[50]}  p95 {complete[95]}  p99 {complete[99]}  max {complete[100]}")
+    print(f"   flock wait: {r['lock_wait_seconds']}s total, {r['lock_wait_ms_per_claim']} ms/claim "
+          f"({r['lock_calls']:,} calls)")
+    status = "✅" if not (r["duplicates"] or r["lost"] or r["stranded"] or r["crashed_workers"]) else "❌"
+    print(f"   {status} duplicates {r['duplicates']} | lost {r['lost']} | stranded {r['stranded']} | "
+          f"errors {r['errors']} | crashed workers {r['crashed_workers']}")
+    for key, worker, reason in r["duplicate_examples"]:
+        print(f"      {reason}: {key} (process {worker})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak-test job claiming under heavy contention")
+    parser.add_argument("--backends", type=lambda v: v.split(","), default=list(BACKENDS),
+                        help="Comma-separated: file,s3,shard (default: all)")
+    parser.add_argument("--processes", type=int, default=32, help="Contending processes (default: 32)")
+    parser.add_argument("--keys", type=int, default=50000, help="Backlog size (default: 50000)")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds per backend (default: 120)")
+    parser.add_argument("--encoder", default="sleep:0.001-0.01",
+                        help="noop, sleep:S, sleep:A-B or module:function (default: sleep:0.001-0.01)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of fake encodes reported as failed (default: 0)")
+    parser.add_argument("--work-dir", default="soak_run", help="Scratch directory (default: soak_run)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    unknown = [b for b in args.backends if b not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}")
+
+    print("="*70)
+    print("🧪 Job-claim Contention Soak Test")
+    print("="*70)
+    keys = backlog_keys(args.keys)
+    results = []
+    for backend_name in args.backends:
+        result = run_backend(backend_name, args, keys)
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    print("="*70)
+    failed = [r["backend"] for r in results
+              if r["duplicates"] or r["lost"] or r["stranded"] or r["crashed_workers"]]
+    if failed:
+        print(f"❌ Correctness problems in: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ No duplicate, lost or stranded claims")
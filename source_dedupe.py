@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Source Dedupe
+The same MP4 often sits under several course folders (shared intros).
+processed_videos.json is keyed by S3 key, so every copy used to be
+downloaded and encoded again. Sources are fingerprinted instead, and a
+source whose fingerprint was already encoded gets the first encode's HLS
+outputs cloned to its own destination with server-side CopyObject.
+
+Fingerprints (--dedupe):
+    etag    ETag + size from a HEAD, checked before the download. Multipart
+            ETags depend on the uploader's part size, so the same file
+            uploaded by different tools can miss - it never false-matches.
+    sha256  SHA-256 of the downloaded source. Catches those too, but only
+            saves the encode and upload.
+
+The index (fingerprint -> bucket/prefix of the first encode) is kept by
+convert_ffmpeg.py in dedupe_index.json, so it is shared by the workers on
+one host.
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+DEDUPE_MODES = ("off", "etag", "sha256")
+COPY_THREADS = 16
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+MASTER_PLAYLIST = "MASTER.m3u8"
+
+
+class DedupeMiss(Exception):
+    """The indexed outputs are gone or incomplete; encode normally"""
+
+
+def etag_fingerprint(head):
+    """Fingerprint from a head_object response (None if S3 returned no ETag)"""
+    etag = (head.get("ETag") or "").strip('"')
+    if not etag:
+        return None
+    return f"etag:{etag}:{head['ContentLength']}"
+
+
+def file_fingerprint(path):
+    """Fingerprint from the downloaded source, hashed in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def list_outputs(s3_client, bucket, prefix):
+    """Every object under an output prefix: [(relative key, size)]"""
+    outputs = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            outputs.append((obj["Key"][len(prefix):], obj.get("Size", 0)))
+    return outputs
+
+
+def clone_outputs(s3_client, source_bucket, source_prefix, dest_bucket, dest_prefix, threads=COPY_THREADS):
+    """
+    Copy an encode's outputs to a new prefix without downloading them
+    MASTER.m3u8 is copied last, so the destination never has a master
+    playlist pointing at segments that aren't there yet.
+    Returns: (objects copied, bytes copied); raises DedupeMiss if there's no MASTER.m3u8 to clone
+    """
+    outputs = list_outputs(s3_client, source_bucket, source_prefix)
+    if not any(name == MASTER_PLAYLIST for name, _ in outputs):
+        raise DedupeMiss(f"no {MASTER_PLAYLIST} under s3://{source_bucket}/{source_prefix}")
+
+    def copy(name):
+        s3_client.copy_object(Bucket=dest_bucket, Key=dest_prefix + name,
+                              CopySource={"Bucket": source_bucket, "Key": source_prefix + name})
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # list() re-raises the first failed copy
+        list(pool.map(copy, [name for name, _ in outputs if name != MASTER_PLAYLIST]))
+    copy(MASTER_PLAYLIST)
+    return len(outputs), sum(size for _, size in outputs)
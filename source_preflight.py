@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Source Pre-flight Validation
+Checks a source with a few ranged GETs before the full download. For MP4/MOV
+the top-level atom tree is walked from the first and last few MB (jumping
+over mdat with a 16-byte read of the next header), which finds missing or
+truncated moov atoms, atoms running past the end of the file (unfinished
+uploads), moov without a video track and DRM-encrypted tracks - the cases
+HANDLING_CORRUPTED_FILES.md describes ffmpeg failing on after a full download.
+Other containers (Matroska/WebM, AVI, FLV, ASF, MPEG-TS) only get their
+header sniffed.
+
+Usage:
+    python3 source_preflight.py <bucket> <key> [<key> ...]
+"""
+
+import struct
+
+# How much of each end of the file to fetch up front
+HEAD_BYTES = 4 * 1024 * 1024
+TAIL_BYTES = 4 * 1024 * 1024
+
+# Fetch a moov that didn't fit in the head/tail windows only up to this size
+MAX_MOOV_BYTES = 32 * 1024 * 1024
+
+# Stop walking after this many top-level atoms (fragmented MP4 has thousands)
+MAX_TOP_LEVEL_ATOMS = 256
+
+ISO_EXTENSIONS = ('.mp4', '.mov', '.m4v')
+
+# Atoms expected at the top level of an MP4/MOV file. Others (vendor or
+# QuickTime extensions) are skipped as long as their header and size are sane.
+TOP_LEVEL_ATOMS = {
+    b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'udta', b'uuid', b'pnot',
+    b'moof', b'mfra', b'sidx', b'styp', b'meta', b'pdin', b'emsg', b'prft', b'junk',
+}
+
+# Atoms whose payload is a list of child atoms, on the path to the sample entries
+CONTAINER_ATOMS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts'}
+
+# (offset, magic bytes, container name) for non-ISO containers
+CONTAINER_SIGNATURES = [
+    (0, b'\x1a\x45\xdf\xa3', "matroska"),
+    (0, b'FLV', "flv"),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', "asf"),
+]
+
+
+class PreflightError(Exception):
+    """Source failed validation; the message is the reason"""
+
+
+class _RangedSource:
+    """Serves reads from the fetched head/tail windows, fetching gaps on demand"""
+
+    def __init__(self, s3_client, bucket, key, size):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.windows = []
+        self.bytes_read = 0
+        self.requests = 0
+
+    def fetch(self, start, length):
+        end = min(self.size, start + length) - 1
+        if end < start:
+            return b''
+        response = self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}")
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_read += len(data)
+        self.windows.append((start, data))
+        return data
+
+    def read(self, offset, length):
+        """Read [offset, offset+length), clipped to the end of the file"""
+        length = min(length, self.size - offset)
+        if length <= 0:
+            return b''
+        for start, data in self.windows:
+            if start <= offset and offset + length <= start + len(data):
+                return data[offset - start:offset - start + length]
+        return self.fetch(offset, length)
+
+
+def _atom_header(data, pos=0):
+    """Parse one atom header -> (size, type, header_length) or None if too short"""
+    if len(data) - pos < 8:
+        return None
+    size, atom_type = struct.unpack('>I4s', data[pos:pos + 8])
+    header_length = 8
+    if size == 1:
+        if len(data) - pos < 16:
+            return None
+        size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+        header_length = 16
+    return size, atom_type, header_length
+
+
+def _iter_children(data, start, end):
+    """Yield (type, payload_start, payload_end) for the atoms in data[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        header = _atom_header(data, pos)
+        if header is None:
+            return
+        size, atom_type, header_length = header
+        if size == 0:
+            size = end - pos
+        if size < header_length or pos + size > end:
+            raise PreflightError(f"corrupt {atom_type.decode('latin-1')} atom inside moov")
+        yield atom_type, pos + header_length, pos + size
+        pos += size
+
+
+def _inspect_moov(moov, info):
+    """Check the track list inside a complete moov payload"""
+    handlers = []
+    sample_entries = []
+
+    def walk(start, end, parent):
+        for atom_type, payload_start, payload_end in _iter_children(moov, start, end):
+            if atom_type in CONTAINER_ATOMS:
+                walk(payload_start, payload_end, atom_type)
+            elif atom_type == b'hdlr' and parent == b'mdia' and payload_end - payload_start >= 12:
+                # QuickTime also has a data-reference hdlr under minf; the track type is in mdia's
+                handlers.append(moov[payload_start + 8:payload_start + 12])
+            elif atom_type == b'stsd' and payload_end - payload_start >= 16:
+                # version/flags, entry count, then the first sample entry
+                sample_entries.append((handlers[-1] if handlers else None,
+                                       moov[payload_start + 12:payload_start + 16]))
+
+    walk(0, len(moov), b'moov')
+    if not any(handler == b'vide' for handler, _ in sample_entries):
+        raise PreflightError("moov has no video track")
+    for handler, entry in sample_entries:
+        if entry in (b'encv', b'enca', b'drmi', b'drms'):
+            raise PreflightError(f"encrypted (DRM) track ({entry.decode('latin-1')})")
+        if handler == b'vide':
+            info.setdefault("video_codec", entry.decode('latin-1').strip())
+        elif handler == b'soun':
+            info.setdefault("audio_codec", entry.decode('latin-1').strip())
+
+
+def _walk_iso(source, info):
+    """Walk the top-level atoms of an MP4/MOV file"""
+    pos = 0
+    seen = []
+    moov = None
+    while pos < source.size and len(seen) < MAX_TOP_LEVEL_ATOMS:
+        header = _atom_header(source.read(pos, 16))
+        if header is None:
+            raise PreflightError(f"truncated atom header at byte {pos}")
+        size, atom_type, header_length = header
+        name = atom_type.decode('latin-1')
+        if atom_type not in TOP_LEVEL_ATOMS:
+            if not seen:
+                raise PreflightError("not an MP4/MOV file (no ftyp/moov/mdat at start)")
+            # A real atom type is four printable characters; anything else is a broken header
+            if not all(0x20 <= c <= 0x7e for c in atom_type):
+                raise PreflightError(f"corrupt atom header {atom_type!r} at byte {pos}")
+        if size == 0:
+            size = source.size - pos
+        if size < header_length:
+            raise PreflightError(f"invalid {name} atom size {size} at byte {pos}")
+        if pos + size > source.size:
+            if atom_type == b'moov':
+                raise PreflightError("truncated moov atom (incomplete upload)")
+            if moov is None:
+                raise PreflightError(f"{name} atom runs past end of file and moov atom not found "
+                                     f"(incomplete upload)")
+            raise PreflightError(f"{name} atom runs past end of file (incomplete upload)")
+
+        seen.append(name)
+        if atom_type == b'moov' and moov is None:
+            info["moov_position"] = "end" if "mdat" in seen else "start"
+            if size <= MAX_MOOV_BYTES:
+                moov = source.read(pos + header_length, size - header_length)
+                _inspect_moov(moov, info)
+            else:
+                moov = b''
+        if atom_type == b'moof':
+            info["fragmented"] = True
+            if moov is not None:
+                # Fragments follow the init segment; nothing more to learn
+                break
+        pos += size
+
+    info["atoms"] = seen
+    if moov is None and pos >= source.size:
+        raise PreflightError("moov atom not found")
+
+
+def sniff_container(head):
+    """Name the container from its first bytes, or None if unrecognised"""
+    header = _atom_header(head)
+    if header and header[1] in TOP_LEVEL_ATOMS:
+        return "iso"
+    for offset, magic, name in CONTAINER_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return name
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return "avi"
+    if len(head) > 376 and head[0] == head[188] == head[376] == 0x47:
+        return "mpegts"
+    return None
+
+
+def preflight_source(s3_client, bucket, key, size=None):
+    """
+    Validate a source object with ranged reads
+    Returns: info dict (container, size, bytes_read, moov_position, video_codec, ...)
+    Raises: PreflightError with the reason when the source is broken
+    """
+    if size is None:
+        size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+    source = _RangedSource(s3_client, bucket, key, size)
+    info = {"size": size}
+
+    head = source.fetch(0, HEAD_BYTES)
+    if size > HEAD_BYTES:
+        source.fetch(max(HEAD_BYTES, size - TAIL_BYTES), TAIL_BYTES)
+
+    container = sniff_container(head)
+    if container is None:
+        if key.lower().endswith(ISO_EXTENSIONS):
+            raise PreflightError("not an MP4/MOV file (unrecognised header)")
+        container = "unknown"
+    info["container"] = container
+    if container == "iso":
+        _walk_iso(source, info)
+
+    info["bytes_read"] = source.bytes_read
+    info["requests"] = source.requests
+    return info
+
+
+if __name__ == "__main__":
+    import sys
+    import boto3
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    s3 = boto3.client('s3')
+    bucket = sys.argv[1]
+    failures = 0
+    for key in sys.argv[2:]:
+        try:
+            info = preflight_source(s3, bucket, key)
+            print(f"✅ {key}: {info['container']}, moov at {info.get('moov_position', '-')}, "
+                  f"video {info.get('video_codec', '-')} ({info['bytes_read'] / (1024*1024):.1f} MB read)")
+        except PreflightError as e:
+            failures += 1
+            print(f"❌ {key}: {e}")
+    sys.exit(1 if failures else 0)
@@ -1,6 +1,8 @@
 #!/bin/bash
 # Quick start script to launch 4 parallel workers in tmux
 # Run this on your EC2 instance
+# The workers run under one supervisor (convert_ffmpeg.py --workers N), which
+# lists the bucket once, pins each worker to its own CPUs and restarts crashes.
 
 SESSION_NAME="video_conversion"
 
@@ -20,33 +22,20 @@ INPUT_FOLDER="MS Stream/AZ100T00"
 INPUT_BUCKET="cdn.netcomplus.com"
 OUTPUT_BUCKET="cdn.netcomplus.com"
 OUTPUT_PREFIX="streams/MS Stream/AZ100T00"
+WORKERS=${WORKERS:-4}
 
 # Build the command
-CMD="python3 convert_ffmpeg.py \"$INPUT_FOLDER\" $INPUT_BUCKET $OUTPUT_BUCKET \"$OUTPUT_PREFIX\""
+CMD="python3 convert_ffmpeg.py \"$INPUT_FOLDER\" $INPUT_BUCKET $OUTPUT_BUCKET \"$OUTPUT_PREFIX\" --workers $WORKERS 2>&1 | tee -a conversion_log.txt"
 
-echo "🚀 Starting 4 parallel workers in tmux..."
+echo "🚀 Starting $WORKERS parallel workers in tmux..."
 echo "Session name: $SESSION_NAME"
 echo "Command: $CMD"
 echo ""
 
-# Create new session and run command in first pane
+# One pane running the supervisor; worker output is prefixed [w1]..[wN]
 tmux new-session -d -s $SESSION_NAME "$CMD"
 
-# Split horizontally (top/bottom)
-tmux split-window -v -t $SESSION_NAME "$CMD"
-
-# Select top pane and split vertically (left/right)
-tmux select-pane -t $SESSION_NAME:0.0
-tmux split-window -h -t $SESSION_NAME "$CMD"
-
-# Select bottom pane and split vertically (left/right)
-tmux select-pane -t $SESSION_NAME:0.2
-tmux split-window -h -t $SESSION_NAME "$CMD"
-
-# Adjust pane sizes to be equal
-tmux select-layout -t $SESSION_NAME tiled
-
-echo "✅ 4 workers started successfully!"
+echo "✅ $WORKERS workers started successfully!"
 echo ""
 echo "To attach to the session:"
 echo "  tmux attach -t $SESSION_NAME"
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Locked JSON State Files
+flock-guarded read, write and read-modify-write helpers for the JSON state
+files convert_ffmpeg.py keeps next to the workers, plus the retry and review
+files that admin scripts (requeue_quarantined.py) edit. Imports nothing from
+boto3 or the converter, so those scripts run without AWS configuration.
+"""
+
+import os
+import json
+
+try:
+    import fcntl
+    LOCK_AVAILABLE = True
+except ImportError:
+    # Windows: no locking (convert_ffmpeg.py warns about it)
+    LOCK_AVAILABLE = False
+
+# Retry state for failed videos (attempts, next retry time, last diagnostic)
+FAILED_VIDEOS_FILE = "failed_videos.json"
+
+# Videos that failed permanently (or too often) - skipped until requeue_quarantined.py
+QUARANTINE_FILE = "quarantined_videos.json"
+
+# Near-duplicates found by --near-dupes, with the operator's release time
+NEAR_DUPES_FILE = "near_duplicates.json"
+
+
+def load_json_file_with_lock(file_path, lock_type=fcntl.LOCK_SH if LOCK_AVAILABLE else None):
+    """
+    Load JSON file with file locking for thread-safe reads
+    """
+    if not os.path.exists(file_path):
+        return []
+    
+    try:
+        with open(file_path, 'r') as f:
+            if LOCK_AVAILABLE and lock_type:
+                fcntl.flock(f.fileno(), lock_type)
+            try:
+                data = json.load(f)
+            finally:
+                if LOCK_AVAILABLE and lock_type:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return data
+    except json.JSONDecodeError:
+        return []
+    except Exception as e:
+        print(f"⚠️  Warning: Could not read {file_path}: {e}")
+        return []
+
+
+def save_json_file_with_lock(file_path, data):
+    """
+    Save JSON file with exclusive file locking for thread-safe writes
+    """
+    try:
+        # Truncate only once the lock is held, and flush before releasing it,
+        # so a reader never sees an empty or half-written file
+        with open(file_path, 'a+') as f:
+            if LOCK_AVAILABLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                f.truncate()
+                json.dump(data, f, indent=4)
+                f.flush()
+            finally:
+                if LOCK_AVAILABLE:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return True
+    except Exception as e:
+        print(f"❌ Error saving {file_path}: {e}")
+        return False
+
+
+def update_json_file_with_lock(file_path, update, default=None):
+    """
+    Read-modify-write a JSON file under one exclusive lock
+    update(data) returns the new data; parallel workers never drop each other's changes
+    """
+    with open(file_path, 'a+') as f:
+        if LOCK_AVAILABLE:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            data = json.loads(content) if content.strip() else ([] if default is None else default)
+            data = update(data)
+            f.seek(0)
+            f.truncate()
+            json.dump(data, f, indent=4)
+            f.flush()
+            return data
+        finally:
+            if LOCK_AVAILABLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def load_quarantined_videos():
+    """Load quarantined videos: {video_key: {reason, diagnostic, ...}}"""
+    data = load_json_file_with_lock(QUARANTINE_FILE, fcntl.LOCK_SH if LOCK_AVAILABLE else None)
+    return data if isinstance(data, dict) else {}
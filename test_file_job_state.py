@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the flock-based job state (FileJobState in convert_ffmpeg.py)
+Runs in a temp directory, so the real processed/in-progress files are untouched:
+
+    python3 test_file_job_state.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from convert_ffmpeg import FileJobState, load_processed_videos, load_in_progress_videos
+
+KEYS = [f"Course/video_{i}.mp4" for i in range(40)]
+
+
+class TempWorkDir:
+    """The state files are relative paths: run each test in its own directory"""
+
+    def __enter__(self):
+        self.previous = os.getcwd()
+        self.path = tempfile.mkdtemp(prefix="test_file_state_")
+        os.chdir(self.path)
+        return self.path
+
+    def __exit__(self, *exc):
+        os.chdir(self.previous)
+        shutil.rmtree(self.path)
+        return False
+
+
+def test_claims_are_distinct_and_completions_stick():
+    with TempWorkDir():
+        state = FileJobState()
+        first, _ = state.acquire_next_video(KEYS[:3])
+        second, _ = state.acquire_next_video(KEYS[:3])
+        assert (first, second) == (KEYS[0], KEYS[1])
+        assert load_in_progress_videos() == {first, second}
+
+        assert state.mark_video_complete(first)
+        assert state.is_video_complete(first)
+        assert load_in_progress_videos() == {second}
+        assert state.status_counts(KEYS[:3]) == (1, 1, 1)
+
+
+def test_failed_video_is_released():
+    with TempWorkDir():
+        state = FileJobState()
+        key, _ = state.acquire_next_video(KEYS[:2])
+        assert state.mark_video_failed(key)
+        assert load_in_progress_videos() == set()
+        assert state.acquire_next_video(KEYS[:2]) == (key, True)
+
+
+def test_drained_backlog():
+    with TempWorkDir():
+        state = FileJobState()
+        for _ in KEYS[:2]:
+            key, _ = state.acquire_next_video(KEYS[:2])
+            state.mark_video_complete(key)
+        assert state.acquire_next_video(KEYS[:2]) == (None, False)
+
+
+def test_reopen_and_reset():
+    with TempWorkDir():
+        state = FileJobState()
+        for _ in KEYS[:4]:
+            key, _ = state.acquire_next_video(KEYS[:4])
+            state.mark_video_complete(key)
+        state.reopen(KEYS[:1])
+        assert load_processed_videos() == set(KEYS[1:4])
+        assert state.acquire_next_video(KEYS[:4]) == (KEYS[0], True)
+        state.reset()
+        assert state.status_counts(KEYS[:4]) == (0, 0, 4)
+
+
+def _drain(worker_index, results):
+    state = FileJobState()
+    claimed, failed = [], []
+    while True:
+        key, more = state.acquire_next_video(KEYS)
+        if not more:
+            break
+        claimed.append(key)
+        # Each worker fails every fifth video once, to mix releases into the claims
+        if KEYS.index(key) % 5 == 0 and key not in failed:
+            failed.append(key)
+            state.mark_video_failed(key)
+        else:
+            state.mark_video_complete(key)
+    results[worker_index] = (claimed, failed)
+
+
+def test_parallel_workers_never_share_or_lose_a_video():
+    with TempWorkDir():
+        with multiprocessing.Manager() as manager:
+            results = manager.dict()
+            workers = [multiprocessing.Process(target=_drain, args=(i, results)) for i in range(6)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(60)
+            results = dict(results)
+
+        assert len(results) == 6, "a worker crashed"
+        claims = [key for claimed, _ in results.values() for key in claimed]
+        failures = sum(len(failed) for _, failed in results.values())
+        assert load_processed_videos() == set(KEYS)
+        assert load_in_progress_videos() == set()
+        # Every claim ended in exactly one completion or one release
+        assert len(claims) == len(KEYS) + failures, f"{len(claims)} claims, {failures} failures"
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the measured master playlist attributes (hls_master.py)
+Uses fixed playlists and segment files in a temp directory, no ffmpeg or AWS:
+
+    python3 test_hls_master.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hls_master import (avc_codec_string, parse_media_playlist, measure_bandwidth, rendition_variant,
+                        build_master_playlist, FALLBACK_VIDEO_CODEC, AAC_LC_CODEC)
+
+PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:0
+#EXTINF:6.000000,
+seg_0000.ts
+#EXTINF:4.000000,
+seg_0001.ts
+#EXTINF:2.000000,
+seg_0002.ts
+#EXT-X-ENDLIST
+"""
+
+# Bytes per segment: peak is seg_0001 at 100000 * 8 / 4 = 200000 bit/s
+SEGMENT_SIZES = {"seg_0000.ts": 90000, "seg_0001.ts": 100000, "seg_0002.ts": 10000}
+
+RENDITION = {"height": 360, "width": 640, "bitrate": 400000, "name_modifier": "360p"}
+
+
+def write_rendition(output_dir, name="MASTER_360p.m3u8"):
+    with open(os.path.join(output_dir, name), "w") as f:
+        f.write(PLAYLIST)
+    for segment, size in SEGMENT_SIZES.items():
+        with open(os.path.join(output_dir, segment), "wb") as f:
+            f.write(b"\0" * size)
+
+
+def test_avc_codec_string():
+    assert avc_codec_string("Main", 30) == "avc1.4d401e"
+    assert avc_codec_string("High", 41) == "avc1.640029"
+    assert avc_codec_string("Constrained Baseline", 31) == "avc1.42c01f"
+    assert avc_codec_string("Main 10", 30) is None
+    assert avc_codec_string("Main", None) is None
+    assert avc_codec_string("Main", -99) is None
+
+
+def test_parse_media_playlist():
+    playlist = parse_media_playlist(PLAYLIST)
+    assert playlist["target_duration"] == 6
+    assert playlist["endlist"]
+    assert playlist["segments"] == [("seg_0000.ts", 6.0), ("seg_0001.ts", 4.0), ("seg_0002.ts", 2.0)]
+    assert not parse_media_playlist("#EXTM3U\n#EXTINF:6,\na.ts\n")["endlist"]
+
+
+def test_measure_bandwidth():
+    output_dir = tempfile.mkdtemp(prefix="test_hls_master_")
+    try:
+        write_rendition(output_dir)
+        measured = measure_bandwidth(output_dir, "MASTER_360p.m3u8")
+        assert measured["bandwidth"] == 200000
+        # 200000 bytes * 8 / 12 s
+        assert measured["average_bandwidth"] == 133333
+        assert measured["first_segment"] == os.path.join(output_dir, "seg_0000.ts")
+    finally:
+        shutil.rmtree(output_dir)
+
+
+def test_rendition_variant_falls_back_to_nominal_values():
+    output_dir = tempfile.mkdtemp(prefix="test_hls_master_")
+    try:
+        variant = rendition_variant(output_dir, RENDITION, 96000)
+        assert variant == {
+            "uri": "MASTER_360p.m3u8",
+            "bandwidth": 496000,
+            "average_bandwidth": None,
+            "codecs": f"{FALLBACK_VIDEO_CODEC},{AAC_LC_CODEC}",
+            "resolution": "640x360",
+        }
+    finally:
+        shutil.rmtree(output_dir)
+
+
+def test_build_master_playlist():
+    variants = [
+        {"uri": "MASTER_240p.m3u8", "bandwidth": 310000, "average_bandwidth": 250000,
+         "codecs": "avc1.4d4015,mp4a.40.2", "resolution": "426x240"},
+        {"uri": "MASTER_360p.m3u8", "bandwidth": 496000, "average_bandwidth": None,
+         "codecs": "avc1.4d401e,mp4a.40.2", "resolution": "640x360"},
+    ]
+    iframes = [{"uri": "IFRAMES_240p.m3u8", "bandwidth": 80000, "average_bandwidth": 20000,
+                "codecs": "avc1.4d4015", "resolution": "426x240"}]
+    assert build_master_playlist(variants, 29.97, iframes).splitlines() == [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        '#EXT-X-STREAM-INF:BANDWIDTH=310000,AVERAGE-BANDWIDTH=250000,CODECS="avc1.4d4015,mp4a.40.2",'
+        'RESOLUTION=426x240,FRAME-RATE=29.970',
+        "MASTER_240p.m3u8",
+        '#EXT-X-STREAM-INF:BANDWIDTH=496000,CODECS="avc1.4d401e,mp4a.40.2",RESOLUTION=640x360,FRAME-RATE=29.970',
+        "MASTER_360p.m3u8",
+        '#EXT-X-I-FRAME-STREAM-INF:BANDWIDTH=80000,AVERAGE-BANDWIDTH=20000,CODECS="avc1.4d4015",'
+        'RESOLUTION=426x240,URI="IFRAMES_240p.m3u8"',
+    ]
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
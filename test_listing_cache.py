@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the listing snapshot and its --new-only delta (listing_cache.py)
+Works on a temp snapshot directory, no AWS:
+
+    python3 test_listing_cache.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from listing_cache import ListingSnapshot
+
+
+def listing(**etags):
+    return [{"Key": f"{name}.mp4", "Size": 1000, "ETag": etag, "LastModified": "2026-01-01T00:00:00"}
+            for name, etag in etags.items()]
+
+
+class TempDir:
+    def __enter__(self):
+        self.path = tempfile.mkdtemp(prefix="test_listing_cache_")
+        return self.path
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.path)
+        return False
+
+
+def test_first_listing_is_a_baseline():
+    with TempDir() as d:
+        snapshot = ListingSnapshot("input", "Videos/", d)
+        delta = snapshot.refresh(listing(a="1", b="1"))
+        assert not delta and snapshot.pending == {}
+        assert [obj["Key"] for obj in snapshot.objects()] == ["a.mp4", "b.mp4"]
+
+
+def test_delta_against_previous_listing():
+    with TempDir() as d:
+        ListingSnapshot("input", "Videos/", d).refresh(listing(a="1", b="1", c="1"))
+        snapshot = ListingSnapshot("input", "Videos/", d)
+        delta = snapshot.refresh(listing(a="1", b="2", d="1"))
+        assert (delta.added, delta.changed, delta.deleted) == (["d.mp4"], ["b.mp4"], ["c.mp4"])
+        assert snapshot.pending == {"b.mp4": "changed", "d.mp4": "added"}
+
+
+def test_pending_survives_until_settled():
+    with TempDir() as d:
+        snapshot = ListingSnapshot("input", "Videos/", d)
+        snapshot.refresh(listing(a="1"))
+        snapshot.refresh(listing(a="2", b="1"))
+        assert snapshot.pending_changed() == ["a.mp4"]
+        snapshot.mark_reopened(["a.mp4"])
+
+        # The run crashed before completing b: a later refresh keeps it pending
+        snapshot = ListingSnapshot("input", "Videos/", d)
+        assert not snapshot.refresh(listing(a="2", b="1"))
+        assert snapshot.pending == {"a.mp4": "added", "b.mp4": "added"}
+        assert snapshot.settle(lambda key: key == "a.mp4") == 1
+        assert ListingSnapshot("input", "Videos/", d).pending == {"b.mp4": "added"}
+
+
+def test_changed_key_stays_pending_until_reopened():
+    with TempDir() as d:
+        snapshot = ListingSnapshot("input", "Videos/", d)
+        snapshot.refresh(listing(a="1"))
+        snapshot.refresh(listing(a="2"))
+        # Still marked complete from its old version, so it must not settle yet
+        assert snapshot.settle(lambda key: True) == 1
+
+
+def test_deleted_key_is_no_longer_pending():
+    with TempDir() as d:
+        snapshot = ListingSnapshot("input", "Videos/", d)
+        snapshot.refresh(listing(a="1"))
+        snapshot.refresh(listing(a="1", b="1"))
+        snapshot.refresh(listing(a="1"))
+        assert snapshot.pending == {}
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for the S3 lease job-state backend (s3_leases.py)
+Runs against local_s3.LocalS3Client, so no AWS access is needed:
+
+    python3 test_s3_leases.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_s3 import LocalS3Client
+from s3_leases import S3LeaseJobState
+
+BUCKET = "coordination"
+PREFIX = "_coordination/test/"
+KEYS = [f"Course/video_{i}.mp4" for i in range(5)]
+
+
+def make_state(client, worker_id, lease_seconds=900):
+    return S3LeaseJobState(client, BUCKET, PREFIX, worker_id=worker_id,
+                           lease_seconds=lease_seconds, heartbeat=False)
+
+
+def test_workers_claim_different_videos():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_leases_"))
+    try:
+        a, b = make_state(client, "a"), make_state(client, "b")
+        key_a, _ = a.acquire_next_video(KEYS)
+        key_b, _ = b.acquire_next_video(KEYS)
+        assert key_a == KEYS[0]
+        assert key_b == KEYS[1]
+        assert a.holds_lease(key_a) and not a.holds_lease(key_b)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_complete_and_failed():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_leases_"))
+    try:
+        a, b = make_state(client, "a"), make_state(client, "b")
+        done_key, _ = a.acquire_next_video(KEYS)
+        assert a.mark_video_complete(done_key)
+        failed_key, _ = a.acquire_next_video(KEYS)
+        assert a.mark_video_failed(failed_key)
+
+        # A failed video is released for the next claim; a completed one never comes back
+        assert b.acquire_next_video(KEYS) == (failed_key, True)
+        assert b.is_video_complete(done_key)
+        assert b.status_counts(KEYS) == (1, 1, 3)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_expired_lease_is_taken_over():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_leases_"))
+    try:
+        crashed = make_state(client, "crashed")
+        key, _ = crashed.acquire_next_video(KEYS[:1])
+        live = make_state(client, "live")
+        assert live.acquire_next_video(KEYS[:1]) == (None, False)
+
+        time.sleep(0.05)
+        thief = make_state(client, "thief", lease_seconds=0)
+        assert thief.acquire_next_video(KEYS[:1]) == (key, True)
+        # The crashed worker's lease ETag no longer matches
+        assert not crashed.renew(key)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_claim_skips_video_finished_elsewhere():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_leases_"))
+    try:
+        a, b = make_state(client, "a"), make_state(client, "b")
+        b.refresh()  # b's cached done set predates a's completion
+        key, _ = a.acquire_next_video(KEYS[:2])
+        a.mark_video_complete(key)
+        assert b.acquire_next_video(KEYS[:2]) == (KEYS[1], True)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_progress_counts_do_not_list_done_markers():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_leases_"))
+    try:
+        a = make_state(client, "a")
+        key, _ = a.acquire_next_video(KEYS)
+        a.mark_video_complete(key)
+        a.acquire_next_video(KEYS)
+
+        lists_before = client.request_counts.get("ListObjectsV2", 0)
+        assert a.status_counts(KEYS, fresh=False) == (1, 0, 4)
+        assert client.request_counts.get("ListObjectsV2", 0) == lists_before
+        # The cached leases predate the second claim; a fresh count lists both prefixes
+        assert a.status_counts(KEYS) == (1, 1, 3)
+        assert client.request_counts["ListObjectsV2"] == lists_before + 2
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_reopen_and_reset():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_leases_"))
+    try:
+        a = make_state(client, "a")
+        for _ in KEYS:
+            key, _ = a.acquire_next_video(KEYS)
+            a.mark_video_complete(key)
+        a.reopen(KEYS[:2])
+        assert a.status_counts(KEYS) == (3, 0, 2)
+        a.reset()
+        assert a.status_counts(KEYS) == (0, 0, 5)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tests for the hash-sharded job-state backend (shard_assignment.py)
+Runs against local_s3.LocalS3Client, so no AWS access is needed:
+
+    python3 test_shard_assignment.py
+"""
+
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_s3 import LocalS3Client
+from shard_assignment import ShardedJobState, parse_shard, shard_for_key
+
+BUCKET = "coordination"
+PREFIX = "_coordination/test/"
+KEYS = [f"Course/video_{i}.mp4" for i in range(20)]
+
+
+def make_state(client, index, count=2, stale_seconds=900, worker_id=None):
+    return ShardedJobState(client, BUCKET, PREFIX, index, count, worker_id=worker_id or f"w{index}",
+                           stale_seconds=stale_seconds, heartbeat=False)
+
+
+def lists(client):
+    return client.request_counts.get("ListObjectsV2", 0)
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    for bad in ("4/4", "-1/2", "x/2", "1"):
+        try:
+            parse_shard(bad)
+        except argparse.ArgumentTypeError:
+            continue
+        raise AssertionError(f"{bad!r} was accepted")
+
+
+def test_shard_for_key_is_stable_and_complete():
+    shards = [shard_for_key(k, 4) for k in KEYS]
+    assert shards == [shard_for_key(k, 4) for k in KEYS]
+    assert all(0 <= s < 4 for s in shards)
+
+
+def test_owner_drains_own_shard_then_steals_from_tail():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        worker = make_state(client, 0)
+        own = worker.owned_keys(KEYS)
+        claimed = []
+        for _ in own:
+            key, _ = worker.acquire_next_video(KEYS)
+            worker.mark_video_complete(key)
+            claimed.append(key)
+        assert claimed == own
+
+        other = [k for k in KEYS if shard_for_key(k, 2) == 1]
+        key, more = worker.acquire_next_video(KEYS)
+        assert more and key == other[-1]
+        assert worker.stolen_count == 1
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_own_shard_work_lists_markers_once():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        worker = make_state(client, 0)
+        for _ in worker.owned_keys(KEYS):
+            key, _ = worker.acquire_next_video(KEYS)
+            worker.mark_video_complete(key)
+            worker.status_counts(KEYS, fresh=False)
+        # One listing of claims/ and one of done/ at startup, none per job
+        assert lists(client) == 2
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_steals_reuse_one_listing():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        worker = make_state(client, 0)
+        for _ in worker.owned_keys(KEYS):
+            key, _ = worker.acquire_next_video(KEYS)
+            worker.mark_video_complete(key)
+        before = lists(client)
+        for _ in range(3):
+            key, _ = worker.acquire_next_video(KEYS)
+            worker.mark_video_complete(key)
+        # Re-listed once when stealing started, then reused
+        assert lists(client) == before + 2
+        assert worker.stolen_count == 3
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_drained_fleet_relists_before_giving_up():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        a, b = make_state(client, 0), make_state(client, 1)
+        for worker in (a, b):
+            while True:
+                key, more = worker.acquire_next_video(KEYS)
+                if not more:
+                    break
+                worker.mark_video_complete(key)
+        assert a.status_counts(KEYS) == (20, 0, 0)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_failed_claim_is_released_for_others():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        owner, thief = make_state(client, 0), make_state(client, 1)
+        key, _ = owner.acquire_next_video(KEYS)
+        assert owner.mark_video_failed(key)
+        # The owner doesn't spin on its own failure; another worker may retry it
+        assert owner.acquire_next_video(KEYS)[0] != key
+        thief.refresh()
+        assert thief._try_claim(key, stolen=True)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_stale_claim_is_taken_over_and_live_one_is_not():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        crashed = make_state(client, 0, worker_id="crashed")
+        key, _ = crashed.acquire_next_video(KEYS)
+
+        live = make_state(client, 0, worker_id="live")
+        live.refresh()
+        assert not live._try_claim(key)
+
+        time.sleep(0.05)
+        restarted = make_state(client, 0, stale_seconds=0, worker_id="restarted")
+        assert restarted.acquire_next_video(KEYS) == (key, True)
+        assert not crashed.renew(key)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_stale_claim_of_finished_video_is_not_reclaimed():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        first = make_state(client, 0, worker_id="first")
+        key, _ = first.acquire_next_video(KEYS)
+        later = make_state(client, 0, stale_seconds=0, worker_id="later")
+        later.refresh()  # listed before the done marker was written
+        first.mark_video_complete(key)
+        time.sleep(0.05)
+        assert not later._try_claim(key)
+        assert later.is_video_complete(key)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+def test_reopen_and_reset():
+    client = LocalS3Client(tempfile.mkdtemp(prefix="test_shards_"))
+    try:
+        worker = make_state(client, 0, count=1)
+        for _ in KEYS:
+            key, _ = worker.acquire_next_video(KEYS)
+            worker.mark_video_complete(key)
+        worker.reopen(KEYS[:3])
+        assert worker.status_counts(KEYS) == (17, 0, 3)
+        assert worker.acquire_next_video(KEYS) == (KEYS[0], True)
+        worker.reset()
+        assert worker.status_counts(KEYS) == (0, 0, 20)
+    finally:
+        shutil.rmtree(client.root_dir)
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
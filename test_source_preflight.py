@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Tests for the source pre-flight parser (source_preflight.py)
+Builds synthetic MP4/MOV atom trees and runs them through preflight_source
+against local_s3.LocalS3Client, so no AWS access is needed:
+
+    python3 test_source_preflight.py
+"""
+
+import sys
+import os
+import struct
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_s3 import LocalS3Client
+from source_preflight import preflight_source, sniff_container, PreflightError, HEAD_BYTES, TAIL_BYTES
+
+BUCKET = "input"
+
+
+def atom(atom_type, payload=b''):
+    return struct.pack('>I', 8 + len(payload)) + atom_type + payload
+
+
+def large_atom(atom_type, payload=b''):
+    """Atom with a 64-bit size (size field 1, real size after the type)"""
+    return struct.pack('>I', 1) + atom_type + struct.pack('>Q', 16 + len(payload)) + payload
+
+
+def hdlr(handler_type):
+    # version/flags, component type, handler type, reserved
+    return atom(b'hdlr', b'\0' * 4 + b'mhlr' + handler_type + b'\0' * 12)
+
+
+def trak(handler_type, entry, quicktime=False):
+    stsd = atom(b'stsd', b'\0' * 4 + struct.pack('>I', 1) + struct.pack('>I', 16) + entry + b'\0' * 8)
+    minf = atom(b'minf', (atom(b'hdlr', b'\0' * 4 + b'dhlr' + b'alis' + b'\0' * 12) if quicktime else b'')
+                + atom(b'stbl', stsd))
+    return atom(b'trak', atom(b'mdia', hdlr(handler_type) + minf))
+
+
+FTYP = atom(b'ftyp', b'isom\0\0\0\0')
+MOOV = atom(b'moov', trak(b'vide', b'avc1') + trak(b'soun', b'mp4a'))
+MDAT = atom(b'mdat', b'\0' * 4096)
+
+
+class PreflightCase:
+    """One LocalS3Client per test, removed afterwards"""
+
+    def __init__(self):
+        self.client = LocalS3Client(tempfile.mkdtemp(prefix="test_preflight_"))
+
+    def check(self, body, key="source.mp4", size=None):
+        self.client.put_object(Bucket=BUCKET, Key=key, Body=body)
+        return preflight_source(self.client, BUCKET, key, size=size)
+
+    def rejects(self, body, reason, key="source.mp4"):
+        try:
+            self.check(body, key)
+        except PreflightError as e:
+            assert reason in str(e), f"expected {reason!r}, got {str(e)!r}"
+            return
+        raise AssertionError(f"accepted a source that should fail with {reason!r}")
+
+    def close(self):
+        shutil.rmtree(self.client.root_dir)
+
+
+def run_case(test):
+    case = PreflightCase()
+    try:
+        test(case)
+    finally:
+        case.close()
+
+
+def test_faststart_source():
+    def test(case):
+        info = case.check(FTYP + MOOV + MDAT)
+        assert info["container"] == "iso"
+        assert info["moov_position"] == "start"
+        assert info["video_codec"] == "avc1" and info["audio_codec"] == "mp4a"
+        assert info["atoms"] == ["ftyp", "moov", "mdat"]
+    run_case(test)
+
+
+def test_moov_at_end_of_large_file():
+    def test(case):
+        mdat = atom(b'mdat', b'\0' * (HEAD_BYTES + TAIL_BYTES))
+        info = case.check(FTYP + mdat + MOOV)
+        assert info["moov_position"] == "end"
+        # Head and tail windows, plus the header read that jumps over mdat
+        assert info["requests"] <= 3 and info["bytes_read"] < len(mdat)
+    run_case(test)
+
+
+def test_known_size_skips_head():
+    def test(case):
+        body = FTYP + MOOV + MDAT
+        case.client.put_object(Bucket=BUCKET, Key="source.mp4", Body=body)
+        case.client.request_counts.clear()
+        preflight_source(case.client, BUCKET, "source.mp4", size=len(body))
+        assert "HeadObject" not in case.client.request_counts
+    run_case(test)
+
+
+def test_64bit_atom_size():
+    def test(case):
+        info = case.check(FTYP + MOOV + large_atom(b'mdat', b'\0' * 4096))
+        assert info["atoms"] == ["ftyp", "moov", "mdat"]
+    run_case(test)
+
+
+def test_size_zero_runs_to_end_of_file():
+    def test(case):
+        mdat = struct.pack('>I', 0) + b'mdat' + b'\0' * 4096
+        info = case.check(FTYP + MOOV + mdat)
+        assert info["atoms"] == ["ftyp", "moov", "mdat"]
+    run_case(test)
+
+
+def test_truncated_moov():
+    def test(case):
+        case.rejects(FTYP + MDAT + MOOV[:-10], "truncated moov atom")
+    run_case(test)
+
+
+def test_mdat_past_end_of_file():
+    def test(case):
+        case.rejects(FTYP + MDAT[:-100], "moov atom not found (incomplete upload)")
+        case.rejects(FTYP + MOOV + MDAT[:-100], "mdat atom runs past end of file")
+    run_case(test)
+
+
+def test_missing_moov():
+    def test(case):
+        case.rejects(FTYP + MDAT, "moov atom not found")
+    run_case(test)
+
+
+def test_invalid_atom_size():
+    def test(case):
+        case.rejects(FTYP + struct.pack('>I', 4) + b'free' + MOOV + MDAT, "invalid free atom size 4")
+    run_case(test)
+
+
+def test_encrypted_track():
+    def test(case):
+        moov = atom(b'moov', trak(b'vide', b'encv'))
+        case.rejects(FTYP + moov + MDAT, "encrypted (DRM) track (encv)")
+    run_case(test)
+
+
+def test_no_video_track():
+    def test(case):
+        moov = atom(b'moov', trak(b'soun', b'mp4a'))
+        case.rejects(FTYP + moov + MDAT, "moov has no video track")
+    run_case(test)
+
+
+def test_corrupt_atom_inside_moov():
+    def test(case):
+        bad_trak = struct.pack('>I', 4096) + b'trak' + b'\0' * 16
+        case.rejects(FTYP + atom(b'moov', bad_trak) + MDAT, "corrupt trak atom inside moov")
+    run_case(test)
+
+
+def test_quicktime_data_handler_under_minf():
+    def test(case):
+        moov = atom(b'moov', trak(b'vide', b'avc1', quicktime=True) + trak(b'soun', b'sowt', quicktime=True))
+        info = case.check(atom(b'ftyp', b'qt  \0\0\0\0') + moov + MDAT, key="source.mov")
+        assert info["video_codec"] == "avc1" and info["audio_codec"] == "sowt"
+    run_case(test)
+
+
+def test_unknown_top_level_atoms():
+    def test(case):
+        info = case.check(FTYP + atom(b'Xtra', b'vendor data') + MOOV + MDAT)
+        assert info["atoms"] == ["ftyp", "Xtra", "moov", "mdat"]
+        case.rejects(FTYP + atom(b'\x00\x01\x02\x03', b'junk') + MOOV + MDAT, "corrupt atom header")
+        case.rejects(atom(b'Xtra', b'vendor data') + FTYP + MOOV + MDAT, "not an MP4/MOV file")
+    run_case(test)
+
+
+def test_fragmented_source():
+    def test(case):
+        moof = atom(b'moof', atom(b'mfhd', b'\0' * 8))
+        info = case.check(FTYP + MOOV + moof + MDAT + moof + MDAT)
+        assert info.get("fragmented") and info["atoms"] == ["ftyp", "moov", "moof"]
+    run_case(test)
+
+
+def test_other_containers():
+    def test(case):
+        assert case.check(b'\x1a\x45\xdf\xa3' + b'\0' * 2048, key="source.mkv")["container"] == "matroska"
+        assert case.check(b'RIFF\0\0\0\0AVI ' + b'\0' * 2048, key="source.avi")["container"] == "avi"
+        assert case.check(b'\x47' + b'\0' * 187 + b'\x47' + b'\0' * 187 + b'\x47' + b'\0' * 187,
+                          key="source.ts")["container"] == "mpegts"
+        assert case.check(b'garbage' * 300, key="source.bin")["container"] == "unknown"
+        case.rejects(b'garbage' * 300, "not an MP4/MOV file (unrecognised header)")
+    run_case(test)
+
+
+def test_sniff_container():
+    assert sniff_container(FTYP) == "iso"
+    assert sniff_container(b'FLV\x01' + b'\0' * 16) == "flv"
+    assert sniff_container(b'\0' * 16) is None
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
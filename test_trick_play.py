@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests for the I-frame playlists and thumbnail track (trick_play.py)
+Builds MPEG-TS segments packet by packet (PAT, PMT, audio and video PES),
+so no ffmpeg or AWS is needed:
+
+    python3 test_trick_play.py
+"""
+
+import sys
+import os
+import struct
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from trick_play import (ts_keyframe_end, write_iframe_playlist, jpeg_size, write_thumbnail_vtt,
+                        TS_PACKET_SIZE, TS_READ_CHUNK, THUMBNAIL_VTT)
+
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+
+
+def ts_packet(pid, payload, unit_start=False, random_access=False):
+    """One 188-byte packet; random_access adds an adaptation field with the RAI flag"""
+    header = bytes([0x47, (0x40 if unit_start else 0) | (pid >> 8), pid & 0xFF])
+    if random_access:
+        adaptation = bytes([1, 0x40])
+        packet = header + bytes([0x30]) + adaptation + payload
+    else:
+        packet = header + bytes([0x10]) + payload
+    return packet[:TS_PACKET_SIZE].ljust(TS_PACKET_SIZE, b'\xff')
+
+
+def psi(table_id, body):
+    """Pointer field plus a PSI section (CRC left as zeros - the parser doesn't check it)"""
+    section_length = len(body) + 4
+    return bytes([0, table_id, 0xB0 | (section_length >> 8), section_length & 0xFF]) + body + b'\0' * 4
+
+
+def pat():
+    # transport_stream_id, version/current, section numbers, then program 1 -> PMT_PID
+    return ts_packet(0, psi(0x00, struct.pack('>HBBBHH', 1, 0xC1, 0, 0, 1, 0xE000 | PMT_PID)),
+                     unit_start=True)
+
+
+def pmt():
+    streams = (struct.pack('>BHH', 0x0F, 0xE000 | AUDIO_PID, 0xF000)     # AAC listed first
+               + struct.pack('>BHH', 0x1B, 0xE000 | VIDEO_PID, 0xF000))  # H.264
+    body = struct.pack('>HBBBHH', 1, 0xC1, 0, 0, 0xE000 | VIDEO_PID, 0xF000) + streams
+    return ts_packet(PMT_PID, psi(0x02, body), unit_start=True)
+
+
+def pes(pid, packets, random_access=False):
+    """A PES spread over `packets` packets"""
+    start = ts_packet(pid, b'\x00\x00\x01\xe0' + b'\0' * 8, unit_start=True, random_access=random_access)
+    return start + b''.join(ts_packet(pid, b'\0' * 184) for _ in range(packets - 1))
+
+
+def segment(keyframe_packets=20, keyframe=True):
+    """PAT, PMT, a keyframe PES with interleaved audio, then two more video PES"""
+    return (pat() + pmt()
+            + pes(VIDEO_PID, keyframe_packets // 2, random_access=keyframe)
+            + pes(AUDIO_PID, 3)
+            + b''.join(ts_packet(VIDEO_PID, b'\0' * 184) for _ in range(keyframe_packets - keyframe_packets // 2))
+            + pes(VIDEO_PID, 5) + pes(AUDIO_PID, 2) + pes(VIDEO_PID, 5))
+
+
+def second_video_pes_offset(keyframe_packets):
+    return (2 + keyframe_packets // 2 + 3 + keyframe_packets - keyframe_packets // 2) * TS_PACKET_SIZE
+
+
+def jpeg_header(width, height):
+    """SOI, an APP0 segment, then SOF0 carrying the frame size"""
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0' + b'\0' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 17, 8, height, width, 3) + b'\0' * 9
+    return b'\xff\xd8' + app0 + sof0 + b'\xff\xd9'
+
+
+class TempDir:
+    def __enter__(self):
+        self.path = tempfile.mkdtemp(prefix="test_trick_play_")
+        return self.path
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.path)
+        return False
+
+
+def write(directory, name, data):
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(os.path.join(directory, name), mode) as f:
+        f.write(data)
+
+
+def test_keyframe_range_ends_at_second_video_pes():
+    with TempDir() as d:
+        write(d, "seg.ts", segment(20))
+        assert ts_keyframe_end(os.path.join(d, "seg.ts")) == second_video_pes_offset(20)
+
+
+def test_keyframe_range_across_read_chunks():
+    keyframe_packets = TS_READ_CHUNK // TS_PACKET_SIZE + 100
+    with TempDir() as d:
+        write(d, "seg.ts", segment(keyframe_packets))
+        assert ts_keyframe_end(os.path.join(d, "seg.ts")) == second_video_pes_offset(keyframe_packets)
+
+
+def test_keyframe_only_segment_runs_to_end():
+    with TempDir() as d:
+        data = pat() + pmt() + pes(VIDEO_PID, 6, random_access=True) + pes(AUDIO_PID, 2)
+        write(d, "seg.ts", data)
+        assert ts_keyframe_end(os.path.join(d, "seg.ts")) == len(data)
+
+
+def test_no_keyframe_or_not_ts():
+    with TempDir() as d:
+        write(d, "open_gop.ts", segment(20, keyframe=False)[:second_video_pes_offset(20)])
+        assert ts_keyframe_end(os.path.join(d, "open_gop.ts")) is None
+        write(d, "no_pmt.ts", pes(VIDEO_PID, 6, random_access=True))
+        assert ts_keyframe_end(os.path.join(d, "no_pmt.ts")) is None
+        write(d, "not_ts.ts", b'\0' * TS_PACKET_SIZE * 4)
+        assert ts_keyframe_end(os.path.join(d, "not_ts.ts")) is None
+
+
+def test_write_iframe_playlist():
+    with TempDir() as d:
+        write(d, "seg_0000.ts", segment(20))
+        write(d, "seg_0001.ts", segment(40))
+        write(d, "MASTER_240p.m3u8", "#EXTM3U\n#EXT-X-TARGETDURATION:4\n#EXTINF:4.000000,\nseg_0000.ts\n"
+                                     "#EXTINF:2.500000,\nseg_0001.ts\n#EXT-X-ENDLIST\n")
+        variant = write_iframe_playlist(d, "240p")
+        first, second = second_video_pes_offset(20), second_video_pes_offset(40)
+        assert variant == {
+            "uri": "IFRAMES_240p.m3u8",
+            "bandwidth": round(second * 8 / 2.5),
+            "average_bandwidth": round((first + second) * 8 / 6.5),
+        }
+        with open(os.path.join(d, "IFRAMES_240p.m3u8")) as f:
+            lines = f.read().splitlines()
+        assert "#EXT-X-I-FRAMES-ONLY" in lines and "#EXT-X-TARGETDURATION:4" in lines
+        assert lines[-7:] == ["#EXTINF:4.000000,", f"#EXT-X-BYTERANGE:{first}@0", "seg_0000.ts",
+                              "#EXTINF:2.500000,", f"#EXT-X-BYTERANGE:{second}@0", "seg_0001.ts",
+                              "#EXT-X-ENDLIST"]
+
+
+def test_iframe_playlist_needs_a_keyframe():
+    with TempDir() as d:
+        write(d, "seg_0000.ts", b'\0' * TS_PACKET_SIZE)
+        write(d, "MASTER_240p.m3u8", "#EXTM3U\n#EXTINF:4.0,\nseg_0000.ts\n#EXT-X-ENDLIST\n")
+        assert write_iframe_playlist(d, "240p") is None
+        assert not os.path.exists(os.path.join(d, "IFRAMES_240p.m3u8"))
+
+
+def test_jpeg_size():
+    with TempDir() as d:
+        write(d, "thumbs_0001.jpg", jpeg_header(1600, 900))
+        assert jpeg_size(os.path.join(d, "thumbs_0001.jpg")) == (1600, 900)
+
+
+def test_write_thumbnail_vtt():
+    with TempDir() as d:
+        write(d, "thumbs_0001.jpg", jpeg_header(1600, 900))
+        assert write_thumbnail_vtt(d, 12) == 3
+        with open(os.path.join(d, THUMBNAIL_VTT)) as f:
+            assert f.read().splitlines() == [
+                "WEBVTT", "",
+                "00:00:00.000 --> 00:00:05.000", "thumbs_0001.jpg#xywh=0,0,160,90", "",
+                "00:00:05.000 --> 00:00:10.000", "thumbs_0001.jpg#xywh=160,0,160,90", "",
+                "00:00:10.000 --> 00:00:12.000", "thumbs_0001.jpg#xywh=320,0,160,90",
+            ]
+        os.remove(os.path.join(d, "thumbs_0001.jpg"))
+        assert write_thumbnail_vtt(d, 12) == 0
+
+
+if __name__ == "__main__":
+    tests = [v for k, v in list(globals().items()) if k.startswith("test_") and callable(v)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Trick Play (Seek Previews)
+Two kinds of scrubbing aids, neither needing a second pass over the source:
+
+    I-frame playlists   IFRAMES_<rendition>.m3u8 (#EXT-X-I-FRAMES-ONLY), one
+                        #EXT-X-BYTERANGE per segment covering its leading
+                        keyframe, listed in MASTER.m3u8 with
+                        #EXT-X-I-FRAME-STREAM-INF. Every segment starts on
+                        an IDR frame (GOP == segment length, no scene-cut
+                        keyframes), so the ranges come from reading the head
+                        of each .ts file - no decode, no re-encode.
+    Thumbnail sprites   thumbs_0001.jpg, ... (THUMBNAIL_COLUMNS x
+                        THUMBNAIL_ROWS grids of THUMBNAIL_WIDTH px frames, one
+                        every THUMBNAIL_INTERVAL_SECONDS) plus thumbnails.vtt
+                        mapping time ranges to #xywh regions. The frames are
+                        split off the decoded source inside the ffmpeg run
+                        of the SPRITE_RENDITION rendition (see sprite_filter
+                        and sprite_output_args).
+
+Byte ranges start at offset 0 so they include the PAT/PMT that precede the
+keyframe, which players need to demux a lone range.
+"""
+
+import os
+import math
+
+from hls_master import parse_media_playlist
+
+IFRAME_PLAYLIST_PREFIX = "IFRAMES_"
+THUMBNAIL_VTT = "thumbnails.vtt"
+SPRITE_PATTERN = "thumbs_%04d.jpg"
+
+# The cheapest rendition's ffmpeg run also writes the sprites
+SPRITE_RENDITION = "240p"
+THUMBNAIL_INTERVAL_SECONDS = 5
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_COLUMNS = 10
+THUMBNAIL_ROWS = 10
+SPRITE_JPEG_QUALITY = 5  # ffmpeg -q:v, 2 (best) .. 31
+
+TS_PACKET_SIZE = 188
+TS_READ_CHUNK = TS_PACKET_SIZE * 512
+# H.264, HEVC, MPEG-2 video
+TS_VIDEO_STREAM_TYPES = (0x1B, 0x24, 0x02)
+
+
+def trick_play_settings():
+    """Settings that change the trick-play outputs (part of convert_ffmpeg.output_settings)"""
+    return {
+        "iframe_playlists": True,
+        "sprite_rendition": SPRITE_RENDITION,
+        "thumbnails": [THUMBNAIL_INTERVAL_SECONDS, THUMBNAIL_WIDTH, THUMBNAIL_COLUMNS, THUMBNAIL_ROWS,
+                       SPRITE_JPEG_QUALITY],
+    }
+
+
+def sprite_filter(rendition_filter):
+    """
+    -filter_complex for a rendition run that also feeds the sprite sheets:
+    the decoded video is split once, [v] is the rendition, [sprites] the tiles
+    """
+    return (f"[0:v:0]split=2[main][thumbs];[main]{rendition_filter}[v];"
+            f"[thumbs]fps=1/{THUMBNAIL_INTERVAL_SECONDS},scale={THUMBNAIL_WIDTH}:-2,"
+            f"tile={THUMBNAIL_COLUMNS}x{THUMBNAIL_ROWS},format=yuvj420p[sprites]")
+
+
+def sprite_output_args(output_dir):
+    """Second ffmpeg output (after the HLS playlist) writing the [sprites] tiles as JPEGs"""
+    return ["-map", "[sprites]", "-c:v", "mjpeg", "-q:v", str(SPRITE_JPEG_QUALITY),
+            "-f", "image2", os.path.join(output_dir, SPRITE_PATTERN)]
+
+
+def _section(payload):
+    """PSI section bytes and the end of its table data (before the CRC)"""
+    section = payload[1 + payload[0]:]
+    if len(section) < 3:
+        return section, 0
+    length = ((section[1] & 0x0F) << 8) | section[2]
+    return section, min(3 + length - 4, len(section))
+
+
+def ts_keyframe_end(path):
+    """
+    Byte offset just past the first keyframe's PES in an MPEG-TS segment
+    (the next video PES start, or the end of the file). None if the segment
+    has no random-access video packet.
+    """
+    pmt_pids, video_pid, keyframe_seen = set(), None, False
+    offset = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(TS_READ_CHUNK)
+            if not chunk:
+                return offset if keyframe_seen else None
+            for start in range(0, len(chunk) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+                packet = chunk[start:start + TS_PACKET_SIZE]
+                if packet[0] != 0x47:
+                    return None
+                pid = ((packet[1] & 0x1F) << 8) | packet[2]
+                unit_start = packet[1] & 0x40
+                control = (packet[3] >> 4) & 0x3
+                payload_at = 4
+                random_access = False
+                if control & 0x2:
+                    random_access = packet[4] > 0 and bool(packet[5] & 0x40)
+                    payload_at += 1 + packet[4]
+                payload = packet[payload_at:] if control & 0x1 else b""
+
+                if pid == 0 and unit_start and payload:
+                    section, end = _section(payload)
+                    for i in range(8, end - 3, 4):
+                        if (section[i] << 8) | section[i + 1]:
+                            pmt_pids.add(((section[i + 2] & 0x1F) << 8) | section[i + 3])
+                elif pid in pmt_pids and unit_start and payload and video_pid is None:
+                    section, end = _section(payload)
+                    i = 12 + (((section[10] & 0x0F) << 8) | section[11]) if end > 12 else end
+                    while i + 5 <= end:
+                        if section[i] in TS_VIDEO_STREAM_TYPES:
+                            video_pid = ((section[i + 1] & 0x1F) << 8) | section[i + 2]
+                            break
+                        i += 5 + (((section[i + 3] & 0x0F) << 8) | section[i + 4])
+                elif pid == video_pid and unit_start:
+                    if keyframe_seen:
+                        return offset + start
+                    keyframe_seen = random_access
+            offset += len(chunk)
+
+
+def write_iframe_playlist(output_dir, rendition_name):
+    """
+    Write IFRAMES_<rendition>.m3u8 from the rendition's segments
+    Returns: {"uri", "bandwidth", "average_bandwidth"} for the master, or None if no keyframes were found
+    """
+    with open(os.path.join(output_dir, f"MASTER_{rendition_name}.m3u8")) as f:
+        playlist = parse_media_playlist(f.read())
+    entries = []
+    for uri, duration in playlist["segments"]:
+        length = ts_keyframe_end(os.path.join(output_dir, uri))
+        if length and duration:
+            entries.append((uri, duration, length))
+    if not entries:
+        return None
+
+    lines = ["#EXTM3U", "#EXT-X-VERSION:4",
+             f"#EXT-X-TARGETDURATION:{math.ceil(max(d for _, d, _ in entries))}",
+             "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD", "#EXT-X-I-FRAMES-ONLY"]
+    for uri, duration, length in entries:
+        lines += [f"#EXTINF:{duration:.6f},", f"#EXT-X-BYTERANGE:{length}@0", uri]
+    lines.append("#EXT-X-ENDLIST")
+    name = f"{IFRAME_PLAYLIST_PREFIX}{rendition_name}.m3u8"
+    with open(os.path.join(output_dir, name), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return {
+        "uri": name,
+        "bandwidth": int(round(max(length * 8 / duration for _, duration, length in entries))),
+        "average_bandwidth": int(round(sum(e[2] for e in entries) * 8 / sum(e[1] for e in entries))),
+    }
+
+
+def jpeg_size(path):
+    """(width, height) from a JPEG's SOF header"""
+    with open(path, "rb") as f:
+        data = f.read(65536)
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return (data[i + 7] << 8) | data[i + 8], (data[i + 5] << 8) | data[i + 6]
+        if marker == 0xFF or marker == 0xD8 or 0xD0 <= marker <= 0xD7:
+            i += 1 if marker == 0xFF else 2
+            continue
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    raise ValueError(f"{os.path.basename(path)}: no JPEG frame header")
+
+
+def _vtt_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def write_thumbnail_vtt(output_dir, duration):
+    """
+    Write thumbnails.vtt for the sprite sheets ffmpeg wrote into output_dir
+    Returns: number of thumbnails, 0 if there are no sprite sheets
+    """
+    prefix = SPRITE_PATTERN.split("%")[0]
+    sheets = sorted(n for n in os.listdir(output_dir) if n.startswith(prefix) and n.endswith(".jpg"))
+    if not sheets or not duration:
+        return 0
+    sheet_width, sheet_height = jpeg_size(os.path.join(output_dir, sheets[0]))
+    tile_width, tile_height = sheet_width // THUMBNAIL_COLUMNS, sheet_height // THUMBNAIL_ROWS
+    per_sheet = THUMBNAIL_COLUMNS * THUMBNAIL_ROWS
+    count = min(math.ceil(duration / THUMBNAIL_INTERVAL_SECONDS), len(sheets) * per_sheet)
+
+    lines = ["WEBVTT", ""]
+    for k in range(count):
+        start = k * THUMBNAIL_INTERVAL_SECONDS
+        end = min(start + THUMBNAIL_INTERVAL_SECONDS, duration)
+        position = k % per_sheet
+        x, y = (position % THUMBNAIL_COLUMNS) * tile_width, (position // THUMBNAIL_COLUMNS) * tile_height
+        lines += [f"{_vtt_time(start)} --> {_vtt_time(end)}",
+                  f"{sheets[k // per_sheet]}#xywh={x},{y},{tile_width},{tile_height}", ""]
+    with open(os.path.join(output_dir, THUMBNAIL_VTT), "w") as f:
+        f.write("\n".join(lines))
+    return count
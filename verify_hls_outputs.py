@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+HLS Output Verifier
+verify_video_codec.py downloads one hard-coded segment. This checks every
+converted video under an output prefix before a batch is released:
+
+    - MASTER.m3u8 parses and lists one variant per rendition
+    - every rendition playlist parses, ends with #EXT-X-ENDLIST and has a
+      TARGETDURATION no shorter than its longest segment
+    - every referenced segment exists (HEAD), is non-empty and is served as
+      video/mp2t
+    - a random sample of segments is range-fetched and ffprobed: H.264 Main
+      video, AAC audio, the resolution the master advertises, a duration
+      matching its #EXTINF, and a profile/level matching CODECS
+
+Videos are checked VIDEO_CONCURRENCY at a time; HEADs share one pool of
+--concurrency connections and ffprobe runs --probe-concurrency at a time,
+so thousands of videos can be checked in one go without flooding S3 or
+the CPU.
+
+Errors make the video fail (and the exit code non-zero); warnings are
+reported but don't.
+
+Usage:
+    python3 verify_hls_outputs.py output-bucket "streams/output/"
+    python3 verify_hls_outputs.py output-bucket "streams/output/Course A/" --sample 5 --json verify.json
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import posixpath
+import tempfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import convert_ffmpeg
+from convert_ffmpeg import RENDITIONS
+from hls_master import AVC_PROFILE_IDC, parse_media_playlist
+
+MASTER_PLAYLIST = "MASTER.m3u8"
+SEGMENT_CONTENT_TYPE = "video/mp2t"
+EXPECTED_VIDEO_CODEC = "h264"
+EXPECTED_VIDEO_PROFILE = "Main"
+EXPECTED_AUDIO_CODEC = "aac"
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_PROBE_CONCURRENCY = 4
+VIDEO_CONCURRENCY = 8
+DEFAULT_SAMPLE = 2
+PROBE_BYTES = 8 * 1024 * 1024
+DURATION_TOLERANCE_SECONDS = 0.5
+
+
+def parse_attributes(text):
+    """Attribute list of an #EXT-X-...: tag, honouring quoted commas"""
+    attributes = {}
+    key, value, quoted, reading_key = "", "", False, True
+    for char in text + ",":
+        if reading_key:
+            if char == "=":
+                reading_key = False
+            else:
+                key += char
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            attributes[key.strip()] = value
+            key, value, reading_key = "", "", True
+        else:
+            value += char
+    return attributes
+
+
+def parse_master(text):
+    """[(uri, attributes)] for every #EXT-X-STREAM-INF"""
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            pending = parse_attributes(line[len("#EXT-X-STREAM-INF:"):])
+        elif line and not line.startswith("#") and pending is not None:
+            variants.append((line, pending))
+            pending = None
+    return variants
+
+
+def resolve(base_key, uri):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_key), uri))
+
+
+def ffprobe_file(path):
+    cmd = ["ffprobe", "-v", "error", "-show_streams", "-show_format", "-of", "json", path]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-300:] or "ffprobe failed")
+    return json.loads(result.stdout)
+
+
+class HLSVerifier:
+    def __init__(self, s3_client, bucket, concurrency=DEFAULT_CONCURRENCY,
+                 probe_concurrency=DEFAULT_PROBE_CONCURRENCY, sample=DEFAULT_SAMPLE, seed=None):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.sample = sample
+        self.random = random.Random(seed)
+        self.head_pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.probe_slots = threading.Semaphore(probe_concurrency)
+        self.expected_renditions = {r["height"] for r in RENDITIONS}
+
+    def _get_text(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read().decode("utf-8", errors="replace")
+
+    def _head(self, key):
+        try:
+            response = self.s3.head_object(Bucket=self.bucket, Key=key)
+            return key, response.get("ContentLength", 0), response.get("ContentType"), None
+        except Exception as e:
+            return key, 0, None, str(e)
+
+    def _probe_segment(self, key, extinf, variant):
+        """Problems found by ffprobe on one segment: (errors, warnings)"""
+        errors, warnings = [], []
+        name = posixpath.basename(key)
+        with self.probe_slots:
+            try:
+                response = self.s3.get_object(Bucket=self.bucket, Key=key, Range=f"bytes=0-{PROBE_BYTES - 1}")
+                data = response["Body"].read()
+            except Exception as e:
+                return [f"{name}: download failed ({e})"], []
+            whole = not response.get("ContentRange") or response["ContentRange"].endswith(f"/{len(data)}")
+            fd, path = tempfile.mkstemp(suffix=".ts")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                info = ffprobe_file(path)
+            except Exception as e:
+                return [f"{key}: ffprobe failed ({e})"], []
+            finally:
+                os.remove(path)
+
+        streams = info.get("streams", [])
+        video = next((s for s in streams if s.get("codec_type", "video") == "video" and s.get("width")), None)
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+        if video is None:
+            return [f"{name}: no video stream"], []
+        if video.get("codec_name") != EXPECTED_VIDEO_CODEC or video.get("profile") != EXPECTED_VIDEO_PROFILE:
+            errors.append(f"{name}: video {video.get('codec_name')} {video.get('profile')}, "
+                          f"expected {EXPECTED_VIDEO_CODEC} {EXPECTED_VIDEO_PROFILE}")
+        if audio is not None and audio.get("codec_name") != EXPECTED_AUDIO_CODEC:
+            errors.append(f"{name}: audio {audio.get('codec_name')}, expected {EXPECTED_AUDIO_CODEC}")
+        elif audio is None:
+            warnings.append(f"{name}: no audio stream")
+
+        resolution = variant.get("RESOLUTION")
+        actual = f"{video.get('width')}x{video.get('height')}"
+        if resolution and resolution != actual:
+            warnings.append(f"{name}: {actual}, master says RESOLUTION={resolution}")
+        codecs = variant.get("CODECS", "")
+        avc = next((c for c in codecs.split(",") if c.startswith("avc1.")), None)
+        profile_idc = AVC_PROFILE_IDC.get(video.get("profile"))
+        if avc and profile_idc and video.get("level") and len(avc) == 11:
+            if int(avc[5:7], 16) != profile_idc or int(avc[9:11], 16) != video["level"]:
+                warnings.append(f"{name}: {video.get('profile')} level {video['level'] / 10:g}, "
+                                f"master says CODECS {avc}")
+
+        duration = float(info.get("format", {}).get("duration") or video.get("duration") or 0)
+        if whole and extinf and duration and abs(duration - extinf) > DURATION_TOLERANCE_SECONDS:
+            errors.append(f"{name}: {duration:.2f}s long, playlist says {extinf:.2f}s")
+        return errors, warnings
+
+    def verify(self, master_key):
+        """Check one video; returns a result dict (an unexpected exception becomes one of its errors)"""
+        result = {"master": master_key, "errors": [], "warnings": [], "variants": 0, "segments": 0, "probed": 0}
+        try:
+            self._verify(master_key, result)
+        except Exception as e:
+            result["errors"].append(f"verification failed: {type(e).__name__}: {e}")
+        return result
+
+    def _verify(self, master_key, result):
+        """Fill in result's counts, errors and warnings"""
+        errors, warnings = result["errors"], result["warnings"]
+        try:
+            variants = parse_master(self._get_text(master_key))
+        except Exception as e:
+            errors.append(f"{MASTER_PLAYLIST}: {e}")
+            return
+        result["variants"] = len(variants)
+        if not variants:
+            errors.append(f"{MASTER_PLAYLIST} lists no variants")
+            return
+        heights = {int(v.get("RESOLUTION", "0x0").split("x")[1]) for _, v in variants if "x" in v.get("RESOLUTION", "")}
+        missing = sorted(self.expected_renditions - heights)
+        if missing:
+            warnings.append(f"{MASTER_PLAYLIST} has no variant for {', '.join(f'{h}p' for h in missing)}")
+
+        segments = []  # (key, extinf, variant attributes)
+        for uri, attributes in variants:
+            playlist_key = resolve(master_key, uri)
+            try:
+                playlist = parse_media_playlist(self._get_text(playlist_key))
+            except Exception as e:
+                errors.append(f"{uri}: {e}")
+                continue
+            if not playlist["segments"]:
+                errors.append(f"{uri}: no segments")
+            if not playlist["endlist"]:
+                errors.append(f"{uri}: no #EXT-X-ENDLIST")
+            longest = max((d or 0 for _, d in playlist["segments"]), default=0)
+            if playlist["target_duration"] is None or round(longest) > playlist["target_duration"]:
+                errors.append(f"{uri}: TARGETDURATION {playlist['target_duration']} < longest segment {longest:.2f}s")
+            segments += [(resolve(playlist_key, s), d, attributes) for s, d in playlist["segments"]]
+        result["segments"] = len(segments)
+
+        for key, size, content_type, error in self.head_pool.map(self._head, [s[0] for s in segments]):
+            name = posixpath.basename(key)
+            if error:
+                errors.append(f"{name}: {error}")
+            elif size == 0:
+                errors.append(f"{name}: empty")
+            elif content_type != SEGMENT_CONTENT_TYPE:
+                warnings.append(f"{name}: Content-Type {content_type}")
+        if errors:
+            return
+
+        for key, extinf, attributes in self.random.sample(segments, min(self.sample, len(segments))):
+            segment_errors, segment_warnings = self._probe_segment(key, extinf, attributes)
+            errors += segment_errors
+            warnings += segment_warnings
+            result["probed"] += 1
+        return
+
+
+def find_masters(s3_client, bucket, prefix):
+    """Every MASTER.m3u8 under prefix, from one listing"""
+    masters = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith("/" + MASTER_PLAYLIST) or obj["Key"] == MASTER_PLAYLIST:
+                masters.append(obj["Key"])
+    return masters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify HLS outputs before release")
+    parser.add_argument("output_bucket")
+    parser.add_argument("output_prefix")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE,
+                        help=f"Segments per video to fetch and ffprobe (default: {DEFAULT_SAMPLE})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Concurrent HEAD requests (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--probe-concurrency", type=int, default=DEFAULT_PROBE_CONCURRENCY,
+                        help=f"Concurrent ffprobe runs (default: {DEFAULT_PROBE_CONCURRENCY})")
+    parser.add_argument("--seed", type=int, help="Seed for the segment sample (reproducible runs)")
+    parser.add_argument("--json", help="Write every video's result to this file")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🔬 HLS Output Verification")
+    print("="*60)
+    try:
+        # HEAD pool plus one playlist/segment GET per video thread, each with its own connection
+        s3 = convert_ffmpeg.make_s3_client(args.concurrency + VIDEO_CONCURRENCY)
+        masters = find_masters(s3, args.output_bucket, args.output_prefix)
+        print(f"Found {len(masters)} videos under s3://{args.output_bucket}/{args.output_prefix}")
+        verifier = HLSVerifier(s3, args.output_bucket, args.concurrency,
+                               args.probe_concurrency, args.sample, args.seed)
+        results = []
+        with ThreadPoolExecutor(max_workers=VIDEO_CONCURRENCY) as pool:
+            for i, result in enumerate(pool.map(verifier.verify, masters), 1):
+                results.append(result)
+                video = posixpath.dirname(result["master"])
+                if result["errors"]:
+                    print(f"❌ {video}")
+                    for error in result["errors"][:5]:
+                        print(f"      {error}")
+                elif result["warnings"]:
+                    more = len(result["warnings"]) - 1
+                    print(f"⚠️  {video}: {result['warnings'][0]}{f' (+{more} more)' if more else ''}")
+                if i % 100 == 0:
+                    print(f"   ... {i}/{len(masters)} checked")
+        verifier.head_pool.shutdown()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    failed = [r for r in results if r["errors"]]
+    warned = [r for r in results if r["warnings"] and not r["errors"]]
+    print("\n" + "="*60)
+    print(f"Videos: {len(results)} | ✅ passed: {len(results) - len(failed) - len(warned)} | "
+          f"⚠️  warnings: {len(warned)} | ❌ failed: {len(failed)}")
+    print(f"Segments checked: {sum(r['segments'] for r in results)} | probed: {sum(r['probed'] for r in results)}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Full results: {args.json}")
+    print("="*60)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Multi-Worker Supervisor
+Replaces the 4-pane tmux layout from start_4_workers.sh: the parent lists and
+plans once, writes the ordered job list to disk, then starts N copies of
+convert_ffmpeg.py that read that list instead of re-listing the bucket.
+
+Each worker is pinned to its own slice of CPUs and given a matching ffmpeg
+thread budget, its output is prefixed with the worker number and merged into
+the supervisor's stdout, and a worker that crashes is restarted with backoff.
+
+With a ConcurrencyController the worker count moves between its bounds:
+scaling up starts another worker, scaling down sends SIGUSR1 so a worker
+finishes its current video and exits. Workers are not pinned in that mode,
+since the CPU split changes as the count does.
+"""
+
+import os
+import re
+import time
+import signal
+import threading
+import subprocess
+
+# Lines printed by convert_ffmpeg.py's worker loop, used to track each worker's current video
+ACQUIRED_MARKER = "🎬 Acquired video: "
+RELEASED_MARKERS = ("Video marked as COMPLETED", "Video marked as FAILED")
+SPEED_PATTERN = re.compile(r"speed=([0-9.]+)x")
+
+# Recent per-rendition speeds kept for the concurrency controller
+SPEED_WINDOW = 20
+
+DEFAULT_MAX_RESTARTS = 5
+
+
+def strip_cli_options(argv, options_with_value=(), flags=()):
+    """Remove options (and their values) from an argv list"""
+    result = []
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        name = arg.split("=", 1)[0]
+        if name in options_with_value:
+            skip_next = "=" not in arg
+            continue
+        if arg in flags:
+            continue
+        result.append(arg)
+    return result
+
+
+def cpu_slices(worker_count, cpus=None):
+    """Split the CPUs available to this process into one slice per worker"""
+    if cpus is None:
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count() or 1))
+    slices = [[] for _ in range(worker_count)]
+    for i, cpu in enumerate(cpus):
+        slices[i % worker_count].append(cpu)
+    # More workers than CPUs: let the extras share everything
+    return [s or list(cpus) for s in slices]
+
+
+class WorkerProcess:
+    """Book-keeping for one supervised worker"""
+
+    def __init__(self, index, cpus):
+        self.index = index
+        self.cpus = cpus
+        self.process = None
+        self.restarts = 0
+        self.current_video = None
+        self.finished = False
+        self.gave_up = False
+        self.draining = False
+        self.restart_at = None
+        self.reader = None
+
+    @property
+    def label(self):
+        return f"w{self.index + 1}"
+
+
+class WorkerSupervisor:
+    """
+    Start, monitor and restart N convert_ffmpeg.py workers
+    on_crash(video_key) is called for the video a worker held when it died
+    """
+
+    def __init__(self, worker_count, child_command, max_restarts=DEFAULT_MAX_RESTARTS,
+                 on_crash=None, env=None, controller=None):
+        self.worker_count = worker_count
+        self.child_command = child_command
+        self.max_restarts = max_restarts
+        self.on_crash = on_crash
+        self.env = env or {}
+        self.controller = controller
+        self.stopping = False
+        # Set once a worker exits cleanly without being drained: the plan is used up
+        self.work_exhausted = False
+        self.recent_speeds = []
+        self._print_lock = threading.Lock()
+        if controller:
+            self._all_cpus = cpu_slices(1)[0]
+            self.workers = [WorkerProcess(i, self._all_cpus) for i in range(controller.target)]
+        else:
+            self.workers = [
+                WorkerProcess(i, cpus) for i, cpus in enumerate(cpu_slices(worker_count))
+            ]
+
+    def _log(self, label, line):
+        with self._print_lock:
+            print(f"[{label}] {line}", flush=True)
+
+    def _threads_for(self, worker):
+        if self.controller:
+            return max(1, len(worker.cpus) // max(1, self.controller.target))
+        return max(1, len(worker.cpus))
+
+    def _start(self, worker):
+        command = self.child_command + [
+            "--worker-id", worker.label,
+            "--ffmpeg-threads", str(self._threads_for(worker)),
+        ]
+        env = dict(os.environ, PYTHONUNBUFFERED="1", **self.env)
+
+        def pin_cpus():
+            if hasattr(os, "sched_setaffinity") and not self.controller:
+                os.sched_setaffinity(0, worker.cpus)
+
+        worker.process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            env=env,
+            preexec_fn=pin_cpus if hasattr(os, "sched_setaffinity") else None,
+        )
+        worker.current_video = None
+        worker.restart_at = None
+        worker.reader = threading.Thread(target=self._pump_output, args=(worker,), daemon=True)
+        worker.reader.start()
+        self._log("supervisor", f"Started {worker.label} (pid {worker.process.pid}, "
+                                f"CPUs {worker.cpus}, {self._threads_for(worker)} ffmpeg threads)")
+
+    def _pump_output(self, worker):
+        """Prefix and forward a worker's output, tracking which video it holds"""
+        for line in worker.process.stdout:
+            line = line.rstrip("\n")
+            if ACQUIRED_MARKER in line:
+                worker.current_video = line.split(ACQUIRED_MARKER, 1)[1].strip()
+            elif any(marker in line for marker in RELEASED_MARKERS):
+                worker.current_video = None
+            speed = SPEED_PATTERN.search(line)
+            if speed:
+                self.recent_speeds = (self.recent_speeds + [float(speed.group(1))])[-SPEED_WINDOW:]
+            self._log(worker.label, line)
+
+    def _handle_exit(self, worker, returncode):
+        worker.reader.join(timeout=5)
+        if returncode == 0 or self.stopping or worker.draining:
+            worker.finished = True
+            if returncode == 0 and not worker.draining:
+                self.work_exhausted = True
+            self._log("supervisor", f"{worker.label} finished (exit {returncode})")
+            return
+
+        self._log("supervisor", f"❌ {worker.label} crashed (exit {returncode})")
+        if worker.current_video and self.on_crash:
+            self._log("supervisor", f"🔓 Releasing {worker.current_video} held by {worker.label}")
+            self.on_crash(worker.current_video)
+
+        if worker.restarts >= self.max_restarts:
+            worker.finished = True
+            worker.gave_up = True
+            self._log("supervisor", f"⚠️  {worker.label} exceeded {self.max_restarts} restarts, giving up")
+            return
+
+        worker.restarts += 1
+        delay = min(2 ** worker.restarts, 60)
+        self._log("supervisor", f"🔄 Restarting {worker.label} in {delay}s "
+                                f"(restart {worker.restarts}/{self.max_restarts})")
+        worker.process = None
+        worker.restart_at = time.time() + delay
+
+    def _active_workers(self):
+        return [w for w in self.workers if not w.finished and not w.draining]
+
+    def _apply_controller(self):
+        """Sample the box and start or drain workers to match the controller's target"""
+        active = self._active_workers()
+        target = self.controller.update(len(active), self.recent_speeds)
+
+        if target > len(active) and not self.work_exhausted:
+            for _ in range(target - len(active)):
+                worker = WorkerProcess(len(self.workers), self._all_cpus)
+                self.workers.append(worker)
+                self._log("supervisor", f"📈 Scaling up to {target} workers "
+                                        f"({self.controller.last_reason})")
+                self._start(worker)
+        elif target < len(active):
+            # Drain the newest workers first; older ones keep their warm state
+            for worker in sorted(active, key=lambda w: w.index, reverse=True)[:len(active) - target]:
+                self._log("supervisor", f"📉 Scaling down to {target} workers "
+                                        f"({self.controller.last_reason}): draining {worker.label}")
+                worker.draining = True
+                if worker.process and worker.process.poll() is None:
+                    worker.process.send_signal(signal.SIGUSR1)
+
+    def _forward_signal(self, sig, frame):
+        self.stopping = True
+        self._log("supervisor", "⚠️  Interrupt received! Stopping workers...")
+        for worker in self.workers:
+            if worker.process and worker.process.poll() is None:
+                worker.process.send_signal(signal.SIGTERM)
+
+    def run(self):
+        """Run until every worker has finished; returns the process exit code"""
+        signal.signal(signal.SIGINT, self._forward_signal)
+        signal.signal(signal.SIGTERM, self._forward_signal)
+
+        for worker in self.workers:
+            self._start(worker)
+
+        while not all(w.finished for w in self.workers):
+            for worker in self.workers:
+                if worker.finished:
+                    continue
+                if worker.process is None:
+                    if self.stopping:
+                        worker.finished = True
+                    elif worker.restart_at and time.time() >= worker.restart_at:
+                        self._start(worker)
+                    continue
+                returncode = worker.process.poll()
+                if returncode is not None:
+                    self._handle_exit(worker, returncode)
+            if self.controller and not self.stopping and self.controller.due():
+                self._apply_controller()
+            time.sleep(1)
+
+        gave_up = [w.label for w in self.workers if w.gave_up]
+        self._log("supervisor", f"🏁 All {len(self.workers)} workers finished"
+                                + (f" ({', '.join(gave_up)} gave up after repeated crashes)" if gave_up else ""))
+        return 1 if gave_up else 0